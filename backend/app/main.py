@@ -1,15 +1,44 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from .models.forecast import ForecastJobRequest, ForecastStreamRequest
+from .models.ingest import IngestRequest
+from .models.qa import QARequest
+from .services.anomaly_service import AnomalyService
 from .services.data_service import DataService
-from .services.forecast_service import ForecastService
-from typing import Dict, List
+from .services.forecast_service import FORECAST_SECTIONS, ForecastService
+from .services.forecast_jobs import ForecastJobNotFoundError, ForecastJobService
+from .services.query_service import QueryEngineUnavailableError
+from .services.batch_service import BatchForecastService
+from .services.forecast_stream import ForecastStreamService, to_ndjson, to_sse
+from .services.qa_service import QAService, QAUnavailableError
+from .utils.anomalies import ANOMALY_KINDS
+from .utils.compression import SelectiveGZipMiddleware
+from .utils.json_utils import FastJSONResponse
+from .utils.http_cache import cache_headers, make_etag, not_modified, request_fingerprint
+from .utils.instrumentation import RequestMetricsMiddleware
+from .utils.metrics import REGISTRY
+from .services.forecast_executor import (
+    ForecastExecutor,
+    ForecastPoolSaturatedError,
+    ForecastTimeoutError
+)
+from typing import Dict, List, Literal, Optional
 import logging
+import os
+from pathlib import Path
+import pandas as pd
 
-# Configurar logging
-logging.basicConfig(level=logging.INFO)
+# Configurar logging: LOG_LEVEL fija el nivel general y LOG_REQUESTS=0 apaga los
+# mensajes por solicitud (se formatean solo si el nivel los deja pasar)
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
 logger = logging.getLogger(__name__)
+request_logger = logging.getLogger(f"{__name__}.requests")
+if os.getenv('LOG_REQUESTS', '1') == '0':
+    request_logger.setLevel(logging.WARNING)
 
-app = FastAPI()
+# Las respuestas se codifican con orjson (acepta arreglos de NumPy)
+app = FastAPI(default_response_class=FastJSONResponse)
 
 # Configurar CORS
 app.add_middleware(
@@ -18,57 +47,398 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
+# Comprimir respuestas grandes (series y pronósticos); el streaming se envía sin
+# comprimir para que cada evento llegue en cuanto se produce
+app.add_middleware(SelectiveGZipMiddleware, minimum_size=1024, excluded_paths=('/api/forecast/stream',))
+# Duración por ruta y perfilado opcional (queda por fuera para medir también la compresión)
+app.add_middleware(RequestMetricsMiddleware)
+
+# Segundos que clientes y proxies pueden reutilizar una respuesta sin revalidarla
+HTTP_CACHE_MAX_AGE = int(os.getenv('HTTP_CACHE_MAX_AGE', 60))
+
+# Directorio del que la ingesta puede leer CSV por nombre; sin él solo se aceptan filas
+INGEST_DIR = os.getenv('INGEST_DIR')
 
 # Inicializar servicios
 data_service = DataService()
 forecast_service = ForecastService()
+forecast_executor = ForecastExecutor(forecast_service)
+batch_service = BatchForecastService(data_service, forecast_service)
+stream_service = ForecastStreamService(data_service, forecast_service, forecast_executor)
+job_service = ForecastJobService(forecast_service, forecast_executor)
+# El modelo de embeddings se carga hasta la primera pregunta
+qa_service = QAService(data_service)
+# El escaneo de anomalías de la red se hace en la primera consulta y tras cada ingesta
+anomaly_service = AnomalyService(data_service)
+
+@app.on_event("shutdown")
+def shutdown_event():
+    forecast_executor.shutdown()
+
+def _dataset_etag(request: Request, *extra) -> str:
+    """ETag de una respuesta que depende solo del dataset y de los parámetros"""
+    return make_etag(data_service.version, request_fingerprint(request), *extra)
+
+def _cached_response(content, etag: str) -> FastJSONResponse:
+    return FastJSONResponse(content, headers=cache_headers(etag, HTTP_CACHE_MAX_AGE))
 
 @app.get("/")
 async def root():
     return {"message": "API del Sistema Metro CDMX"}
 
 @app.get("/api/stations")
-async def get_stations() -> List[Dict]:
+async def get_stations(request: Request) -> FastJSONResponse:
     """Obtiene la lista de todas las estaciones disponibles"""
-    logger.info("Solicitando lista de estaciones")
+    request_logger.info("Solicitando lista de estaciones")
+    etag = _dataset_etag(request)
+    cached = not_modified(request, etag, HTTP_CACHE_MAX_AGE)
+    if cached is not None:
+        return cached
     try:
         stations = data_service.get_available_stations()
-        logger.info(f"Retornando {len(stations)} estaciones")
-        return stations
+        request_logger.info("Retornando %d estaciones", len(stations))
+        return _cached_response(stations, etag)
     except Exception as e:
         logger.error(f"Error al obtener estaciones: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stations/search")
+async def search_stations(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    linea: Optional[str] = None
+) -> FastJSONResponse:
+    """Busca estaciones por prefijo o por nombre aproximado (autocompletado)"""
+    etag = _dataset_etag(request)
+    cached = not_modified(request, etag, HTTP_CACHE_MAX_AGE)
+    if cached is not None:
+        return cached
+    return _cached_response(data_service.search_stations(q, limit, linea), etag)
+
+@app.get("/api/lines")
+async def get_lines(request: Request) -> FastJSONResponse:
+    """Obtiene el resumen de afluencia por línea"""
+    request_logger.info("Solicitando resumen de líneas")
+    etag = _dataset_etag(request)
+    cached = not_modified(request, etag, HTTP_CACHE_MAX_AGE)
+    if cached is not None:
+        return cached
+    try:
+        return _cached_response(data_service.get_lines_summary(), etag)
+    except Exception as e:
+        logger.error(f"Error al obtener líneas: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/timeseries/{linea}/{estacion}")
-async def get_time_series(linea: str, estacion: str) -> Dict:
+async def get_time_series(
+    request: Request,
+    linea: str,
+    estacion: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    granularity: Literal['week', 'month', 'quarter', 'year'] = 'month'
+) -> FastJSONResponse:
     """Obtiene la serie temporal para una estación específica"""
-    logger.info(f"Solicitando serie temporal para línea: {linea}, estación: {estacion}")
+    request_logger.info("Solicitando serie temporal para línea: %s, estación: %s", linea, estacion)
+    etag = _dataset_etag(request)
+    cached = not_modified(request, etag, HTTP_CACHE_MAX_AGE)
+    if cached is not None:
+        return cached
     try:
-        data = data_service.get_time_series(linea, estacion)
-        logger.info("Datos encontrados exitosamente")
-        return data
+        data = data_service.get_time_series(linea, estacion, start, end, granularity)
+        request_logger.info("Datos encontrados exitosamente")
+        return _cached_response(data, etag)
+    except ValueError as e:
+        logger.error(f"Parámetros inválidos: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error: {str(e)}")
         raise HTTPException(status_code=404, detail=str(e))
 
+def _run_analytics(request: Request, query, *args, **kwargs):
+    """Ejecuta una consulta analítica y traduce sus errores a respuestas HTTP"""
+    etag = _dataset_etag(request)
+    cached = not_modified(request, etag, HTTP_CACHE_MAX_AGE)
+    if cached is not None:
+        return cached
+    try:
+        return _cached_response(query(*args, **kwargs), etag)
+    except QueryEngineUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error en consulta analítica: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+# Las consultas analíticas son bloqueantes: se declaran con def para que FastAPI
+# las ejecute en su pool de hilos y no en el event loop
+@app.get("/api/analytics/lines")
+def get_line_totals(request: Request, start: Optional[str] = None, end: Optional[str] = None) -> FastJSONResponse:
+    """Obtiene la afluencia total por línea en un rango de fechas"""
+    return _run_analytics(request, data_service.query.line_totals, start, end)
+
+@app.get("/api/analytics/top-stations")
+def get_top_stations(
+    request: Request,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = Query(10, ge=1, le=500),
+    linea: Optional[str] = None
+) -> FastJSONResponse:
+    """Obtiene las estaciones con mayor afluencia en un rango de fechas"""
+    return _run_analytics(request, data_service.query.top_stations, start, end, limit, linea)
+
+@app.get("/api/analytics/day-of-week")
+def get_day_of_week_profile(
+    request: Request,
+    linea: Optional[str] = None,
+    estacion: Optional[str] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+) -> FastJSONResponse:
+    """Obtiene el perfil de afluencia por día de la semana"""
+    return _run_analytics(request, data_service.query.day_of_week_profile, linea, estacion, start, end)
+
+@app.get("/api/analytics/year-over-year")
+def get_year_over_year(request: Request, linea: Optional[str] = None,
+                       estacion: Optional[str] = None) -> FastJSONResponse:
+    """Compara la afluencia mensual contra el mismo mes del año anterior"""
+    return _run_analytics(request, data_service.query.year_over_year, linea, estacion)
+
+@app.get("/api/anomalies")
+def get_anomalies(
+    request: Request,
+    linea: Optional[str] = None,
+    estacion: Optional[str] = None,
+    tipo: Optional[Literal[ANOMALY_KINDS]] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    min_days: int = Query(1, ge=1),
+    limit: int = Query(500, ge=1, le=5000)
+) -> FastJSONResponse:
+    """Obtiene los episodios anómalos (cierres, caídas, picos, eventos de red y cambios de nivel)"""
+    return _run_analytics(request, anomaly_service.get_anomalies, linea, estacion, tipo, start, end, min_days, limit)
+
+@app.get("/api/anomalies/network")
+def get_network_events(request: Request, start: Optional[str] = None,
+                       end: Optional[str] = None) -> FastJSONResponse:
+    """Obtiene los días con caída simultánea en gran parte de la red"""
+    return _run_analytics(request, anomaly_service.get_network_events, start, end)
+
+@app.post("/api/qa")
+def answer_question(body: QARequest) -> FastJSONResponse:
+    """Contesta una pregunta en lenguaje natural sobre la afluencia"""
+    request_logger.info("Pregunta recibida: %s", body.question)
+    try:
+        return FastJSONResponse(qa_service.answer(body.question, body.top_k))
+    except (QAUnavailableError, QueryEngineUnavailableError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error al contestar la pregunta: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/admin/forecasts/batch", status_code=202)
+async def start_batch_forecast(
+    workers: Optional[int] = Query(None, ge=1),
+    engine: Optional[Literal['prophet', 'fast']] = None
+) -> Dict:
+    """Inicia en segundo plano el pronóstico de todas las estaciones"""
+    if not batch_service.start(workers, engine):
+        raise HTTPException(status_code=409, detail="Ya hay un lote de pronósticos en curso")
+    logger.info("Lote de pronósticos iniciado")
+    return batch_service.status()
+
+@app.get("/api/admin/forecasts/batch")
+async def get_batch_forecast_status() -> Dict:
+    """Obtiene el avance del lote de pronósticos"""
+    return batch_service.status()
+
+def _ingest_file(name: str) -> Path:
+    """
+    Resuelve el nombre de un CSV dentro de INGEST_DIR. Se rechaza cualquier ruta
+    que salga del directorio; al pasar un Path a pandas tampoco se interpretan URLs.
+    """
+    if not INGEST_DIR:
+        raise HTTPException(status_code=400, detail="La ingesta desde archivo no está habilitada (INGEST_DIR)")
+    base = Path(INGEST_DIR).resolve()
+    path = (base / name).resolve()
+    if not path.is_relative_to(base) or path.suffix.lower() != '.csv' or not path.is_file():
+        raise HTTPException(status_code=400, detail=f"Archivo de ingesta no válido: {name}")
+    return path
+
+@app.post("/api/admin/data/ingest")
+def ingest_data(request: IngestRequest) -> Dict:
+    """Incorpora datos nuevos y marca como obsoletos los pronósticos de las estaciones modificadas"""
+    if (request.rows is None) == (request.file is None):
+        raise HTTPException(status_code=400, detail="Se debe indicar 'rows' o 'file'")
+    try:
+        if request.rows is not None:
+            new_rows = pd.DataFrame(request.rows)
+        else:
+            new_rows = pd.read_csv(_ingest_file(request.file), encoding='utf-8')
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"No se pudieron leer los datos nuevos: {str(e)}")
+
+    try:
+        summary = data_service.ingest(new_rows, persist=request.persist)
+    except Exception as e:
+        logger.error(f"Error en la ingesta de datos: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Las llaves del cache dependen de los datos: solo las estaciones modificadas
+    # quedan sin pronóstico vigente y se reajustan (partiendo del modelo anterior)
+    summary['pronosticos_obsoletos'] = summary['estaciones_modificadas']
+    return summary
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics() -> PlainTextResponse:
+    """Métricas del proceso en el formato de texto de Prometheus"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/forecast/stats")
+async def get_forecast_stats() -> Dict:
+    """Obtiene los contadores del ejecutor de pronósticos y de la cola de trabajos"""
+    return {**forecast_executor.stats(), 'jobs': job_service.stats()}
+
+def _validate_fields(fields: Optional[List[str]]) -> Optional[List[str]]:
+    """Valida las secciones pedidas antes de ajustar cualquier modelo"""
+    selected = [field.strip() for field in fields or [] if field.strip()]
+    unknown = [field for field in selected if field not in FORECAST_SECTIONS]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Secciones desconocidas: {unknown}. Disponibles: {list(FORECAST_SECTIONS)}"
+        )
+    return selected or None
+
+@app.post("/api/forecast/stream")
+async def stream_forecasts(
+    body: ForecastStreamRequest,
+    format: Literal['ndjson', 'sse'] = 'ndjson'
+) -> StreamingResponse:
+    """
+    Pronostica varias estaciones y transmite el avance y cada resultado en cuanto
+    está listo, como NDJSON (una línea por evento) o Server-Sent Events
+    """
+    fields = _validate_fields(body.fields)
+    request_logger.info("Solicitando pronóstico en streaming para %d estaciones", len(body.stations))
+    encode = to_sse if format == 'sse' else to_ndjson
+
+    async def body_iterator():
+        async for event in stream_service.stream(
+            [station.model_dump() for station in body.stations],
+            body.engine, fields, body.resolution, body.points
+        ):
+            yield encode(event)
+
+    return StreamingResponse(
+        body_iterator(),
+        media_type='text/event-stream' if format == 'sse' else 'application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _forecast_error(e: Exception) -> HTTPException:
+    """Traduce los errores del ejecutor de pronósticos a respuestas HTTP"""
+    if isinstance(e, ForecastPoolSaturatedError):
+        logger.warning(f"Pronóstico rechazado: {str(e)}")
+        return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    if isinstance(e, ForecastTimeoutError):
+        logger.error(f"Tiempo de pronóstico excedido: {str(e)}")
+        return HTTPException(status_code=504, detail=str(e))
+    logger.error(f"Error al generar pronóstico: {str(e)}")
+    return HTTPException(status_code=500, detail=str(e))
+
+# Las rutas de trabajos van antes de /api/forecast/{linea}/{estacion}, que también coincidiría
+@app.post("/api/forecast/jobs", status_code=202)
+async def create_forecast_job(body: ForecastJobRequest, response: Response) -> Dict:
+    """
+    Crea un trabajo de pronóstico y regresa de inmediato con su id; el avance y
+    el resultado se consultan en /api/forecast/jobs/{id}
+    """
+    request_logger.info("Trabajo de pronóstico para línea: %s, estación: %s", body.linea, body.estacion)
+    try:
+        station_data = data_service.get_station_data(body.linea, body.estacion)
+    except Exception as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    try:
+        job = await job_service.submit(station_data, body.linea, body.estacion, body.engine, body.priority)
+    except Exception as e:
+        raise _forecast_error(e)
+    response.headers['Location'] = f"/api/forecast/jobs/{job.id}"
+    return job_service.describe(job)
+
+@app.get("/api/forecast/jobs/{job_id}")
+async def get_forecast_job(
+    job_id: str,
+    resolution: Literal['daily', 'weekly', 'monthly'] = 'daily',
+    points: Optional[int] = Query(None, ge=3, le=10000),
+    fields: Optional[str] = None
+) -> FastJSONResponse:
+    """
+    Obtiene el estado, los tiempos y, si ya terminó, el resultado de un trabajo
+    de pronóstico (con las mismas opciones de forma que /api/forecast)
+    """
+    selected_fields = _validate_fields(fields.split(',') if fields else None)
+    try:
+        job = job_service.get(job_id)
+    except ForecastJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    content = job_service.describe(job)
+    if job.result is not None:
+        content['forecast'] = forecast_service.shape_forecast(job.result, selected_fields, resolution, points)
+    return FastJSONResponse(content)
+
+@app.delete("/api/forecast/jobs/{job_id}")
+async def cancel_forecast_job(job_id: str) -> Dict:
+    """Cancela un trabajo de pronóstico en cola o en curso"""
+    try:
+        return job_service.describe(job_service.cancel(job_id))
+    except ForecastJobNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
 @app.get("/api/forecast/{linea}/{estacion}")
-async def get_forecast(linea: str, estacion: str) -> Dict:
-    """Genera un pronóstico para una estación específica"""
-    logger.info(f"Solicitando pronóstico para línea: {linea}, estación: {estacion}")
+async def get_forecast(
+    request: Request,
+    linea: str,
+    estacion: str,
+    engine: Optional[Literal['prophet', 'fast']] = None,
+    resolution: Literal['daily', 'weekly', 'monthly'] = 'daily',
+    points: Optional[int] = Query(None, ge=3, le=10000),
+    fields: Optional[str] = None
+) -> FastJSONResponse:
+    """
+    Genera un pronóstico para una estación específica.
+    
+    resolution agrega las series por semana o mes, points limita cada serie a
+    ese número de puntos (LTTB) y fields (p. ej. 'forecast,metrics') elige las
+    secciones de la respuesta.
+    """
+    selected_fields = _validate_fields(fields.split(',') if fields else None)
+    request_logger.info("Solicitando pronóstico para línea: %s, estación: %s", linea, estacion)
+    # El pronóstico depende del dataset, los parámetros y la configuración del motor
+    etag = _dataset_etag(request, forecast_service.config_version(engine))
+    cached = not_modified(request, etag, HTTP_CACHE_MAX_AGE)
+    if cached is not None:
+        return cached
     try:
         # Obtener datos de la estación
         station_data = data_service.get_station_data(linea, estacion)
         
-        # Generar pronóstico
-        forecast_result = forecast_service.generate_forecast(station_data)
+        # Pronóstico como trabajo de alta prioridad: hay un cliente esperando la respuesta
+        job = await job_service.submit(station_data, linea, estacion, engine, priority='high')
+        forecast_result = await job_service.wait(job)
+        forecast_result = forecast_service.shape_forecast(forecast_result, selected_fields, resolution, points)
         
-        logger.info("Pronóstico generado exitosamente")
-        return {
+        request_logger.info("Pronóstico generado exitosamente")
+        # Se devuelve la respuesta directamente para no pasar por jsonable_encoder
+        return _cached_response({
             "estacion": estacion,
             "linea": linea,
             "forecast": forecast_result
-        }
+        }, etag)
     except Exception as e:
-        logger.error(f"Error al generar pronóstico: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise _forecast_error(e)
@@ -0,0 +1,31 @@
+from typing import List, Literal, Optional
+
+from pydantic import BaseModel, Field
+
+
+class StationRef(BaseModel):
+    linea: str
+    estacion: str
+
+
+class ForecastStreamRequest(BaseModel):
+    """
+    Estaciones a pronosticar en una sola solicitud; las opciones de motor,
+    resolución, puntos y secciones son las mismas de /api/forecast
+    """
+    stations: List[StationRef] = Field(..., min_length=1, max_length=200)
+    engine: Optional[Literal['prophet', 'fast']] = None
+    resolution: Literal['daily', 'weekly', 'monthly'] = 'daily'
+    points: Optional[int] = Field(None, ge=3, le=10000)
+    fields: Optional[List[str]] = None
+
+
+class ForecastJobRequest(BaseModel):
+    """
+    Pronóstico de una estación como trabajo asíncrono; el resultado se consulta
+    en /api/forecast/jobs/{id}
+    """
+    linea: str
+    estacion: str
+    engine: Optional[Literal['prophet', 'fast']] = None
+    priority: Literal['high', 'normal', 'low'] = 'normal'
@@ -0,0 +1,14 @@
+from typing import Any, Dict, List, Optional
+
+from pydantic import BaseModel
+
+
+class IngestRequest(BaseModel):
+    """
+    Datos nuevos para incorporar sin reiniciar el servicio: filas en el cuerpo
+    de la solicitud o el nombre de un CSV (mismo formato que el dataset) dentro
+    del directorio INGEST_DIR del servidor
+    """
+    rows: Optional[List[Dict[str, Any]]] = None
+    file: Optional[str] = None
+    persist: bool = False
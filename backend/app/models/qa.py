@@ -0,0 +1,10 @@
+from pydantic import BaseModel, Field
+
+
+class QARequest(BaseModel):
+    """
+    Pregunta en lenguaje natural; top_k es el número de candidatos por tipo
+    (intención, línea, estación) que se devuelven junto con la respuesta
+    """
+    question: str = Field(..., min_length=1, max_length=300)
+    top_k: int = Field(3, ge=1, le=20)
@@ -0,0 +1,137 @@
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .data_service import DataService, DatasetState
+from ..utils.anomalies import (
+    ANOMALY_KINDS, KIND_LABELS, detect_anomalies, network_events, station_day_matrix
+)
+from ..utils.metrics import stage
+from ..utils.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+class AnomalyService:
+    """
+    Detección de anomalías de toda la red en una sola pasada vectorizada.
+
+    El dataset se acomoda en una matriz estación × día y se evalúan todas las
+    estaciones a la vez (ver utils/anomalies.py). Los episodios se guardan en
+    memoria como columnas de NumPy junto con la versión del dataset; las
+    consultas solo filtran esas columnas y el escaneo se repite únicamente
+    cuando la versión cambia (por ejemplo, tras una ingesta).
+    """
+    def __init__(self, data_service: DataService):
+        self.data_service = data_service
+        # (versión, episodios, eventos de red) del último escaneo, publicados juntos
+        self._result: Optional[Tuple[str, Dict[str, np.ndarray], Dict[str, np.ndarray]]] = None
+        self._lock = threading.Lock()
+
+    def scan(self) -> Tuple[Dict[str, np.ndarray], Dict[str, np.ndarray]]:
+        """
+        Escanea la historia completa de la red (si cambió el dataset) y devuelve
+        los episodios y los eventos de red
+        """
+        # Una sola referencia al estado: filas, índice y versión de la misma carga
+        state = self.data_service.state
+        result = self._result
+        if result is None or result[0] != state.version:
+            with self._lock:
+                result = self._result
+                if result is None or result[0] != state.version:
+                    result = (state.version, *self._scan(state))
+                    self._result = result
+        return result[1], result[2]
+
+    def _scan(self, state: DatasetState):
+        started = time.perf_counter()
+        with stage('anomaly_scan'):
+            days = state.df['fecha'].to_numpy().astype('datetime64[D]').astype(np.int64)
+            matrix, first_day = station_day_matrix(
+                days, state.df['afluencia'].to_numpy(dtype=np.float64), state.station_starts, state.station_stops
+            )
+            found = detect_anomalies(matrix)
+
+        keys = list(state.station_index.keys())
+        stations = found['station'].astype(np.int64)
+        start = (found['start'].astype(np.int64) + first_day).astype('datetime64[D]')
+        # Fecha final inclusiva
+        end = (found['stop'].astype(np.int64) - 1 + first_day).astype('datetime64[D]')
+        order = np.lexsort((found['kind'].astype(str), start))
+        episodes = {
+            'linea': np.array([keys[station][0] for station in stations], dtype=object)[order],
+            'estacion': np.array([keys[station][1] for station in stations], dtype=object)[order],
+            'tipo': found['kind'].astype(str)[order],
+            'fecha_inicio': start[order],
+            'fecha_fin': end[order],
+            'dias': (found['stop'] - found['start']).astype(np.int64)[order],
+            'impacto_pct': np.round(found['impact'].astype(np.float64) * 100, 1)[order],
+            'z': np.round(found['z'].astype(np.float64), 2)[order],
+            'fraccion_red': np.round(found['network_share'].astype(np.float64), 3)[order]
+        }
+
+        # Días en que la caída abarca gran parte de la red (feriados, contingencias)
+        starts, stops, share = network_events(found['network_share_daily'])
+        network = {
+            'fecha_inicio': (starts + first_day).astype('datetime64[D]'),
+            'fecha_fin': (stops - 1 + first_day).astype('datetime64[D]'),
+            'dias': (stops - starts).astype(np.int64),
+            'fraccion_red': np.round(share, 3)
+        }
+
+        logger.info(
+            "Anomalías detectadas: %d episodios en %d estaciones × %d días (%.2f s)",
+            len(stations), matrix.shape[0], matrix.shape[1], time.perf_counter() - started
+        )
+        return episodes, network
+
+    def get_anomalies(self, linea: Optional[str] = None, estacion: Optional[str] = None,
+                      kind: Optional[str] = None, start: Optional[str] = None,
+                      end: Optional[str] = None, min_days: int = 1, limit: int = 500) -> List[Dict]:
+        """
+        Episodios que cumplen los filtros, del más reciente al más antiguo
+        """
+        if kind is not None and kind not in ANOMALY_KINDS:
+            raise ValueError(f"Tipo de anomalía desconocido: {kind}. Disponibles: {list(ANOMALY_KINDS)}")
+        episodes, _ = self.scan()
+
+        mask = episodes['dias'] >= min_days
+        if linea:
+            mask &= episodes['linea'] == normalize_text(linea)
+        if estacion:
+            mask &= episodes['estacion'] == normalize_text(estacion)
+        if kind:
+            mask &= episodes['tipo'] == kind
+        # Episodios que se traslapan con el rango pedido
+        if start:
+            mask &= episodes['fecha_fin'] >= np.datetime64(pd.Timestamp(start).date(), 'D')
+        if end:
+            mask &= episodes['fecha_inicio'] <= np.datetime64(pd.Timestamp(end).date(), 'D')
+
+        positions = np.flatnonzero(mask)[::-1][:limit]
+        selected = {field: column[positions] for field, column in episodes.items()}
+        selected['nombre'] = np.array([KIND_LABELS[tipo] for tipo in selected['tipo']], dtype=object)
+        selected['fecha_inicio'] = np.datetime_as_string(selected['fecha_inicio'])
+        selected['fecha_fin'] = np.datetime_as_string(selected['fecha_fin'])
+        return pd.DataFrame(selected).to_dict('records')
+
+    def get_network_events(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """
+        Días con caída simultánea en gran parte de la red, del más reciente al más antiguo
+        """
+        _, network = self.scan()
+        mask = np.ones(len(network['dias']), dtype=bool)
+        if start:
+            mask &= network['fecha_fin'] >= np.datetime64(pd.Timestamp(start).date(), 'D')
+        if end:
+            mask &= network['fecha_inicio'] <= np.datetime64(pd.Timestamp(end).date(), 'D')
+        positions = np.flatnonzero(mask)[::-1]
+        selected = {field: column[positions] for field, column in network.items()}
+        selected['fecha_inicio'] = np.datetime_as_string(selected['fecha_inicio'])
+        selected['fecha_fin'] = np.datetime_as_string(selected['fecha_fin'])
+        return pd.DataFrame(selected).to_dict('records')
@@ -0,0 +1,278 @@
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from . import forecast_executor
+from .data_service import DataService
+from .forecast_service import ForecastService
+
+logger = logging.getLogger(__name__)
+
+# Columnas del reporte por corte
+FOLD_COLUMNS = [
+    'config', 'engine', 'params', 'horizon_days', 'linea', 'estacion', 'cutoff',
+    'train_rows', 'test_rows', 'rmse', 'mae', 'mape', 'r2',
+    'fit_seconds', 'peak_python_mb', 'max_rss_mb', 'error'
+]
+
+
+def _max_rss_mb() -> float:
+    """
+    Memoria residente máxima del proceso y de sus hijos (Stan corre como
+    subproceso de cmdstan). En Linux ru_maxrss está en KB.
+
+    ru_maxrss es el pico de toda la vida del proceso; el pool del backtesting
+    usa un proceso nuevo por trabajo para que sea el pico de ese trabajo.
+    """
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return max(own, children) / 1024
+
+
+def _backtest_station(station_data: pd.DataFrame, config: Dict[str, Any], horizon_days: int,
+                      cutoffs: List[pd.Timestamp], trace_memory: bool = False) -> List[Dict[str, Any]]:
+    """
+    Evalúa una configuración en todos los cortes de una estación (en un proceso del pool).
+
+    Con trace_memory se mide el pico de memoria de Python con tracemalloc; es
+    opcional porque hace varias veces más lento el ajuste de Prophet y
+    distorsionaría fit_seconds.
+    """
+    # Mismo servicio por proceso que el pool de pronósticos de la API
+    if forecast_executor._worker_service is None:
+        forecast_executor._init_worker()
+    service = forecast_executor._worker_service
+    engine = service.make_engine(config['engine'], config['params'])
+    base = {
+        'config': config['name'],
+        'engine': config['engine'],
+        'params': json.dumps(config['params'], sort_keys=True),
+        'horizon_days': horizon_days,
+        'linea': station_data['linea'].iloc[0],
+        'estacion': station_data['estacion'].iloc[0]
+    }
+
+    rows = []
+    for cutoff in cutoffs:
+        row = {**base, 'cutoff': cutoff.strftime('%Y-%m-%d')}
+        try:
+            fold = service.prepare_fold(station_data, cutoff, horizon_days)
+            row['train_rows'] = len(fold['train_data'])
+            row['test_rows'] = len(fold['test_data'])
+
+            # Tiempo y memoria del ajuste más la predicción
+            if trace_memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            forecast, _ = engine.fit_predict(fold['train_data'], fold['future_df'])
+            row['fit_seconds'] = round(time.perf_counter() - started, 4)
+            if trace_memory:
+                row['peak_python_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+                tracemalloc.stop()
+            row['max_rss_mb'] = round(_max_rss_mb(), 1)
+
+            results = fold['test_data'].merge(forecast[['ds', 'yhat']], on='ds', how='left')
+            row.update(service.compute_metrics(results['y'], results['yhat']))
+        except Exception as e:
+            if tracemalloc.is_tracing():
+                tracemalloc.stop()
+            row['error'] = str(e)
+        rows.append(row)
+    return rows
+
+
+class BacktestService:
+    """
+    Validación cruzada con origen móvil (rolling origin) de los motores de pronóstico.
+
+    Para cada estación, configuración y horizonte se toman varios cortes: el
+    último termina horizon días antes del final de los datos y los anteriores se
+    recorren step días hacia atrás. En cada corte se entrena con la historia
+    previa y se evalúa en los horizon días siguientes, registrando RMSE, MAE,
+    MAPE y R² junto con el tiempo de ajuste y la memoria (RSS máximo del
+    trabajo, incluido Stan; opcionalmente, el pico de memoria de Python).
+
+    Los trabajos (estación × configuración × horizonte) se reparten en un pool
+    de procesos. El reporte se escribe en BACKTEST_DIR (por defecto 'reports'):
+    backtest_folds.csv (un renglón por corte), backtest_summary.csv y
+    backtest_summary.json (promedios por configuración y horizonte).
+
+    Configuración por variables de entorno:
+    - BACKTEST_WORKERS: número de procesos del pool
+    - BACKTEST_DIR: directorio de los reportes
+    """
+    def __init__(self, data_service: DataService, forecast_service: ForecastService):
+        self.data_service = data_service
+        self.forecast_service = forecast_service
+        self.max_workers = int(os.getenv('BACKTEST_WORKERS', os.cpu_count() or 1))
+        self.output_dir = Path(os.getenv('BACKTEST_DIR', 'reports'))
+
+    @staticmethod
+    def build_configs(engines: List[str], changepoint_prior_scales: Optional[List[float]] = None,
+                      changepoint_penalties: Optional[List[float]] = None) -> List[Dict[str, Any]]:
+        """
+        Arma la rejilla de configuraciones: cada valor de changepoint_prior_scale
+        para Prophet y de changepoint_penalty para el motor rápido
+        """
+        grids = {
+            'prophet': ('changepoint_prior_scale', changepoint_prior_scales),
+            'fast': ('changepoint_penalty', changepoint_penalties)
+        }
+        configs = []
+        for engine in engines:
+            if engine not in grids:
+                raise ValueError(f"Motor de pronóstico desconocido: {engine}")
+            param, values = grids[engine]
+            for value in values or [None]:
+                params = {} if value is None else {param: value}
+                name = engine if value is None else f"{engine}[{param}={value}]"
+                configs.append({'name': name, 'engine': engine, 'params': params})
+        return configs
+
+    @staticmethod
+    def cutoffs(last_date: pd.Timestamp, horizon_days: int, folds: int, step_days: int) -> List[pd.Timestamp]:
+        """
+        Fechas de corte, de la más antigua a la más reciente
+        """
+        latest = last_date - pd.Timedelta(days=horizon_days)
+        return [latest - pd.Timedelta(days=step_days * k) for k in range(folds - 1, -1, -1)]
+
+    def run(self, configs: List[Dict[str, Any]], horizons: List[int], folds: int = 3,
+            step_days: int = 90, max_stations: Optional[int] = None,
+            max_workers: Optional[int] = None, trace_memory: bool = False) -> Dict[str, Any]:
+        """
+        Ejecuta el backtesting completo y escribe el reporte
+        """
+        workers = max_workers or self.max_workers
+        stations = self.data_service.get_available_stations()
+        if max_stations:
+            stations = stations[:max_stations]
+        started = time.perf_counter()
+        logger.info(
+            f"Iniciando backtesting: {len(stations)} estaciones, {len(configs)} configuraciones, "
+            f"horizontes {horizons}, {folds} cortes, {workers} procesos"
+        )
+
+        rows: List[Dict[str, Any]] = []
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=forecast_executor._init_worker,
+            # Un proceso por trabajo: ru_maxrss no arrastra el pico de trabajos anteriores
+            max_tasks_per_child=1
+        ) as pool:
+            futures = {}
+            for station in stations:
+                station_data = self.data_service.get_station_data(station['linea'], station['estacion'])
+                last_date = station_data['fecha'].max()
+                for horizon in horizons:
+                    cutoffs = self.cutoffs(last_date, horizon, folds, step_days)
+                    for config in configs:
+                        future = pool.submit(_backtest_station, station_data, config, horizon, cutoffs, trace_memory)
+                        futures[future] = f"{station['linea']} - {station['estacion']} / {config['name']} / {horizon} días"
+
+            for completed, future in enumerate(as_completed(futures), start=1):
+                try:
+                    rows.extend(future.result())
+                except Exception as e:
+                    logger.error(f"Error en el backtesting de {futures[future]}: {str(e)}")
+                    continue
+                logger.info(f"[{completed}/{len(futures)}] {futures[future]}")
+
+        summary = self.summarize(rows)
+        report = {
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - started, 3),
+            'workers': workers,
+            'stations': len(stations),
+            'horizons': horizons,
+            'folds': folds,
+            'step_days': step_days,
+            'trace_memory': trace_memory,
+            'summary': summary
+        }
+        self.write_report(rows, report)
+        logger.info(f"Backtesting terminado en {report['seconds']:.1f} s; reporte en {self.output_dir}")
+        return report
+
+    @staticmethod
+    def summarize(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Promedia métricas y costo por configuración y horizonte
+        """
+        if not rows:
+            return []
+        df = pd.DataFrame(rows).reindex(columns=FOLD_COLUMNS)
+        ok = df[df['error'].isna()]
+        grouped = ok.groupby(['config', 'horizon_days'], sort=True)
+        summary = grouped.agg(
+            engine=('engine', 'first'),
+            params=('params', 'first'),
+            folds=('cutoff', 'size'),
+            rmse=('rmse', 'mean'),
+            mae=('mae', 'mean'),
+            mape=('mape', 'mean'),
+            mape_median=('mape', 'median'),
+            r2=('r2', 'mean'),
+            fit_seconds_mean=('fit_seconds', 'mean'),
+            fit_seconds_p95=('fit_seconds', lambda values: float(np.percentile(values, 95))),
+            peak_python_mb=('peak_python_mb', 'max'),
+            max_rss_mb=('max_rss_mb', 'max')
+        ).reset_index()
+        failed = df[df['error'].notna()].groupby(['config', 'horizon_days']).size().rename('failed')
+        summary = summary.merge(failed, on=['config', 'horizon_days'], how='left')
+        summary['failed'] = summary['failed'].fillna(0).astype(int)
+        summary = summary.sort_values(['horizon_days', 'mape'])
+        return json.loads(summary.to_json(orient='records'))
+
+    def write_report(self, rows: List[Dict[str, Any]], report: Dict[str, Any]):
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.output_dir / 'backtest_folds.csv', 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=FOLD_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+        pd.DataFrame(report['summary']).to_csv(self.output_dir / 'backtest_summary.csv', index=False)
+        with open(self.output_dir / 'backtest_summary.json', 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    # python -m app.services.backtest_service --engines prophet,fast --horizons 30,90
+    import argparse
+
+    def _list(cast):
+        return lambda value: [cast(item) for item in value.split(',') if item]
+
+    parser = argparse.ArgumentParser(description="Backtesting con origen móvil de los motores de pronóstico")
+    parser.add_argument('--engines', type=_list(str), default=['prophet', 'fast'], help="Motores a evaluar")
+    parser.add_argument('--changepoint-prior-scales', type=_list(float), default=None,
+                        help="Valores de changepoint_prior_scale para Prophet (p. ej. 0.01,0.05,0.5)")
+    parser.add_argument('--changepoint-penalties', type=_list(float), default=None,
+                        help="Valores de changepoint_penalty para el motor rápido")
+    parser.add_argument('--horizons', type=_list(int), default=[30, 90], help="Horizontes en días")
+    parser.add_argument('--folds', type=int, default=3, help="Número de cortes por estación")
+    parser.add_argument('--step', type=int, default=90, help="Días entre cortes")
+    parser.add_argument('--stations', type=int, default=None, help="Limitar a las primeras N estaciones")
+    parser.add_argument('--workers', type=int, default=None, help="Número de procesos del pool")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="Medir el pico de memoria de Python (hace más lentos los ajustes)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    service = BacktestService(DataService(), ForecastService())
+    configs = service.build_configs(args.engines, args.changepoint_prior_scales, args.changepoint_penalties)
+    result = service.run(configs, args.horizons, args.folds, args.step, args.stations, args.workers,
+                         args.trace_memory)
+    raise SystemExit(0 if result['summary'] else 1)
@@ -0,0 +1,227 @@
+import copy
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .data_service import DataService
+from .forecast_service import ForecastService
+from .forecast_executor import _init_worker, _run_forecast
+
+logger = logging.getLogger(__name__)
+
+
+def _fit_station(station_data: pd.DataFrame, engine: Optional[str] = None) -> float:
+    """
+    Ajusta el pronóstico de una estación dentro de un proceso del pool.
+
+    El resultado se guarda en el cache persistente desde el propio proceso, así que
+    solo se devuelve la duración del ajuste.
+    """
+    started = time.perf_counter()
+    _run_forecast(station_data, engine)
+    return time.perf_counter() - started
+
+
+class BatchForecastService:
+    """
+    Genera los pronósticos de toda la red en un pool de procesos y los guarda en
+    el cache persistente que /api/forecast consulta primero.
+
+    El avance se escribe en un manifiesto JSON (batch_forecast.json en el
+    directorio del cache) después de cada estación. Si el proceso se interrumpe,
+    la siguiente ejecución omite las estaciones cuyo pronóstico ya está en el
+    cache para los datos actuales.
+
+    Configuración por variables de entorno:
+    - BATCH_FORECAST_WORKERS: número de procesos del pool del lote
+    """
+    MANIFEST_NAME = 'batch_forecast.json'
+
+    def __init__(self, data_service: DataService, forecast_service: ForecastService):
+        self.data_service = data_service
+        self.forecast_service = forecast_service
+        self.max_workers = int(os.getenv('BATCH_FORECAST_WORKERS', os.cpu_count() or 1))
+        self.manifest_path = Path(forecast_service.cache.cache_dir) / self.MANIFEST_NAME
+        self._thread: Optional[threading.Thread] = None
+        # Protege el manifiesto: el hilo del lote lo modifica mientras la API lo consulta
+        self._lock = threading.Lock()
+        self._manifest: Dict[str, Any] = self._read_manifest()
+
+    def _read_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _write_manifest(self):
+        """
+        Escribe el manifiesto de forma atómica; se llama con self._lock tomado
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.manifest_path.parent, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(self._manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> Dict[str, Any]:
+        """
+        Estado del último lote: avance, tiempos y errores por estación
+        """
+        with self._lock:
+            manifest = copy.deepcopy(self._manifest)
+        return {'running': self.running, **manifest}
+
+    def _record(self, name: str, **fields):
+        with self._lock:
+            station = self._manifest['stations'].setdefault(name, {})
+            station.update(fields)
+            summary = self._manifest['summary']
+            summary[fields['status']] = summary.get(fields['status'], 0) + 1
+            summary['completed'] += 1
+            self._write_manifest()
+            progress = f"{summary['completed']}/{self._manifest['total']}"
+        logger.info(
+            f"[{progress}] {name}: {fields['status']}"
+            + (f" ({fields['seconds']:.1f} s)" if 'seconds' in fields else "")
+        )
+
+    def run(self, max_workers: Optional[int] = None, engine: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Ejecuta el lote completo de forma síncrona
+        """
+        forecast_engine = self.forecast_service.get_engine(engine)
+        workers = max_workers or self.max_workers
+        stations = self.data_service.get_available_stations()
+        started = time.perf_counter()
+
+        with self._lock:
+            self._manifest = {
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'finished_at': None,
+                'workers': workers,
+                'engine': forecast_engine.name,
+                'total': len(stations),
+                'summary': {'completed': 0},
+                'stations': {}
+            }
+            self._write_manifest()
+        logger.info(f"Iniciando lote de pronósticos: {len(stations)} estaciones, {workers} procesos")
+
+        if not forecast_engine.runs_in_pool:
+            self._run_in_process(stations, forecast_engine.name)
+        else:
+            self._run_in_pool(stations, forecast_engine.name, workers)
+
+        with self._lock:
+            self._manifest['finished_at'] = datetime.now().isoformat(timespec='seconds')
+            self._manifest['seconds'] = round(time.perf_counter() - started, 3)
+            self._write_manifest()
+            manifest = copy.deepcopy(self._manifest)
+        logger.info(f"Lote de pronósticos terminado en {manifest['seconds']:.1f} s: {manifest['summary']}")
+        return manifest
+
+    def _pending_stations(self, stations: List[Dict], engine: str) -> List[Tuple[str, pd.DataFrame]]:
+        """
+        Datos de las estaciones que aún no tienen pronóstico en el cache
+        """
+        pending = []
+        for station in stations:
+            name = f"{station['linea']} - {station['estacion']}"
+            try:
+                station_data = self.data_service.get_station_data(station['linea'], station['estacion'])
+            except Exception as e:
+                self._record(name, status='failed', error=str(e))
+                continue
+
+            # Reanudar: las estaciones ya pronosticadas con los datos actuales se omiten
+            if self.forecast_service.get_cached_forecast(station_data, engine) is not None:
+                self._record(name, status='cached')
+                continue
+
+            pending.append((name, station_data))
+        return pending
+
+    def _run_in_process(self, stations: List[Dict], engine: str):
+        """
+        Ajusta en bloque, dentro de este proceso, con un motor vectorizado
+        """
+        pending = self._pending_stations(stations, engine)
+        if not pending:
+            return
+        started = time.perf_counter()
+        try:
+            self.forecast_service.generate_forecasts([data for _, data in pending], engine)
+        except Exception as e:
+            for name, _ in pending:
+                self._record(name, status='failed', error=str(e))
+            return
+        # El ajuste es conjunto: se reporta el tiempo promedio por estación
+        seconds = round((time.perf_counter() - started) / len(pending), 3)
+        for name, _ in pending:
+            self._record(name, status='fitted', seconds=seconds)
+
+    def _run_in_pool(self, stations: List[Dict], engine: str, workers: int):
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        ) as pool:
+            futures = {
+                pool.submit(_fit_station, station_data, engine): name
+                for name, station_data in self._pending_stations(stations, engine)
+            }
+
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    self._record(name, status='fitted', seconds=round(future.result(), 3))
+                except Exception as e:
+                    logger.error(f"Error en el pronóstico de {name}: {str(e)}")
+                    self._record(name, status='failed', error=str(e))
+
+    def start(self, max_workers: Optional[int] = None, engine: Optional[str] = None) -> bool:
+        """
+        Inicia el lote en un hilo de fondo; regresa False si ya hay uno en curso
+        """
+        if self.running:
+            return False
+        self._thread = threading.Thread(
+            target=self._run_safely, args=(max_workers, engine), name='batch-forecast', daemon=True
+        )
+        self._thread.start()
+        return True
+
+    def _run_safely(self, max_workers: Optional[int], engine: Optional[str]):
+        try:
+            self.run(max_workers, engine)
+        except Exception as e:
+            logger.error(f"Error en el lote de pronósticos: {str(e)}", exc_info=True)
+
+
+if __name__ == '__main__':
+    # Refresco nocturno: python -m app.services.batch_service [--workers N]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Genera los pronósticos de todas las estaciones")
+    parser.add_argument('--workers', type=int, default=None, help="Número de procesos del pool")
+    parser.add_argument('--engine', default=None, help="Motor de pronóstico (prophet o fast)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    batch = BatchForecastService(DataService(), ForecastService())
+    manifest = batch.run(args.workers, args.engine)
+    raise SystemExit(1 if manifest['summary'].get('failed') else 0)
@@ -1,130 +1,310 @@
 import pandas as pd
 import numpy as np
-from typing import Dict, List
+import hashlib
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
 import logging
-from ..utils.text_utils import normalize_text
+from ..utils.text_utils import normalize_text, normalize_series
+from .query_service import QueryService
+from ..utils.metrics import stage
+from ..utils.snapshot import load_snapshot, write_snapshot
+from ..utils.station_search import StationSearchIndex
+from ..utils.aggregates import (
+    GRANULARITY_FREQ,
+    build_period_cube,
+    cube_station_bounds,
+    period_labels,
+    rollup,
+    slice_cube,
+    summarize
+)
 
 logger = logging.getLogger(__name__)
 
+class DatasetState:
+    """
+    Estado publicado del dataset: filas, índice por estación, tablas agregadas,
+    catálogo y versión. No se modifica después de publicarse; cada carga o
+    ingesta construye uno nuevo y lo publica con una sola asignación, así que
+    quien toma una referencia al inicio de una consulta ve datos consistentes
+    entre sí aunque haya una ingesta en curso.
+    """
+    def __init__(self, df: pd.DataFrame, station_starts: np.ndarray, station_stops: np.ndarray,
+                 station_index: Dict[Tuple[str, str], Tuple[int, int]],
+                 cubes: Dict[str, Dict[str, np.ndarray]],
+                 cube_index: Dict[str, Dict[Tuple[str, str], Tuple[int, int]]],
+                 catalogue_df: pd.DataFrame, stations_catalogue: List[Dict], lines_summary: List[Dict],
+                 station_search: StationSearchIndex, version: str):
+        self.df = df
+        self.station_starts = station_starts
+        self.station_stops = station_stops
+        self.station_index = station_index
+        # Tablas agregadas estación × periodo ('W' y 'M') y su índice por estación
+        self.cubes = cubes
+        self.cube_index = cube_index
+        self.catalogue_df = catalogue_df
+        self.stations_catalogue = stations_catalogue
+        self.lines_summary = lines_summary
+        self.station_search = station_search
+        # Huella del contenido del dataset; cambia con cada carga o ingesta que modifique datos
+        self.version = version
+
+    def station_rows(self, linea_norm: str, estacion_norm: str) -> pd.DataFrame:
+        """
+        Filas de una estación (ordenadas por fecha) usando el índice
+        """
+        bounds = self.station_index.get((linea_norm, estacion_norm))
+        if bounds is None:
+            return self.df.iloc[0:0]
+        start, stop = bounds
+        return self.df.iloc[start:stop]
+
+
 class DataService:
-    def __init__(self):
-        self.df = None
-        self._stations_cache = None
+    """
+    Carga el dataset de afluencia y responde consultas por estación.
+
+    Todo lo derivado del dataset vive en un DatasetState inmutable (self.state);
+    las consultas toman una sola referencia al inicio y las ingestas publican
+    uno nuevo reemplazando ese atributo.
+
+    Configuración por variables de entorno:
+    - DATA_PATH: ruta del CSV de afluencia
+    - DATA_SNAPSHOT: '0' para desactivar el snapshot columnar mapeado en memoria
+    """
+    def __init__(self, use_snapshot: Optional[bool] = None):
+        self.data_path = os.getenv('DATA_PATH', '../data/afluenciastc_simple_02_2024.csv')
+        if use_snapshot is None:
+            use_snapshot = os.getenv('DATA_SNAPSHOT', '1') != '0'
+        self.use_snapshot = use_snapshot
+        self.state: Optional[DatasetState] = None
+        self._ingest_lock = threading.Lock()
+        # Motor analítico opcional (DuckDB) sobre el mismo dataset
+        self.query = QueryService()
         self.load_data()
 
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.state.df
+
+    @property
+    def version(self) -> Optional[str]:
+        return self.state.version if self.state is not None else None
+
     def load_data(self):
         """
         Carga y preprocesa los datos iniciales
         """
         try:
             logger.info("Cargando datos...")
-            self.df = pd.read_csv('../data/afluenciastc_simple_02_2024.csv')
-            
-            # Convertir fechas
-            self.df['fecha'] = pd.to_datetime(self.df['fecha'])
             
-            # Normalizar columnas categóricas
-            self.df['linea'] = self.df['linea'].apply(normalize_text)
-            self.df['estacion'] = self.df['estacion'].apply(normalize_text)
-            
-            # Ordenar por fecha
-            self.df = self.df.sort_values('fecha')
+            # Usar el snapshot columnar (ya normalizado y ordenado) si está vigente
+            snapshot = load_snapshot(self.data_path) if self.use_snapshot else None
+            if snapshot is not None:
+                df = self._validate_data(snapshot)
+            else:
+                df = self._load_csv()
+                if self.use_snapshot:
+                    write_snapshot(df, self.data_path)
             
-            # Validar datos
-            self._validate_data()
+            # Construir índice, catálogo de estaciones y tablas agregadas
+            starts, stops, station_index = self._build_station_index(df)
+            cubes, cube_index = self._build_aggregate_cubes(df, starts, stops, list(station_index))
+            self.query.register(df)
+            self.state = self._make_state(
+                df, starts, stops, station_index, cubes, cube_index, self._aggregate_stations(df)
+            )
             
-            logger.info(f"Datos cargados exitosamente. Total filas: {len(self.df)}")
+            logger.info(f"Datos cargados exitosamente. Total filas: {len(df)}")
             
         except Exception as e:
             logger.error(f"Error al cargar datos: {str(e)}", exc_info=True)
             raise Exception(f"Error en la carga de datos: {str(e)}")
 
-    def _validate_data(self):
+    def _load_csv(self) -> pd.DataFrame:
+        """
+        Lee el CSV y aplica el preprocesamiento completo
+        """
+        df = pd.read_csv(self.data_path)
+        
+        # Convertir fechas
+        df['fecha'] = pd.to_datetime(df['fecha'])
+        
+        # Normalizar columnas categóricas (solo los valores únicos)
+        df['linea'] = normalize_series(df['linea'])
+        df['estacion'] = normalize_series(df['estacion'])
+        
+        # Ordenar por estación y fecha para que cada estación ocupe un bloque contiguo.
+        # Si una fecha aparece más de una vez (correcciones agregadas por ingest) prevalece la última
+        df = df.sort_values(['linea', 'estacion', 'fecha'], kind='stable')
+        df = df.drop_duplicates(['linea', 'estacion', 'fecha'], keep='last').reset_index(drop=True)
+        
+        # Validar datos y conservar solo las columnas que usa el servicio
+        df = self._validate_data(df)
+        return df[['fecha', 'linea', 'estacion', 'afluencia']]
+
+    @staticmethod
+    def _validate_data(df: pd.DataFrame) -> pd.DataFrame:
         """
         Valida la integridad de los datos cargados
         """
         # Verificar columnas requeridas
         required_columns = ['fecha', 'linea', 'estacion', 'afluencia']
-        missing_columns = [col for col in required_columns if col not in self.df.columns]
+        missing_columns = [col for col in required_columns if col not in df.columns]
         if missing_columns:
             raise ValueError(f"Columnas faltantes en el dataset: {missing_columns}")
         
         # Verificar valores nulos
-        null_counts = self.df[required_columns].isnull().sum()
+        null_counts = df[required_columns].isnull().sum()
         if null_counts.any():
             logger.warning(f"Valores nulos encontrados:\n{null_counts}")
             
             # Rellenar valores nulos en afluencia
-            self.df['afluencia'] = self.df['afluencia'].interpolate(method='time')
+            df['afluencia'] = df['afluencia'].interpolate(method='time')
             
         # Verificar valores negativos en afluencia
-        if (self.df['afluencia'] < 0).any():
+        if (df['afluencia'] < 0).any():
             logger.warning("Se encontraron valores negativos en afluencia")
-            self.df['afluencia'] = self.df['afluencia'].clip(lower=0)
+            df['afluencia'] = df['afluencia'].clip(lower=0)
+        
+        return df
+
+    @staticmethod
+    def _build_station_index(df: pd.DataFrame):
+        """
+        Construye el índice (linea, estacion) -> rango de filas [inicio, fin)
+        """
+        linea_codes = df['linea'].cat.codes.to_numpy()
+        estacion_codes = df['estacion'].cat.codes.to_numpy()
+        
+        # Inicio de cada bloque: filas donde cambia la línea o la estación
+        changes = (linea_codes[1:] != linea_codes[:-1]) | (estacion_codes[1:] != estacion_codes[:-1])
+        starts = np.flatnonzero(np.r_[True, changes]) if len(df) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(df)]
+        
+        lineas = df['linea'].to_numpy()[starts]
+        estaciones = df['estacion'].to_numpy()[starts]
+        station_index = {
+            (linea, estacion): (int(start), int(stop))
+            for linea, estacion, start, stop in zip(lineas, estaciones, starts, stops)
+        }
+        logger.info(f"Índice de estaciones construido: {len(station_index)} estaciones")
+        return starts, stops, station_index
 
-    def _convert_to_json_serializable(self, data):
+    @staticmethod
+    def _build_aggregate_cubes(df: pd.DataFrame, station_starts: np.ndarray, station_stops: np.ndarray,
+                               keys: List[Tuple[str, str]]):
         """
-        Convierte tipos de NumPy a tipos nativos de Python para evitar errores de serialización
+        Precalcula las tablas estación × semana y estación × mes.
+        Trimestres y años se obtienen reagregando la tabla mensual.
         """
-        if isinstance(data, dict):
-            return {k: self._convert_to_json_serializable(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._convert_to_json_serializable(item) for item in data]
-        elif isinstance(data, (np.int64, np.int32, np.int16, np.int8)):
-            return int(data)
-        elif isinstance(data, (np.float64, np.float32, np.float16)):
-            return float(data)
-        elif isinstance(data, np.bool_):
-            return bool(data)
-        elif isinstance(data, np.ndarray):
-            return self._convert_to_json_serializable(data.tolist())
-        else:
-            return data
+        fecha = df['fecha'].to_numpy()
+        afluencia = df['afluencia'].to_numpy()
+        cubes = {}
+        cube_index = {}
+        
+        for freq in ('W', 'M'):
+            cube = build_period_cube(fecha, afluencia, station_starts, station_stops, freq)
+            starts, stops = cube_station_bounds(cube, len(keys))
+            cubes[freq] = cube
+            cube_index[freq] = {
+                key: (int(start), int(stop)) for key, start, stop in zip(keys, starts, stops)
+            }
+        logger.info(f"Tablas agregadas construidas: {len(cubes['M']['period'])} filas mensuales")
+        return cubes, cube_index
 
-    def get_time_series(self, linea: str, estacion: str) -> Dict:
+    @staticmethod
+    def _compute_version(station_index: Dict[Tuple[str, str], Tuple[int, int]],
+                         cubes: Dict[str, Dict[str, np.ndarray]]) -> str:
         """
-        Obtiene la serie temporal de afluencia para una estación específica
+        Calcula la versión del dataset a partir de la tabla semanal (estaciones,
+        conteos, sumas, sumas de cuadrados, mínimos y máximos). Es mucho más chica
+        que los datos diarios, determinista entre procesos y reinicios, y cambia
+        con cualquier fila agregada o corregida.
+        """
+        digest = hashlib.sha256()
+        for linea, estacion in station_index:
+            digest.update(f"{linea}\x1f{estacion}\x1e".encode('utf-8'))
+        cube = cubes['W']
+        for field in ('station', 'period', 'count', 'sum', 'sumsq', 'min', 'max'):
+            digest.update(np.ascontiguousarray(cube[field]).tobytes())
+        return digest.hexdigest()[:16]
+
+    def get_time_series(self, linea: str, estacion: str, start: Optional[str] = None,
+                        end: Optional[str] = None, granularity: str = 'month') -> Dict:
         """
+        Obtiene la serie temporal de afluencia para una estación específica,
+        agregada por semana, mes, trimestre o año y opcionalmente acotada por fechas
+        """
+        # Fechas inválidas son un error de la solicitud, no una estación inexistente
+        self._validate_date('start', start)
+        self._validate_date('end', end)
         try:
             # Normalizar parámetros de búsqueda
             linea_norm = normalize_text(linea)
             estacion_norm = normalize_text(estacion)
             
-            logger.info(f"Buscando datos para Línea: {linea_norm}, Estación: {estacion_norm}")
+            if granularity not in GRANULARITY_FREQ:
+                raise ValueError(f"Granularidad no soportada: {granularity}")
+            freq = GRANULARITY_FREQ[granularity]
+            base_freq = 'W' if freq == 'W' else 'M'
+            
+            logger.debug("Buscando datos para Línea: %s, Estación: %s", linea_norm, estacion_norm)
             
-            # Buscar datos
-            mask = (self.df['linea'] == linea_norm) & (self.df['estacion'] == estacion_norm)
-            station_data = self.df[mask].copy()
+            # Una sola referencia al estado: filas y tablas agregadas de la misma versión
+            state = self.state
+            with stage('filter'):
+                station_data = state.station_rows(linea_norm, estacion_norm)
             
             if station_data.empty:
-                raise ValueError(f"No se encontraron datos para la estación {estacion} en la línea {linea}")
-            
-            # Calcular estadísticas descriptivas
-            stats = self._calculate_station_stats(station_data)
-            
-            # Agrupar por mes - usar valores nativos Python para evitar problemas de serialización
-            monthly_data = []
-            for period, group in station_data.groupby(station_data['fecha'].dt.to_period('M')):
-                month_record = {
-                    'fecha': str(period),
-                    'mean': float(group['afluencia'].mean()),
-                    'std': float(group['afluencia'].std()),
-                    'min': float(group['afluencia'].min()),
-                    'max': float(group['afluencia'].max()),
+                raise self._station_not_found(linea, estacion, state)
+            
+            with stage('aggregate'):
+                # Calcular estadísticas descriptivas
+                stats = self._calculate_station_stats(station_data)
+            
+                # Tomar el bloque de la estación en la tabla agregada y acotarlo por fechas
+                cube_start, cube_stop = state.cube_index[base_freq][(linea_norm, estacion_norm)]
+                cube = slice_cube(state.cubes[base_freq], cube_start, cube_stop)
+                first, last = 0, len(cube['period'])
+                if start:
+                    first = np.searchsorted(cube['period'], pd.Timestamp(start).to_period(base_freq).ordinal, side='left')
+                if end:
+                    last = np.searchsorted(cube['period'], pd.Timestamp(end).to_period(base_freq).ordinal, side='right')
+                cube = slice_cube(cube, first, max(first, last))
+            
+                # Reagregar a la granularidad pedida y serializar
+                cube = rollup(cube, base_freq, freq)
+                summary = summarize(cube)
+                std = np.where(np.isnan(summary['std']), None, summary['std'])
+            
+            series_data = [
+                {
+                    'fecha': label,
+                    'mean': mean,
+                    'std': std_value,
+                    'min': min_value,
+                    'max': max_value,
                     'linea': linea_norm,
                     'estacion': estacion_norm,
-                    'afluencia': float(group['afluencia'].mean())  # Para compatibilidad con el gráfico
+                    'afluencia': mean  # Para compatibilidad con el gráfico
                 }
-                monthly_data.append(month_record)
-            
-            # Ordenar por fecha
-            monthly_data.sort(key=lambda x: x['fecha'])
+                for label, mean, std_value, min_value, max_value in zip(
+                    period_labels(cube['period'], freq),
+                    summary['mean'].tolist(),
+                    std.tolist(),
+                    summary['min'].tolist(),
+                    summary['max'].tolist()
+                )
+            ]
             
             result = {
                 'estacion': estacion_norm,
                 'linea': linea_norm,
-                'data': monthly_data,
-                'stats': self._convert_to_json_serializable(stats)
+                'granularity': granularity,
+                'data': series_data,
+                'stats': stats
             }
             
             return result
@@ -133,6 +313,17 @@ class DataService:
             logger.error(f"Error al obtener serie temporal: {str(e)}", exc_info=True)
             raise Exception(f"Error al obtener datos de la estación: {str(e)}")
 
+    @staticmethod
+    def _validate_date(name: str, value: Optional[str]):
+        if value is None:
+            return
+        try:
+            valid = not pd.isna(pd.Timestamp(value))
+        except (ValueError, TypeError):
+            valid = False
+        if not valid:
+            raise ValueError(f"Fecha inválida en '{name}': {value}. Use el formato AAAA-MM-DD")
+
     def _calculate_station_stats(self, station_data: pd.DataFrame) -> Dict:
         """
         Calcula estadísticas descriptivas para una estación
@@ -153,47 +344,82 @@ class DataService:
         }
         return stats
 
+    @staticmethod
+    def _aggregate_stations(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Agregación por estación (una sola pasada) usada por el catálogo
+        """
+        grouped = df.groupby(['linea', 'estacion'], observed=True, sort=True).agg(
+            total_registros=('afluencia', 'size'),
+            afluencia_total=('afluencia', 'sum'),
+            promedio_afluencia=('afluencia', 'mean'),
+            minimo_afluencia=('afluencia', 'min'),
+            maximo_afluencia=('afluencia', 'max'),
+            fecha_inicio=('fecha', 'min'),
+            fecha_fin=('fecha', 'max')
+        ).reset_index()
+        grouped['linea'] = grouped['linea'].astype(str)
+        grouped['estacion'] = grouped['estacion'].astype(str)
+        return grouped
+
+    def _make_state(self, df: pd.DataFrame, starts: np.ndarray, stops: np.ndarray,
+                    station_index: Dict[Tuple[str, str], Tuple[int, int]],
+                    cubes: Dict[str, Dict[str, np.ndarray]],
+                    cube_index: Dict[str, Dict[Tuple[str, str], Tuple[int, int]]],
+                    grouped: pd.DataFrame) -> DatasetState:
+        """
+        Construye el catálogo de estaciones y el resumen por línea en una sola agregación
+        (la agregación por estación se recibe ya calculada) y arma el estado completo
+        """
+        
+        # Resumen por línea a partir de la misma agregación
+        lines = grouped.groupby('linea', sort=True).agg(
+            total_estaciones=('estacion', 'size'),
+            total_registros=('total_registros', 'sum'),
+            afluencia_total=('afluencia_total', 'sum'),
+            fecha_inicio=('fecha_inicio', 'min'),
+            fecha_fin=('fecha_fin', 'max')
+        ).reset_index()
+        lines['promedio_afluencia'] = lines['afluencia_total'] / lines['total_registros']
+        
+        stations = grouped.drop(columns='afluencia_total')
+        for frame in (stations, lines):
+            frame['fecha_inicio'] = frame['fecha_inicio'].dt.strftime('%Y-%m-%d')
+            frame['fecha_fin'] = frame['fecha_fin'].dt.strftime('%Y-%m-%d')
+        
+        # to_dict ya devuelve tipos nativos de Python
+        stations_catalogue = stations.to_dict('records')
+        logger.info(f"Catálogo de estaciones generado. {len(stations_catalogue)} estaciones encontradas.")
+        return DatasetState(
+            df, starts, stops, station_index, cubes, cube_index, grouped,
+            stations_catalogue, lines.to_dict('records'), StationSearchIndex(stations_catalogue),
+            self._compute_version(station_index, cubes)
+        )
+
     def get_available_stations(self) -> List[Dict]:
         """
         Retorna la lista de estaciones disponibles por línea con metadata
         """
-        try:
-            # Para mejorar rendimiento, crear una cache si no existe
-            if not hasattr(self, '_stations_cache') or self._stations_cache is None:
-                logger.info("Generando cache de estaciones...")
-                
-                result = []
-                # Obtener líneas y estaciones únicas eficientemente
-                unique_combos = self.df[['linea', 'estacion']].drop_duplicates()
-                
-                for _, row in unique_combos.iterrows():
-                    linea = row['linea']
-                    estacion = row['estacion']
-                    
-                    # Filtrar estación específica
-                    station_data = self.df[(self.df['linea'] == linea) & 
-                                          (self.df['estacion'] == estacion)]
-                    
-                    if not station_data.empty:
-                        station_info = {
-                            'linea': linea,
-                            'estacion': estacion,
-                            'total_registros': int(len(station_data)),
-                            'promedio_afluencia': float(station_data['afluencia'].mean())
-                        }
-                        result.append(station_info)
-                
-                # Guardar en cache
-                self._stations_cache = result
-                logger.info(f"Cache de estaciones generada. {len(result)} estaciones encontradas.")
-            else:
-                logger.info("Usando cache de estaciones existente.")
-                
-            return self._stations_cache
-            
-        except Exception as e:
-            logger.error(f"Error al obtener estaciones disponibles: {str(e)}", exc_info=True)
-            raise Exception(f"Error al obtener lista de estaciones: {str(e)}")
+        return self.state.stations_catalogue
+
+    def search_stations(self, query: str, limit: int = 10, linea: Optional[str] = None) -> List[Dict]:
+        """
+        Busca estaciones por prefijo o por nombre aproximado (tolera errores de escritura)
+        """
+        return self.state.station_search.search(query, limit, linea)
+
+    def _station_not_found(self, linea: str, estacion: str, state: Optional[DatasetState] = None) -> ValueError:
+        message = f"No se encontraron datos para la estación {estacion} en la línea {linea}"
+        suggestions = (state or self.state).station_search.suggest(estacion, linea)
+        if suggestions:
+            message += f". ¿Quisiste decir: {', '.join(suggestions)}?"
+        return ValueError(message)
+
+    def get_lines_summary(self) -> List[Dict]:
+        """
+        Retorna el resumen de afluencia por línea
+        """
+        return self.state.lines_summary
     
     def get_station_data(self, linea: str, estacion: str) -> pd.DataFrame:
         """
@@ -204,25 +430,233 @@ class DataService:
             linea_norm = normalize_text(linea)
             estacion_norm = normalize_text(estacion)
             
-            logger.info(f"Obteniendo datos para pronóstico. Línea: {linea_norm}, Estación: {estacion_norm}")
+            logger.debug("Obteniendo datos para pronóstico. Línea: %s, Estación: %s", linea_norm, estacion_norm)
             
-            # Filtrar datos
-            mask = (self.df['linea'] == linea_norm) & (self.df['estacion'] == estacion_norm)
-            station_data = self.df[mask].copy()
+            # Filtrar datos (el bloque de la estación ya está ordenado por fecha)
+            state = self.state
+            with stage('filter'):
+                station_data = state.station_rows(linea_norm, estacion_norm).copy()
             
             if station_data.empty:
-                raise ValueError(f"No se encontraron datos para la estación {estacion} en la línea {linea}")
-            
-            # Ordenar por fecha
-            station_data = station_data.sort_values('fecha')
+                raise self._station_not_found(linea, estacion, state)
             
             # Verificar que haya suficientes datos para un pronóstico
             if len(station_data) < 90:  # Al menos 3 meses de datos
-                logger.warning(f"Datos insuficientes para un pronóstico confiable: {len(station_data)} registros")
+                logger.warning("Datos insuficientes para un pronóstico confiable: %d registros", len(station_data))
             
-            logger.info(f"Datos obtenidos: {len(station_data)} registros desde {station_data['fecha'].min().date()} hasta {station_data['fecha'].max().date()}")
+            # Solo se calculan las fechas si el mensaje se va a escribir
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(
+                    "Datos obtenidos: %d registros desde %s hasta %s",
+                    len(station_data), station_data['fecha'].iloc[0].date(), station_data['fecha'].iloc[-1].date()
+                )
             return station_data
             
         except Exception as e:
             logger.error(f"Error al obtener datos para pronóstico: {str(e)}", exc_info=True)
-            raise Exception(f"Error al preparar datos para pronóstico: {str(e)}")
\ No newline at end of file
+            raise Exception(f"Error al preparar datos para pronóstico: {str(e)}")
+
+    @staticmethod
+    def _prepare_new_rows(new_rows: pd.DataFrame, dtype) -> pd.DataFrame:
+        """
+        Valida y normaliza las filas de una ingesta
+        """
+        required_columns = ['fecha', 'linea', 'estacion', 'afluencia']
+        missing_columns = [col for col in required_columns if col not in new_rows.columns]
+        if missing_columns:
+            raise ValueError(f"Columnas faltantes en los datos nuevos: {missing_columns}")
+        
+        rows = new_rows[required_columns].copy()
+        rows['fecha'] = pd.to_datetime(rows['fecha'])
+        rows['linea'] = normalize_series(rows['linea']).astype(object)
+        rows['estacion'] = normalize_series(rows['estacion']).astype(object)
+        rows['afluencia'] = pd.to_numeric(rows['afluencia'])
+        
+        invalid = rows.isnull().any(axis=1)
+        if invalid.any():
+            logger.warning(f"Se descartan {int(invalid.sum())} filas nuevas con valores nulos")
+            rows = rows[~invalid]
+        if (rows['afluencia'] < 0).any():
+            logger.warning("Se encontraron valores negativos en afluencia")
+            rows['afluencia'] = rows['afluencia'].clip(lower=0)
+        rows['afluencia'] = rows['afluencia'].astype(dtype)
+        
+        # Una fila por estación y fecha (la última del archivo prevalece)
+        return rows.drop_duplicates(['linea', 'estacion', 'fecha'], keep='last')
+
+    @staticmethod
+    def _merge_station_rows(state: DatasetState, key: Tuple[str, str],
+                            rows: pd.DataFrame) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, int]]:
+        """
+        Combina las filas nuevas de una estación con su bloque actual.
+        Regresa (bloque combinado, filas aceptadas, filas corregidas) o None si no hay cambios.
+        """
+        columns = ['fecha', 'afluencia']
+        block = state.station_rows(*key)[columns]
+        rows = rows[columns]
+        if block.empty:
+            rows = rows.sort_values('fecha').reset_index(drop=True)
+            return rows, rows, 0
+        
+        current = pd.Series(block['afluencia'].to_numpy(), index=block['fecha'].to_numpy())
+        existing = rows['fecha'].isin(current.index)
+        added = rows[~existing]
+        overlap = rows[existing]
+        corrected = overlap[current.reindex(overlap['fecha']).to_numpy() != overlap['afluencia'].to_numpy()]
+        if added.empty and corrected.empty:
+            return None
+        
+        kept = block[~block['fecha'].isin(corrected['fecha'])]
+        merged = pd.concat([kept, added, corrected], ignore_index=True).sort_values('fecha', kind='stable')
+        return merged.reset_index(drop=True), pd.concat([added, corrected]), len(corrected)
+
+    @staticmethod
+    def _splice_aggregate_cubes(state: DatasetState, keys: List[Tuple[str, str]],
+                                changed: Dict[Tuple[str, str], pd.DataFrame]):
+        """
+        Arma las tablas agregadas reutilizando los bloques de las estaciones sin cambios
+        y recalculando solo las estaciones modificadas
+        """
+        cubes = {}
+        cube_index = {}
+        for freq in ('W', 'M'):
+            parts = []
+            for key in keys:
+                if key in changed:
+                    block = changed[key]
+                    parts.append(build_period_cube(
+                        block['fecha'].to_numpy(), block['afluencia'].to_numpy(),
+                        np.array([0]), np.array([len(block)]), freq
+                    ))
+                else:
+                    start, stop = state.cube_index[freq][key]
+                    parts.append(slice_cube(state.cubes[freq], start, stop))
+            
+            lengths = np.array([len(part['period']) for part in parts])
+            stops = np.cumsum(lengths)
+            starts = stops - lengths
+            cube = {
+                field: np.concatenate([part[field] for part in parts])
+                for field in ('period', 'count', 'sum', 'sumsq', 'min', 'max')
+            }
+            cube['station'] = np.repeat(np.arange(len(keys)), lengths)
+            cubes[freq] = cube
+            cube_index[freq] = {
+                key: (int(start), int(stop)) for key, start, stop in zip(keys, starts, stops)
+            }
+        return cubes, cube_index
+
+    def ingest(self, new_rows: pd.DataFrame, persist: bool = False) -> Dict:
+        """
+        Incorpora filas nuevas (p. ej. la publicación mensual) sin releer el CSV completo.
+        
+        Solo se procesan las estaciones cuyos datos cambian: se recalculan sus bloques,
+        sus filas en las tablas agregadas y su entrada en el catálogo; el resto se
+        reutiliza. Las estructuras nuevas se construyen aparte en un DatasetState que
+        se publica con una sola asignación al final, así que las solicitudes en curso
+        siguen viendo el estado anterior completo.
+        
+        Con persist=True las filas aceptadas se agregan al CSV y se reescribe el
+        snapshot, para que sobrevivan a un reinicio.
+        """
+        with self._ingest_lock:
+            try:
+                state = self.state
+                rows = self._prepare_new_rows(new_rows, state.df['afluencia'].dtype)
+                
+                # Determinar qué estaciones cambian
+                changed: Dict[Tuple[str, str], pd.DataFrame] = {}
+                accepted = []
+                corrected_total = 0
+                for key, group in rows.groupby(['linea', 'estacion'], sort=False):
+                    merged = self._merge_station_rows(state, key, group)
+                    if merged is None:
+                        continue
+                    changed[key], accepted_rows, corrected = merged
+                    accepted.append(accepted_rows.assign(linea=key[0], estacion=key[1]))
+                    corrected_total += corrected
+                added_total = sum(len(part) for part in accepted) - corrected_total
+                
+                summary = {
+                    'filas_recibidas': int(len(new_rows)),
+                    'filas_agregadas': int(added_total),
+                    'filas_corregidas': int(corrected_total),
+                    'estaciones_modificadas': [
+                        {'linea': linea, 'estacion': estacion} for linea, estacion in sorted(changed)
+                    ]
+                }
+                if not changed:
+                    logger.info("Ingesta sin cambios en los datos")
+                    return summary
+                
+                # Nuevo orden de estaciones y bloques contiguos
+                keys = sorted(set(state.station_index) | set(changed))
+                blocks = [changed[key] if key in changed else state.station_rows(*key) for key in keys]
+                lengths = np.array([len(block) for block in blocks])
+                stops = np.cumsum(lengths)
+                starts = stops - lengths
+                
+                linea_categories = pd.Index(sorted({linea for linea, _ in keys}))
+                estacion_categories = pd.Index(sorted({estacion for _, estacion in keys}))
+                df = pd.DataFrame({
+                    'fecha': np.concatenate([block['fecha'].to_numpy() for block in blocks]),
+                    'linea': pd.Categorical.from_codes(
+                        np.repeat(linea_categories.get_indexer([k[0] for k in keys]), lengths),
+                        categories=linea_categories
+                    ),
+                    'estacion': pd.Categorical.from_codes(
+                        np.repeat(estacion_categories.get_indexer([k[1] for k in keys]), lengths),
+                        categories=estacion_categories
+                    ),
+                    'afluencia': np.concatenate([block['afluencia'].to_numpy() for block in blocks])
+                })
+                
+                cubes, cube_index = self._splice_aggregate_cubes(state, keys, changed)
+                changed_frame = pd.concat([
+                    block.assign(linea=key[0], estacion=key[1]) for key, block in changed.items()
+                ], ignore_index=True)
+                unchanged_catalogue = state.catalogue_df[
+                    ~pd.MultiIndex.from_frame(state.catalogue_df[['linea', 'estacion']]).isin(list(changed))
+                ]
+                grouped = pd.concat(
+                    [unchanged_catalogue, self._aggregate_stations(changed_frame)], ignore_index=True
+                ).sort_values(['linea', 'estacion']).reset_index(drop=True)
+                
+                if persist:
+                    self._append_to_csv(pd.concat(accepted, ignore_index=True))
+                
+                station_index = {
+                    key: (int(start), int(stop)) for key, start, stop in zip(keys, starts, stops)
+                }
+                new_state = self._make_state(df, starts, stops, station_index, cubes, cube_index, grouped)
+                self.query.register(df)
+                # Publicar el estado nuevo (y con él la versión) en una sola asignación:
+                # un ETag nuevo nunca describe datos anteriores
+                self.state = new_state
+                summary['version'] = new_state.version
+                
+                if persist and self.use_snapshot:
+                    write_snapshot(df, self.data_path)
+                
+                logger.info(
+                    f"Ingesta aplicada: {added_total} filas nuevas, {corrected_total} corregidas, "
+                    f"{len(changed)} estaciones modificadas. Total filas: {len(df)}"
+                )
+                return summary
+            
+            except Exception as e:
+                logger.error(f"Error al ingerir datos: {str(e)}", exc_info=True)
+                raise Exception(f"Error en la ingesta de datos: {str(e)}")
+
+    def _append_to_csv(self, rows: pd.DataFrame):
+        """
+        Agrega filas al CSV de origen respetando sus columnas; mes y anio se
+        derivan de la fecha como en el dataset abierto (mes en inglés)
+        """
+        header = pd.read_csv(self.data_path, nrows=0).columns
+        out = rows.assign(
+            fecha=rows['fecha'].dt.strftime('%Y-%m-%d'),
+            mes=rows['fecha'].dt.month_name(),
+            anio=rows['fecha'].dt.year
+        ).reindex(columns=header)
+        out.to_csv(self.data_path, mode='a', header=False, index=False)
@@ -0,0 +1,191 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+import pandas as pd
+
+from ..utils.json_utils import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastCache:
+    """
+    Cache en disco de modelos ajustados y pronósticos serializados.
+
+    Cada entrada se identifica por un hash de los registros de la estación y de la
+    configuración del modelo, así que se invalida sola cuando cambian los datos o
+    los hiperparámetros. Los archivos se escriben de forma atómica para que varios
+    procesos puedan compartir el directorio, y se desalojan los menos usados
+    recientemente (por mtime) cuando el tamaño total supera el límite.
+
+    El directorio solo se recorre cuando el contador de bytes del proceso cruza el
+    límite; entonces se recorta hasta EVICT_TARGET del máximo para no volver a
+    recorrerlo en cada escritura. Cada proceso cuenta solo lo que escribe, así que
+    con varios procesos el total puede rebasar el límite hasta el siguiente recorte.
+
+    Configuración por variables de entorno:
+    - MODEL_CACHE_DIR: directorio del cache (por defecto 'models')
+    - MODEL_CACHE_MAX_MB: tamaño máximo del cache en MB
+    """
+    PAYLOAD_SUFFIX = '.forecast.json'
+    MODEL_SUFFIX = '.model.json'
+    LATEST_SUFFIX = '.latest'
+    # Fracción del tamaño máximo que queda después de un recorte
+    EVICT_TARGET = 0.9
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.cache_dir = Path(cache_dir or os.getenv('MODEL_CACHE_DIR', 'models'))
+        if max_bytes is None:
+            max_bytes = int(float(os.getenv('MODEL_CACHE_MAX_MB', 512)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # Tamaño estimado del cache; se conoce tras el primer recorrido del directorio
+        self._size: Optional[int] = None
+
+    @staticmethod
+    def make_key(station_data: pd.DataFrame, config: Dict[str, Any]) -> str:
+        """
+        Genera la llave del cache a partir de los datos de la estación y la configuración
+        """
+        digest = hashlib.sha256()
+        rows = station_data[['fecha', 'afluencia']]
+        digest.update(pd.util.hash_pandas_object(rows, index=False).values.tobytes())
+        digest.update(json.dumps(config, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _path(self, key: str, suffix: str) -> Path:
+        return self.cache_dir / f"{key}{suffix}"
+
+    def _read_json(self, path: Path) -> Optional[Any]:
+        try:
+            with open(path, 'rb') as f:
+                data = loads(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Entrada de cache ilegible {path.name}: {str(e)}")
+            return None
+        # Marcar como usado recientemente para el desalojo LRU
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _write_atomic(self, path: Path, content: Union[str, bytes]) -> int:
+        """
+        Escribe el archivo de forma atómica y devuelve los bytes escritos
+        """
+        if isinstance(content, str):
+            content = content.encode('utf-8')
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return len(content)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Obtiene un pronóstico serializado del cache
+        """
+        return self._read_json(self._path(key, self.PAYLOAD_SUFFIX))
+
+    def get_model(self, key: str) -> Optional[str]:
+        """
+        Obtiene el modelo ajustado (JSON de Prophet) del cache
+        """
+        path = self._path(key, self.MODEL_SUFFIX)
+        try:
+            content = path.read_text(encoding='utf-8')
+        except (FileNotFoundError, OSError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return content
+
+    def put(self, key: str, payload: Dict[str, Any], model_json: Optional[str] = None):
+        """
+        Guarda un pronóstico y, opcionalmente, su modelo ajustado
+        """
+        try:
+            written = 0
+            if model_json is not None:
+                written += self._write_atomic(self._path(key, self.MODEL_SUFFIX), model_json)
+            written += self._write_atomic(self._path(key, self.PAYLOAD_SUFFIX), dumps(payload))
+            if self._size is None or self._size + written > self.max_bytes:
+                self._evict()
+            else:
+                self._size += written
+        except OSError as e:
+            # Un cache que no se puede escribir no debe romper el pronóstico
+            logger.warning(f"No se pudo escribir en el cache de pronósticos: {str(e)}")
+
+    def _latest_path(self, station_id: str) -> Path:
+        name = hashlib.sha1(station_id.encode('utf-8')).hexdigest()
+        return self._path(name, self.LATEST_SUFFIX)
+
+    def set_latest(self, station_id: str, key: str):
+        """
+        Registra la llave del último modelo ajustado para una estación
+        """
+        try:
+            self._write_atomic(self._latest_path(station_id), key)
+        except OSError as e:
+            logger.warning(f"No se pudo registrar el último modelo de {station_id}: {str(e)}")
+
+    def get_latest_model(self, station_id: str) -> Optional[str]:
+        """
+        Obtiene el último modelo ajustado para una estación, aunque sus datos hayan
+        cambiado desde entonces (sirve como punto de partida del nuevo ajuste)
+        """
+        try:
+            key = self._latest_path(station_id).read_text(encoding='utf-8').strip()
+        except (FileNotFoundError, OSError):
+            return None
+        return self.get_model(key)
+
+    def _evict(self):
+        """
+        Recorre el directorio para conocer el tamaño real y, si supera el máximo,
+        elimina las entradas menos usadas recientemente hasta EVICT_TARGET del máximo
+        """
+        entries = []
+        total = 0
+        for path in self.cache_dir.iterdir():
+            if not path.name.endswith((self.PAYLOAD_SUFFIX, self.MODEL_SUFFIX)):
+                continue
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+
+        if total <= self.max_bytes:
+            self._size = total
+            return
+
+        target = self.max_bytes * self.EVICT_TARGET
+        entries.sort(key=lambda entry: entry[0])
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                path.unlink()
+                total -= size
+            except FileNotFoundError:
+                continue
+        self._size = total
+        logger.info(f"Cache de pronósticos recortado a {total / (1024 * 1024):.1f} MB")
@@ -0,0 +1,273 @@
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from ..utils.metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Columnas que todo motor devuelve en el DataFrame de pronóstico
+FORECAST_COLUMNS = ['ds', 'yhat', 'yhat_lower', 'yhat_upper', 'trend', 'yearly', 'weekly']
+
+# Un trabajo de pronóstico: datos de entrenamiento (ds, y y opcionalmente covid_impact)
+# y fechas a predecir (ds y opcionalmente covid_impact)
+ForecastJob = Tuple[pd.DataFrame, pd.DataFrame]
+
+
+class ForecastEngine:
+    """
+    Interfaz de los motores de pronóstico.
+
+    Un motor recibe los datos de entrenamiento y las fechas a predecir y devuelve
+    un DataFrame con FORECAST_COLUMNS, más el modelo serializado si el motor lo soporta.
+    """
+    name = ''
+    # Los motores lentos se ejecutan en el pool de procesos; los rápidos, en el proceso de la API
+    runs_in_pool = True
+    # Los motores que aceptan un modelo previo como punto de partida del ajuste
+    supports_warm_start = False
+
+    def config(self) -> Dict[str, Any]:
+        """Parámetros que determinan el resultado (parte de la llave del cache)"""
+        raise NotImplementedError
+
+    def fit_predict(self, train: pd.DataFrame, future: pd.DataFrame,
+                    warm_start: Optional[str] = None) -> Tuple[pd.DataFrame, Optional[str]]:
+        raise NotImplementedError
+
+    def fit_predict_many(self, jobs: List[ForecastJob],
+                         warm_starts: Optional[List[Optional[str]]] = None) -> List[Tuple[pd.DataFrame, Optional[str]]]:
+        """Ajusta varias estaciones; por defecto, una por una"""
+        warm_starts = warm_starts or [None] * len(jobs)
+        return [
+            self.fit_predict(train, future, warm_start)
+            for (train, future), warm_start in zip(jobs, warm_starts)
+        ]
+
+
+class ProphetEngine(ForecastEngine):
+    """
+    Motor basado en Prophet (Stan); preciso pero cuesta segundos por estación
+    """
+    name = 'prophet'
+    supports_warm_start = True
+
+    def __init__(self, model_params: Dict[str, Any]):
+        self.model_params = model_params
+
+    def config(self) -> Dict[str, Any]:
+        return self.model_params
+
+    def _new_model(self, train: pd.DataFrame):
+        # Import diferido: cargar Prophet/Stan solo cuando se usa este motor
+        from prophet import Prophet
+
+        model = Prophet(**self.model_params)
+        if 'covid_impact' in train.columns:
+            model.add_regressor('covid_impact')
+        return model
+
+    @staticmethod
+    def _warm_start_params(model_json: str) -> Dict[str, Any]:
+        """
+        Parámetros iniciales de Stan a partir de un modelo ajustado previamente
+        """
+        from prophet.serialize import model_from_json
+
+        params = model_from_json(model_json).params
+        init = {name: float(params[name][0][0]) for name in ('k', 'm', 'sigma_obs')}
+        init.update({name: np.asarray(params[name][0], dtype=float) for name in ('delta', 'beta')})
+        return init
+
+    def fit_predict(self, train: pd.DataFrame, future: pd.DataFrame,
+                    warm_start: Optional[str] = None) -> Tuple[pd.DataFrame, Optional[str]]:
+        from prophet.serialize import model_to_json
+
+        model = None
+        with stage('fit'):
+            if warm_start is not None:
+                # Partir del modelo anterior: el optimizador converge en menos iteraciones
+                try:
+                    model = self._new_model(train)
+                    model.fit(train, init=self._warm_start_params(warm_start))
+                except Exception as e:
+                    logger.warning(f"No se pudo reutilizar el modelo anterior, se ajusta desde cero: {str(e)}")
+                    model = None
+            if model is None:
+                model = self._new_model(train)
+                model.fit(train)
+
+        with stage('predict'):
+            forecast = model.predict(future)
+        for column in ('yearly', 'weekly'):
+            if column not in forecast.columns:
+                forecast[column] = 0.0
+        return forecast[FORECAST_COLUMNS], model_to_json(model)
+
+
+class HarmonicEngine(ForecastEngine):
+    """
+    Motor rápido de regresión armónica resuelto con NumPy.
+
+    Modela y = tendencia lineal por tramos + estacionalidad semanal y anual (series
+    de Fourier) + regresor de COVID, con una penalización ridge que cumple el papel
+    de los priors de Prophet. Las estaciones con las mismas fechas comparten la
+    matriz de diseño, así que se ajustan juntas con una sola solución matricial
+    (X'X + λI)⁻¹ X'Y, donde cada columna de Y es una estación.
+
+    Los intervalos usan la desviación estándar de los residuos de entrenamiento
+    con el mismo ancho (80%) que Prophet por defecto.
+    """
+    name = 'fast'
+    runs_in_pool = False
+
+    def __init__(self, weekly_order: int = 3, yearly_order: int = 10, n_changepoints: int = 25,
+                 changepoint_range: float = 0.8, changepoint_penalty: float = 10.0,
+                 seasonality_penalty: float = 0.01, interval_width: float = 0.8):
+        self.weekly_order = weekly_order
+        self.yearly_order = yearly_order
+        self.n_changepoints = n_changepoints
+        self.changepoint_range = changepoint_range
+        self.changepoint_penalty = changepoint_penalty
+        self.seasonality_penalty = seasonality_penalty
+        self.interval_width = interval_width
+
+    def config(self) -> Dict[str, Any]:
+        return {
+            'weekly_order': self.weekly_order,
+            'yearly_order': self.yearly_order,
+            'n_changepoints': self.n_changepoints,
+            'changepoint_range': self.changepoint_range,
+            'changepoint_penalty': self.changepoint_penalty,
+            'seasonality_penalty': self.seasonality_penalty,
+            'interval_width': self.interval_width
+        }
+
+    @staticmethod
+    def _fourier(days: np.ndarray, period: float, order: int) -> np.ndarray:
+        angles = 2 * np.pi * np.outer(days, np.arange(1, order + 1)) / period
+        return np.hstack([np.sin(angles), np.cos(angles)])
+
+    def _design(self, ds: pd.Series, origin: pd.Timestamp, span: float, changepoints: np.ndarray,
+                covid: Optional[np.ndarray]) -> Tuple[np.ndarray, Dict[str, slice]]:
+        """
+        Matriz de diseño y posición de las columnas de cada componente
+        """
+        days = ((ds - origin) / pd.Timedelta(days=1)).to_numpy(dtype=np.float64)
+        t = days / span
+        blocks = [
+            np.ones((len(t), 1)),
+            t[:, None],
+            np.maximum(0.0, t[:, None] - changepoints[None, :]),
+            self._fourier(days, 365.25, self.yearly_order),
+            self._fourier(days, 7.0, self.weekly_order)
+        ]
+        if covid is not None:
+            blocks.append(covid[:, None].astype(np.float64))
+
+        sizes = [block.shape[1] for block in blocks]
+        offsets = np.cumsum([0] + sizes)
+        columns = {
+            'trend': slice(offsets[0], offsets[3]),
+            'yearly': slice(offsets[3], offsets[4]),
+            'weekly': slice(offsets[4], offsets[5])
+        }
+        return np.hstack(blocks), columns
+
+    def _penalty(self, columns: Dict[str, slice], n_columns: int) -> np.ndarray:
+        penalty = np.zeros(n_columns)
+        trend = columns['trend']
+        # Sin penalización para intercepto y pendiente; los cambios de pendiente se penalizan
+        penalty[trend.start + 2:trend.stop] = self.changepoint_penalty
+        penalty[columns['yearly']] = self.seasonality_penalty
+        penalty[columns['weekly']] = self.seasonality_penalty
+        return penalty
+
+    @staticmethod
+    def _group_key(train: pd.DataFrame, future: pd.DataFrame) -> str:
+        digest = hashlib.sha1()
+        digest.update(train['ds'].to_numpy().tobytes())
+        digest.update(future['ds'].to_numpy().tobytes())
+        if 'covid_impact' in train.columns:
+            digest.update(train['covid_impact'].to_numpy().tobytes())
+            digest.update(future['covid_impact'].to_numpy().tobytes())
+        return digest.hexdigest()
+
+    def fit_predict(self, train: pd.DataFrame, future: pd.DataFrame,
+                    warm_start: Optional[str] = None) -> Tuple[pd.DataFrame, Optional[str]]:
+        return self.fit_predict_many([(train, future)])[0]
+
+    def fit_predict_many(self, jobs: List[ForecastJob],
+                         warm_starts: Optional[List[Optional[str]]] = None) -> List[Tuple[pd.DataFrame, Optional[str]]]:
+        """
+        Agrupa las estaciones por fechas y regresores y ajusta cada grupo en bloque.
+        La solución cerrada no necesita punto de partida, así que warm_starts se ignora.
+        """
+        groups: Dict[str, List[int]] = {}
+        for position, (train, future) in enumerate(jobs):
+            groups.setdefault(self._group_key(train, future), []).append(position)
+
+        results: List[Optional[Tuple[pd.DataFrame, Optional[str]]]] = [None] * len(jobs)
+        for positions in groups.values():
+            outputs = self._fit_group([jobs[position] for position in positions])
+            for position, output in zip(positions, outputs):
+                results[position] = (output, None)
+        return results
+
+    def _fit_group(self, jobs: List[ForecastJob]) -> List[pd.DataFrame]:
+        train, future = jobs[0]
+        has_covid = 'covid_impact' in train.columns
+
+        origin = train['ds'].min()
+        span = max((train['ds'].max() - origin) / pd.Timedelta(days=1), 1.0)
+        changepoints = np.linspace(0, self.changepoint_range, self.n_changepoints + 1)[1:]
+
+        X, columns = self._design(
+            train['ds'], origin, span, changepoints,
+            train['covid_impact'].to_numpy() if has_covid else None
+        )
+        X_future, _ = self._design(
+            future['ds'], origin, span, changepoints,
+            future['covid_impact'].to_numpy() if has_covid else None
+        )
+
+        with stage('fit'):
+            # Escalar cada estación para que la penalización sea comparable entre estaciones
+            Y = np.column_stack([job[0]['y'].to_numpy(dtype=np.float64) for job in jobs])
+            scale = np.abs(Y).max(axis=0)
+            scale[scale == 0] = 1.0
+            Y = Y / scale
+
+            penalty = self._penalty(columns, X.shape[1])
+            beta = np.linalg.solve(X.T @ X + np.diag(penalty) + 1e-9 * np.eye(X.shape[1]), X.T @ Y)
+
+            residuals = Y - X @ beta
+            dof = max(len(Y) - X.shape[1], 1)
+            sigma = np.sqrt((residuals ** 2).sum(axis=0) / dof)
+            z = norm.ppf(0.5 + self.interval_width / 2)
+
+        with stage('predict'):
+            yhat = X_future @ beta
+            components = {
+                name: X_future[:, cols] @ beta[cols]
+                for name, cols in columns.items()
+            }
+
+        outputs = []
+        for station in range(Y.shape[1]):
+            s = scale[station]
+            outputs.append(pd.DataFrame({
+                'ds': future['ds'].to_numpy(),
+                'yhat': yhat[:, station] * s,
+                'yhat_lower': (yhat[:, station] - z * sigma[station]) * s,
+                'yhat_upper': (yhat[:, station] + z * sigma[station]) * s,
+                'trend': components['trend'][:, station] * s,
+                'yearly': components['yearly'][:, station] * s,
+                'weekly': components['weekly'][:, station] * s
+            }))
+        return outputs
+
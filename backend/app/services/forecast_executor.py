@@ -0,0 +1,262 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import pandas as pd
+
+from .forecast_service import ForecastService
+from ..utils.metrics import CACHE_REQUESTS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Instancia de ForecastService propia de cada proceso del pool
+_worker_service: Optional[ForecastService] = None
+
+
+def _init_worker():
+    """
+    Inicializa el servicio de pronóstico dentro de cada proceso del pool
+    """
+    global _worker_service
+    _worker_service = ForecastService()
+
+
+def _run_forecast(station_data: pd.DataFrame, engine: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ejecuta el pronóstico dentro de un proceso del pool
+    """
+    if _worker_service is None:
+        _init_worker()
+    return _worker_service.generate_forecast(station_data, engine)
+
+
+def _run_forecast_measured(station_data: pd.DataFrame,
+                           engine: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[str, dict]]:
+    """
+    Ejecuta el pronóstico y devuelve también las métricas registradas en el
+    proceso (tiempos por etapa, cache) para sumarlas a las de la API
+    """
+    REGISTRY.reset()
+    result = _run_forecast(station_data, engine)
+    return result, REGISTRY.export()
+
+
+# Eventos del ejecutor: solicitudes, aciertos de cache, ajustes y solicitudes agrupadas
+EXECUTOR_EVENTS = REGISTRY.counter(
+    'metro_forecast_executor_events',
+    'Eventos del ejecutor de pronósticos',
+    labels=('event',)
+)
+
+
+class ForecastPoolSaturatedError(Exception):
+    """
+    El pool de pronósticos no acepta más trabajos por el momento
+    """
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ForecastTimeoutError(Exception):
+    """
+    El pronóstico no terminó dentro del tiempo máximo permitido
+    """
+
+
+class ForecastExecutor:
+    """
+    Ejecuta los pronósticos de Prophet en un pool de procesos acotado para no
+    bloquear el event loop de uvicorn.
+
+    Las solicitudes concurrentes para la misma estación se agrupan: solo la primera
+    ajusta el modelo y las demás esperan el mismo resultado. Los motores rápidos
+    (runs_in_pool = False) se ejecutan en el pool de hilos del proceso de la API.
+
+    Configuración por variables de entorno:
+    - FORECAST_WORKERS: número de procesos del pool
+    - FORECAST_MAX_QUEUE: trabajos en espera permitidos además de los que se ejecutan
+    - FORECAST_TIMEOUT: segundos máximos de espera por pronóstico
+
+    FORECAST_TIMEOUT acota la espera, no el trabajo: al vencer, el cliente recibe
+    504 y el trabajo se descarta si aún no inicia, pero un ajuste que ya corre no
+    se puede interrumpir sin detener el pool completo, así que conserva su proceso
+    hasta terminar (y su resultado queda en el cache). Mientras tanto cuenta en
+    'pending' para el límite de la cola; stats() informa los tiempos excedidos
+    ('timeouts') y los ajustes que siguen corriendo sin nadie esperando ('orphaned').
+    """
+    def __init__(self, forecast_service: ForecastService):
+        self.forecast_service = forecast_service
+        self.max_workers = int(os.getenv('FORECAST_WORKERS', max(1, (os.cpu_count() or 2) - 1)))
+        self.max_queue = int(os.getenv('FORECAST_MAX_QUEUE', self.max_workers * 2))
+        self.timeout = float(os.getenv('FORECAST_TIMEOUT', 120))
+        self._pool = None
+        self._pending = 0
+        # Ajustes que siguen en el pool después de que su espera excedió el tiempo máximo
+        self._orphaned = 0
+        self._lock = threading.Lock()
+        # Duración promedio (EMA) de un pronóstico, usada para estimar Retry-After
+        self._avg_duration = 10.0
+        # Pronósticos en curso por (linea, estacion, motor), con linea y estacion normalizadas
+        self._inflight: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        self._counters = {
+            'requests': 0,
+            'cache_hits': 0,
+            'fits': 0,
+            'coalesced': 0,
+            'timeouts': 0
+        }
+        REGISTRY.gauge('metro_forecast_pool_workers', 'Procesos del pool de pronósticos', lambda: self.max_workers)
+        REGISTRY.gauge('metro_forecast_pool_pending', 'Trabajos en el pool (en ejecución o en cola)', lambda: self._pending)
+        REGISTRY.gauge(
+            'metro_forecast_pool_queued',
+            'Trabajos del pool que esperan un proceso libre',
+            lambda: max(0, self._pending - self.max_workers)
+        )
+        REGISTRY.gauge(
+            'metro_forecast_pool_orphaned',
+            'Ajustes que siguen en el pool después de exceder el tiempo máximo',
+            lambda: self._orphaned
+        )
+        REGISTRY.gauge('metro_forecast_in_flight', 'Pronósticos en curso (sin contar los agrupados)', lambda: len(self._inflight))
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            logger.info(f"Iniciando pool de pronósticos con {self.max_workers} procesos")
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return self._pool
+
+    @property
+    def pending(self) -> int:
+        """
+        Trabajos enviados al pool que aún no terminan (en ejecución o en cola)
+        """
+        return self._pending
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Contadores de uso del ejecutor; 'coalesced' indica los ajustes ahorrados y
+        'orphaned', los procesos ocupados por ajustes cuyo cliente ya recibió 504
+        """
+        return {
+            **self._counters,
+            'in_flight': len(self._inflight),
+            'pending': self._pending,
+            'orphaned': self._orphaned
+        }
+
+    def _count(self, event: str):
+        self._counters[event] += 1
+        EXECUTOR_EVENTS.inc(event=event)
+
+    def _retry_after(self) -> int:
+        """
+        Estima en segundos cuándo habrá capacidad disponible
+        """
+        waves = max(1, self._pending - self.max_workers + 1) / self.max_workers
+        return max(1, math.ceil(self._avg_duration * waves))
+
+    def _on_done(self, started: float, _future):
+        duration = time.monotonic() - started
+        with self._lock:
+            self._pending -= 1
+            self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+    def _on_orphan_done(self, _future):
+        with self._lock:
+            self._orphaned -= 1
+
+    async def submit(self, station_data: pd.DataFrame, engine: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Envía un pronóstico al pool y espera su resultado sin bloquear el event loop
+        """
+        self._count('requests')
+        forecast_engine = self.forecast_service.get_engine(engine)
+        key = (station_data['linea'].iloc[0], station_data['estacion'].iloc[0], forecast_engine.name)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._count('coalesced')
+            logger.debug("Uniéndose al pronóstico en curso para %s - %s", key[0], key[1])
+        else:
+            task = asyncio.ensure_future(self._run(station_data, forecast_engine.name))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done, key=key: self._forget(key, done))
+
+        # shield: si un cliente se desconecta, el pronóstico sigue para los demás
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Tuple[str, str, str], task: asyncio.Task):
+        self._inflight.pop(key, None)
+        # Marcar la excepción como recuperada aunque todos los clientes se hayan ido
+        if not task.cancelled():
+            task.exception()
+
+    async def _run(self, station_data: pd.DataFrame, engine: str) -> Dict[str, Any]:
+        # Los pronósticos en cache se sirven directamente, sin ocupar el pool. La
+        # llave hashea todas las filas y el payload se lee del disco: fuera del event loop
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(None, self.forecast_service.get_cached_forecast, station_data, engine)
+        if cached is not None:
+            self._count('cache_hits')
+            CACHE_REQUESTS.inc(cache='forecast', result='hit')
+            logger.debug("Pronóstico obtenido del cache")
+            return cached
+
+        # Los motores rápidos no justifican el costo de enviar datos a otro proceso
+        if not self.forecast_service.get_engine(engine).runs_in_pool:
+            self._count('fits')
+            return await loop.run_in_executor(
+                None, self.forecast_service.generate_forecast, station_data, engine
+            )
+
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise ForecastPoolSaturatedError(
+                    f"Pool de pronósticos saturado ({self._pending} trabajos pendientes)",
+                    retry_after=self._retry_after()
+                )
+            self._pending += 1
+        self._count('fits')
+
+        try:
+            future = self._get_pool().submit(_run_forecast_measured, station_data, engine)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(lambda f, started=time.monotonic(): self._on_done(started, f))
+
+        try:
+            result, worker_metrics = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            # Si el trabajo no ha iniciado se descarta; si ya corre, el proceso
+            # lo termina y su lugar se libera al finalizar
+            self._count('timeouts')
+            if not future.cancel():
+                with self._lock:
+                    self._orphaned += 1
+                future.add_done_callback(self._on_orphan_done)
+            raise ForecastTimeoutError(
+                f"El pronóstico excedió el tiempo máximo de {self.timeout:.0f} segundos"
+            )
+        REGISTRY.merge(worker_metrics)
+        return result
+
+    def shutdown(self):
+        """
+        Detiene el pool de procesos
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
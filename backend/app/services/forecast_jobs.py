@@ -0,0 +1,358 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .forecast_executor import ForecastExecutor, ForecastPoolSaturatedError, ForecastTimeoutError
+from .forecast_service import ForecastService
+from ..utils.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Prioridades de los trabajos: las de menor valor se despachan primero
+JOB_PRIORITIES = {'high': 0, 'normal': 1, 'low': 2}
+
+# Estados de un trabajo; los tres últimos son finales
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+JOB_EVENTS = REGISTRY.counter(
+    'metro_forecast_job_events',
+    'Trabajos de pronóstico creados y terminados, por estado',
+    labels=('status',)
+)
+
+
+class ForecastJobNotFoundError(Exception):
+    """
+    El trabajo no existe o su resultado ya expiró
+    """
+
+
+class ForecastJobCancelledError(Exception):
+    """
+    El trabajo se canceló antes de terminar
+    """
+
+
+class ForecastJob:
+    """
+    Un pronóstico solicitado a través de la API de trabajos
+    """
+    def __init__(self, linea: str, estacion: str, engine: str, priority: str):
+        self.id = uuid.uuid4().hex
+        self.linea = linea
+        self.estacion = estacion
+        self.engine = engine
+        self.priority = priority
+        self.status = QUEUED
+        self.group: Optional['_JobGroup'] = None
+        self.created_at = datetime.now()
+        self.created = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.cache_hit = False
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[BaseException] = None
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    def finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[BaseException] = None):
+        if self.status in FINISHED_STATES:
+            return
+        if status == CANCELLED:
+            error = ForecastJobCancelledError(f"El trabajo {self.id} fue cancelado")
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished = time.monotonic()
+        JOB_EVENTS.inc(status=status)
+        if not self.done.done():
+            if error is not None:
+                self.done.set_exception(error)
+                # Nadie espera el futuro cuando el trabajo se consulta por sondeo
+                self.done.exception()
+            else:
+                self.done.set_result(result)
+
+    def describe(self, position: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Estado, tiempos y error del trabajo (sin el resultado)
+        """
+        now = time.monotonic()
+        queue_end = self.started or self.finished or now
+        description = {
+            'id': self.id,
+            'status': self.status,
+            'priority': self.priority,
+            'linea': self.linea,
+            'estacion': self.estacion,
+            'engine': self.engine,
+            'created_at': self.created_at.isoformat(timespec='seconds'),
+            'queue_seconds': round(queue_end - self.created, 3),
+            'run_seconds': round((self.finished or now) - self.started, 3) if self.started else None,
+            'cache_hit': self.cache_hit
+        }
+        if position is not None:
+            description['position'] = position
+        if self.error is not None:
+            description['error'] = str(self.error)
+        return description
+
+
+class _JobGroup:
+    """
+    Trabajos en cola o en curso para la misma estación y motor. Ocupan una sola
+    entrada de la cola y un solo lugar de concurrencia: el executor los
+    agruparía de todos modos en un único ajuste.
+    """
+    def __init__(self, key: Tuple[str, str, str], station_data: pd.DataFrame, rank: int, sequence: int):
+        self.key = key
+        self.station_data = station_data
+        self.rank = rank
+        self.sequence = sequence
+        self.status = QUEUED
+        self.jobs: List[ForecastJob] = []
+        self.task: Optional[asyncio.Task] = None
+
+
+class ForecastJobService:
+    """
+    API asíncrona de pronósticos: el trabajo se crea de inmediato y el cliente
+    consulta su estado hasta que el resultado está listo.
+
+    Los trabajos esperan en una cola por prioridad y se despachan al
+    ForecastExecutor con a lo sumo FORECAST_JOB_CONCURRENCY en curso (por
+    defecto, un trabajo por proceso del pool), así que la prioridad decide el
+    orden en lugar de la cola FIFO del pool. Los trabajos de la misma estación
+    y motor se agrupan antes de despachar: comparten una entrada de la cola y
+    un solo ajuste. Los pronósticos en cache y los de motores que no usan el
+    pool se resuelven sin pasar por la cola.
+
+    Los trabajos terminados se conservan FORECAST_JOB_TTL segundos; después se
+    eliminan en la siguiente operación y su consulta devuelve 404. Un trabajo
+    en cola o en curso se puede cancelar: el ajuste que ya se está ejecutando
+    sigue en el pool y su resultado queda en el cache.
+
+    Configuración por variables de entorno:
+    - FORECAST_JOB_CONCURRENCY: trabajos enviados al executor a la vez
+    - FORECAST_JOB_MAX_QUEUED: estaciones en cola permitidas (por defecto, FORECAST_MAX_QUEUE)
+    - FORECAST_JOB_TTL: segundos que se conserva un trabajo terminado
+    """
+    def __init__(self, forecast_service: ForecastService, forecast_executor: ForecastExecutor):
+        self.forecast_service = forecast_service
+        self.forecast_executor = forecast_executor
+        self.concurrency = int(os.getenv('FORECAST_JOB_CONCURRENCY', forecast_executor.max_workers))
+        # Mismo límite que la cola del executor: con la cola llena se responde 503 con Retry-After
+        self.max_queued = int(os.getenv('FORECAST_JOB_MAX_QUEUED', forecast_executor.max_queue))
+        self.ttl = float(os.getenv('FORECAST_JOB_TTL', 900))
+        self._jobs: Dict[str, ForecastJob] = {}
+        self._queue: List[Tuple[int, int, _JobGroup]] = []
+        # Grupos en cola o en curso por (linea, estacion, motor)
+        self._groups: Dict[Tuple[str, str, str], _JobGroup] = {}
+        self._sequence = itertools.count()
+        self._queued = 0
+        self._running = 0
+        REGISTRY.gauge('metro_forecast_jobs_queued', 'Trabajos de pronóstico en cola', lambda: self._queued)
+        REGISTRY.gauge('metro_forecast_jobs_running', 'Trabajos de pronóstico en curso', lambda: self._running)
+
+    def stats(self) -> Dict[str, int]:
+        self._purge()
+        return {'jobs': len(self._jobs), 'queued': self._queued, 'running': self._running}
+
+    def _purge(self):
+        """
+        Elimina los trabajos terminados cuyo TTL ya venció
+        """
+        now = time.monotonic()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished is not None and now - job.finished > self.ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> ForecastJob:
+        self._purge()
+        job = self._jobs.get(job_id)
+        if job is None:
+            raise ForecastJobNotFoundError(f"No existe el trabajo {job_id} o su resultado ya expiró")
+        return job
+
+    def position(self, job: ForecastJob) -> Optional[int]:
+        """
+        Estaciones en cola que se despacharán antes que este trabajo (0 = la siguiente)
+        """
+        if job.status != QUEUED or job.group is None:
+            return None
+        key = (job.group.rank, job.group.sequence)
+        return sum(
+            1 for rank, sequence, group in self._queue
+            if group.status == QUEUED and rank == group.rank and (rank, sequence) < key
+        )
+
+    def describe(self, job: ForecastJob) -> Dict[str, Any]:
+        return job.describe(self.position(job))
+
+    async def submit(self, station_data: pd.DataFrame, linea: str, estacion: str,
+                     engine: Optional[str] = None, priority: str = 'normal') -> ForecastJob:
+        """
+        Crea un trabajo y regresa sin esperar el pronóstico
+        """
+        if priority not in JOB_PRIORITIES:
+            raise ValueError(f"Prioridad desconocida: {priority}. Disponibles: {list(JOB_PRIORITIES)}")
+        forecast_engine = self.forecast_service.get_engine(engine)
+        self._purge()
+
+        job = ForecastJob(linea, estacion, forecast_engine.name, priority)
+        JOB_EVENTS.inc(status='created')
+
+        # Cache y motores rápidos: no ocupan el pool, no tiene caso que esperen turno
+        loop = asyncio.get_running_loop()
+        cached = await loop.run_in_executor(
+            None, self.forecast_service.get_cached_forecast, station_data, forecast_engine.name
+        )
+        if cached is not None:
+            self._jobs[job.id] = job
+            job.cache_hit = True
+            job.started = time.monotonic()
+            job.finish(DONE, cached)
+            return job
+
+        # Misma llave que usa el executor para agrupar los ajustes concurrentes
+        key = (station_data['linea'].iloc[0], station_data['estacion'].iloc[0], forecast_engine.name)
+        rank = JOB_PRIORITIES[priority]
+        group = self._groups.get(key)
+        if group is not None:
+            self._join(group, job)
+            if group.status == QUEUED and rank < group.rank:
+                # Sube de prioridad; la entrada anterior de la cola queda obsoleta
+                group.rank = rank
+                heapq.heappush(self._queue, (rank, group.sequence, group))
+            self._jobs[job.id] = job
+            self._dispatch()
+            return job
+
+        # Solo espera en cola si todos los lugares están ocupados (tras _dispatch no
+        # quedan estaciones en cola mientras haya lugar libre)
+        waits = self._running >= self.concurrency
+        if forecast_engine.runs_in_pool and waits and self._queued >= self.max_queued:
+            raise ForecastPoolSaturatedError(
+                f"Cola de trabajos de pronóstico llena ({self._queued} estaciones en espera)",
+                retry_after=self.forecast_executor._retry_after()
+            )
+        group = _JobGroup(key, station_data, rank, next(self._sequence))
+        self._groups[key] = group
+        self._join(group, job)
+        self._jobs[job.id] = job
+        if not forecast_engine.runs_in_pool:
+            self._start(group)
+            return job
+        heapq.heappush(self._queue, (rank, group.sequence, group))
+        self._queued += 1
+        self._dispatch()
+        return job
+
+    @staticmethod
+    def _join(group: _JobGroup, job: ForecastJob):
+        job.group = group
+        group.jobs.append(job)
+        if group.status == RUNNING:
+            job.status = RUNNING
+            job.started = time.monotonic()
+
+    def _dispatch(self):
+        """
+        Despacha las estaciones de mayor prioridad mientras haya lugar
+        """
+        while self._queue and self._running < self.concurrency:
+            rank, _, group = heapq.heappop(self._queue)
+            if group.status != QUEUED or rank != group.rank:
+                # Cancelada mientras esperaba, o entrada anterior a un cambio de prioridad
+                continue
+            self._queued -= 1
+            self._running += 1
+            self._start(group, pooled=True)
+
+    def _start(self, group: _JobGroup, pooled: bool = False):
+        group.status = RUNNING
+        started = time.monotonic()
+        for job in group.jobs:
+            job.status = RUNNING
+            job.started = started
+        group.task = asyncio.ensure_future(self._run(group))
+        if pooled:
+            group.task.add_done_callback(self._release)
+
+    def _release(self, _task: asyncio.Task):
+        self._running -= 1
+        self._dispatch()
+
+    async def _run(self, group: _JobGroup):
+        engine = group.key[2]
+        try:
+            result = await self.forecast_executor.submit(group.station_data, engine)
+        except asyncio.CancelledError:
+            # Solo se cancela cuando ya no queda ningún trabajo esperando
+            self._groups.pop(group.key, None)
+            raise
+        except Exception as e:
+            self._groups.pop(group.key, None)
+            logger.error(f"Error en el pronóstico de {group.key[0]} - {group.key[1]}: {str(e)}")
+            for job in group.jobs:
+                job.finish(FAILED, error=e)
+        else:
+            self._groups.pop(group.key, None)
+            for job in group.jobs:
+                job.finish(DONE, result)
+            logger.debug(
+                "Pronóstico de %s - %s terminado para %d trabajos", group.key[0], group.key[1], len(group.jobs)
+            )
+        finally:
+            # Los datos de la estación ya no se necesitan; el resultado se conserva hasta que expire
+            group.station_data = None
+
+    def cancel(self, job_id: str) -> ForecastJob:
+        """
+        Cancela un trabajo en cola o en curso; los trabajos terminados no cambian.
+        El ajuste solo se descarta cuando ningún otro trabajo lo espera.
+        """
+        job = self.get(job_id)
+        group = job.group
+        if job.status in FINISHED_STATES or group is None:
+            return job
+        group.jobs.remove(job)
+        job.finish(CANCELLED)
+        if not group.jobs:
+            self._groups.pop(group.key, None)
+            if group.status == QUEUED:
+                group.status = CANCELLED
+                self._queued -= 1
+            elif group.task is not None:
+                group.task.cancel()
+        return job
+
+    async def wait(self, job: ForecastJob) -> Dict[str, Any]:
+        """
+        Espera el resultado de un trabajo (lo usa el GET síncrono de /api/forecast)
+        como máximo FORECAST_TIMEOUT segundos, contando el tiempo en cola.
+        El resultado ya entregado no se conserva; si quien espera se va, el
+        trabajo sigue y su resultado queda disponible hasta que expire.
+        """
+        try:
+            result = await asyncio.wait_for(asyncio.shield(job.done), timeout=self.forecast_executor.timeout)
+        except asyncio.TimeoutError:
+            # Si aún no se despacha se cancela para no ocupar la cola sin nadie esperando
+            if job.status == QUEUED:
+                self.cancel(job.id)
+            raise ForecastTimeoutError(
+                f"El pronóstico excedió el tiempo máximo de {self.forecast_executor.timeout:.0f} segundos"
+            )
+        self._jobs.pop(job.id, None)
+        return result
@@ -1,16 +1,95 @@
 import pandas as pd
 import numpy as np
-from prophet import Prophet
 from datetime import datetime, timedelta
+import hashlib
+import json
 import logging
-from typing import Dict, List, Any
+import os
+from typing import Dict, List, Any, Optional
+from .forecast_cache import ForecastCache
+from .forecast_engines import ForecastEngine, HarmonicEngine, ProphetEngine
+from ..utils.anomalies import DEFAULT_PARAMS, KIND_LABELS, SHIFT_DOWN, detect_anomalies, station_day_matrix
+from ..utils.json_utils import date_strings, float_array
+from ..utils.downsampling import RESOLUTION_FREQ, downsample_section
+from ..utils.metrics import CACHE_REQUESTS, stage
 
 logger = logging.getLogger(__name__)
 
+# Secciones del pronóstico que se pueden pedir con fields=
+FORECAST_SECTIONS = ('train', 'test', 'forecast', 'metrics', 'anomalies', 'components')
+
+# Serie que guía la selección de puntos (LTTB) en cada sección
+PRIMARY_SERIES = {'train': 'actual', 'test': 'actual', 'forecast': 'predicted', 'components': 'trend'}
+
 class ForecastService:
     def __init__(self):
         self.model = None
         self.forecast_horizon = 12  # meses hacia el futuro
+        self.test_days = 180  # días reservados para evaluación
+        self.model_params = {
+            'yearly_seasonality': True,
+            'weekly_seasonality': True,
+            'daily_seasonality': False,
+            'changepoint_prior_scale': 0.05,
+            'seasonality_prior_scale': 10.0
+        }
+        # Motores disponibles; FORECAST_ENGINE define el motor por defecto
+        self.engines: Dict[str, ForecastEngine] = {
+            'prophet': ProphetEngine(self.model_params),
+            'fast': HarmonicEngine()
+        }
+        self.default_engine = os.getenv('FORECAST_ENGINE', 'prophet')
+        # Detección de períodos anómalos que se modelan como regresor
+        self.anomaly_params = dict(DEFAULT_PARAMS)
+        self.min_closure_days = 7
+        self.cache = ForecastCache()
+
+    def make_engine(self, name: str, overrides: Optional[Dict[str, Any]] = None) -> ForecastEngine:
+        """Crea un motor con hiperparámetros distintos a los de producción (p. ej. para backtesting)"""
+        overrides = overrides or {}
+        if name == 'prophet':
+            return ProphetEngine({**self.model_params, **overrides})
+        if name == 'fast':
+            return HarmonicEngine(**overrides)
+        raise ValueError(f"Motor de pronóstico desconocido: {name}")
+
+    def get_engine(self, engine: Optional[str] = None) -> ForecastEngine:
+        """Obtiene un motor de pronóstico por nombre (o el motor por defecto)"""
+        name = engine or self.default_engine
+        if name not in self.engines:
+            raise ValueError(f"Motor de pronóstico desconocido: {name}")
+        return self.engines[name]
+
+    def _model_config(self, engine: ForecastEngine) -> Dict[str, Any]:
+        """Configuración que determina el resultado del pronóstico (parte de la llave del cache)"""
+        return {
+            'engine': engine.name,
+            'model_params': engine.config(),
+            'forecast_horizon': self.forecast_horizon,
+            'test_days': self.test_days,
+            'anomaly_params': self.anomaly_params,
+            'min_closure_days': self.min_closure_days
+        }
+
+    def config_version(self, engine: Optional[str] = None) -> str:
+        """Huella corta de la configuración del motor (cambia con sus hiperparámetros)"""
+        config = json.dumps(self._model_config(self.get_engine(engine)), sort_keys=True, default=str)
+        return hashlib.sha256(config.encode('utf-8')).hexdigest()[:16]
+
+    def cache_key(self, station_data: pd.DataFrame, engine: Optional[str] = None) -> str:
+        """Llave del cache para los datos de una estación con la configuración actual"""
+        return ForecastCache.make_key(station_data, self._model_config(self.get_engine(engine)))
+
+    @staticmethod
+    def _station_id(engine: ForecastEngine, station_data: pd.DataFrame) -> Optional[str]:
+        """Identificador estable de una estación (independiente de sus datos) para el último modelo"""
+        if station_data.empty or not {'linea', 'estacion'}.issubset(station_data.columns):
+            return None
+        return f"{engine.name}:{station_data['linea'].iloc[0]}:{station_data['estacion'].iloc[0]}"
+
+    def get_cached_forecast(self, station_data: pd.DataFrame, engine: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Obtiene un pronóstico previamente calculado, si existe"""
+        return self.cache.get(self.cache_key(station_data, engine))
         
     def _prepare_data_for_prophet(self, df: pd.DataFrame) -> pd.DataFrame:
         """Prepara datos para Prophet"""
@@ -22,194 +101,299 @@ class ForecastService:
         return prophet_df
     
     def _detect_anomalies(self, df: pd.DataFrame) -> List[Dict]:
-        """Detecta períodos anómalos como COVID"""
+        """
+        Detecta períodos anómalos sostenidos (como la caída por COVID) con el mismo
+        detector vectorizado que el escaneo de la red, sobre una matriz de una sola
+        estación. Solo se conservan las caídas sostenidas y los cierres largos, que
+        son los que se modelan como regresor.
+        """
+        if df.empty:
+            return []
+        days = df['fecha'].to_numpy().astype('datetime64[D]').astype(np.int64)
+        matrix, first_day = station_day_matrix(
+            days, df['afluencia'].to_numpy(dtype=np.float64), np.array([0]), np.array([len(df)])
+        )
+        found = detect_anomalies(matrix, self.anomaly_params)
+
         anomalies = []
+        for kind, start, stop, impact in zip(found['kind'], found['start'], found['stop'], found['impact']):
+            if kind != SHIFT_DOWN and not (kind == 'cierre' and stop - start >= self.min_closure_days):
+                continue
+            anomalies.append({
+                'name': KIND_LABELS[kind],
+                'kind': kind,
+                'start_date': str(np.datetime64(int(start) + first_day, 'D')),
+                'end_date': str(np.datetime64(int(stop) - 1 + first_day, 'D')),
+                'impact_percent': round(float(impact) * 100, 1)
+            })
+        anomalies.sort(key=lambda anomaly: anomaly['start_date'])
+        return anomalies
+    
+    @staticmethod
+    def _regressor_dates(anomalies: List[Dict]) -> Optional[pd.DatetimeIndex]:
+        """Fechas del regresor de eventos especiales: unión de los períodos anómalos detectados"""
+        if not anomalies:
+            return None
+        return pd.DatetimeIndex(np.unique(np.concatenate([
+            pd.date_range(start=anomaly['start_date'], end=anomaly['end_date']).to_numpy()
+            for anomaly in anomalies
+        ])))
+
+    def prepare_fold(self, station_data: pd.DataFrame, cutoff: pd.Timestamp,
+                     horizon_days: int) -> Dict[str, pd.DataFrame]:
+        """
+        Prepara un corte de validación con origen móvil: entrenamiento hasta cutoff
+        y evaluación en los horizon_days siguientes. Las anomalías se detectan solo
+        con la historia anterior al corte para no usar información del futuro.
+        """
+        df = station_data.copy()
+        df['fecha'] = pd.to_datetime(df['fecha'])
+        df = df.sort_values('fecha')
         
-        # Detectar caída por COVID (2020-03 a 2020-08)
-        covid_start = pd.Timestamp('2020-03-01')
-        covid_end = pd.Timestamp('2020-08-31')
+        anomalies = self._detect_anomalies(df[df['fecha'] <= cutoff])
+        prophet_data = self._prepare_data_for_prophet(df)
+        horizon_end = cutoff + pd.Timedelta(days=horizon_days)
+        train_data = prophet_data[prophet_data['ds'] <= cutoff].copy()
+        test_data = prophet_data[(prophet_data['ds'] > cutoff) & (prophet_data['ds'] <= horizon_end)].copy()
+        future_df = test_data[['ds']].copy()
         
-        # Calcular promedio antes de COVID
-        pre_covid = df[(df['fecha'] < covid_start) & 
-                        (df['fecha'] >= covid_start - pd.Timedelta(days=365))]
+        covid_dates = self._regressor_dates(anomalies)
+        if covid_dates is not None:
+            train_data['covid_impact'] = train_data['ds'].isin(covid_dates).astype(int)
+            future_df['covid_impact'] = future_df['ds'].isin(covid_dates).astype(int)
         
-        if not pre_covid.empty:
-            pre_covid_avg = pre_covid['afluencia'].mean()
-            
-            # Período COVID
-            covid_period = df[(df['fecha'] >= covid_start) & (df['fecha'] <= covid_end)]
-            
-            if not covid_period.empty:
-                covid_avg = covid_period['afluencia'].mean()
-                
-                # Si hay caída significativa (>30%)
-                if covid_avg < pre_covid_avg * 0.7:
-                    anomalies.append({
-                        'name': 'COVID-19',
-                        'start_date': covid_start.strftime('%Y-%m-%d'),
-                        'end_date': covid_end.strftime('%Y-%m-%d'),
-                        'impact_percent': round((1 - covid_avg/pre_covid_avg) * 100, 1)
-                    })
+        return {'train_data': train_data, 'test_data': test_data, 'future_df': future_df}
+
+    def _prepare(self, station_data: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Prepara entrenamiento, prueba y fechas a pronosticar para una estación
+        """
+        # Preparar datos
+        df = station_data.copy()
+        # Asegurarse que fecha es datetime
+        df['fecha'] = pd.to_datetime(df['fecha'])
+        df = df.sort_values('fecha')
         
-        return anomalies
-    
-    def generate_forecast(self, station_data: pd.DataFrame) -> Dict[str, Any]:
+        # Detectar períodos anómalos sostenidos (p. ej. COVID)
+        anomalies = self._detect_anomalies(df)
+        
+        # Preparar datos para Prophet
+        prophet_data = self._prepare_data_for_prophet(df)
+        
+        # Dividir en entrenamiento y prueba (últimos 6 meses)
+        cutoff_date = df['fecha'].max() - pd.Timedelta(days=self.test_days)
+        train_data = prophet_data[prophet_data['ds'] <= cutoff_date].copy()
+        test_data = prophet_data[prophet_data['ds'] > cutoff_date].copy()
+        
+        # Añadir regresores para eventos especiales
+        covid_dates = self._regressor_dates(anomalies)
+        if covid_dates is not None:
+            train_data['covid_impact'] = train_data['ds'].isin(covid_dates).astype(int)
+        
+        # Generar fechas futuras para pronóstico
+        last_date = df['fecha'].max()
+        future_dates = pd.date_range(
+            start=last_date + pd.Timedelta(days=1),
+            periods=self.forecast_horizon * 30,  # ~30 días por mes
+            freq='D'
+        )
+        
+        # Crear dataframe para pronóstico (incluye train, test y futuro)
+        future_df = pd.DataFrame({'ds': pd.concat([
+            prophet_data['ds'],
+            pd.Series(future_dates)
+        ]).drop_duplicates().sort_values()})
+        
+        # Añadir regresores si existen
+        if 'covid_impact' in train_data.columns:
+            future_df['covid_impact'] = future_df['ds'].isin(covid_dates).astype(int)
+        
+        return {
+            'anomalies': anomalies,
+            'train_data': train_data,
+            'test_data': test_data,
+            'future_df': future_df,
+            'cutoff_date': cutoff_date,
+            'last_date': last_date
+        }
+
+    @staticmethod
+    def compute_metrics(actual: pd.Series, predicted: pd.Series) -> Dict[str, float]:
+        """
+        RMSE, MAE, MAPE (%) y R² de un pronóstico contra los valores observados
+        """
+        rmse = np.sqrt(np.mean((actual - predicted)**2))
+        mae = np.mean(np.abs(actual - predicted))
+        mape = np.mean(np.abs((actual - predicted) / actual)) * 100
+        
+        # Coeficiente de determinación R²
+        y_mean = np.mean(actual)
+        ss_total = np.sum((actual - y_mean)**2)
+        ss_residual = np.sum((actual - predicted)**2)
+        r2 = 1 - (ss_residual / ss_total) if ss_total > 0 else 0
+        return {'rmse': float(rmse), 'mae': float(mae), 'mape': float(mape), 'r2': float(r2)}
+
+    def _format_result(self, prepared: Dict[str, Any], forecast: pd.DataFrame) -> Dict[str, Any]:
+        """
+        Calcula métricas y arma la respuesta a partir del pronóstico de un motor
+        """
+        train_data = prepared['train_data']
+        test_data = prepared['test_data']
+        cutoff_date = prepared['cutoff_date']
+        last_date = prepared['last_date']
+        
+        # Dividir resultados
+        train_forecast = forecast[forecast['ds'] <= cutoff_date]
+        test_forecast = forecast[(forecast['ds'] > cutoff_date) & (forecast['ds'] <= last_date)]
+        future_forecast = forecast[forecast['ds'] > last_date]
+        
+        # Calcular métricas en conjunto de prueba
+        if not test_data.empty:
+            test_results = pd.merge(
+                test_data, 
+                test_forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']], 
+                on='ds', 
+                how='left'
+            )
+            metrics = self.compute_metrics(test_results['y'], test_results['yhat'])
+        else:
+            metrics = {'rmse': 0.0, 'mae': 0.0, 'mape': 0.0, 'r2': 0.0}
+        
+        # Formatear resultados como arreglos de NumPy: el encoder JSON los serializa
+        # directamente y escribe NaN/inf como null
+        result = {
+            'train': {
+                'dates': date_strings(train_data['ds']),
+                'actual': float_array(train_data['y']),
+                'fitted': float_array(train_forecast['yhat']),
+                'lower': float_array(train_forecast['yhat_lower']),
+                'upper': float_array(train_forecast['yhat_upper'])
+            },
+            'test': {
+                'dates': date_strings(test_data['ds']),
+                'actual': float_array(test_data['y']),
+                'predicted': float_array(test_forecast['yhat']),
+                'lower': float_array(test_forecast['yhat_lower']),
+                'upper': float_array(test_forecast['yhat_upper'])
+            },
+            'forecast': {
+                'dates': date_strings(future_forecast['ds']),
+                'predicted': float_array(future_forecast['yhat']),
+                'lower': float_array(future_forecast['yhat_lower']),
+                'upper': float_array(future_forecast['yhat_upper'])
+            },
+            'metrics': {
+                'test': {name: self._finite_or_none(value) for name, value in metrics.items()}
+            },
+            'anomalies': prepared['anomalies'],
+            'components': {
+                'trend': float_array(forecast['trend']),
+                'yearly': float_array(forecast['yearly']),
+                'weekly': float_array(forecast['weekly'])
+            }
+        }
+        
+        return result
+
+    def generate_forecast(self, station_data: pd.DataFrame, engine: Optional[str] = None) -> Dict[str, Any]:
         """
         Genera pronóstico para los datos de una estación
         """
+        return self.generate_forecasts([station_data], engine)[0]
+
+    def generate_forecasts(self, stations: List[pd.DataFrame], engine: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Genera pronósticos para varias estaciones; los motores que lo soportan
+        (como 'fast') las ajustan en bloque
+        """
         try:
-            logger.info("Generando pronóstico...")
-            
-            # Preparar datos
-            df = station_data.copy()
-            # Asegurarse que fecha es datetime
-            df['fecha'] = pd.to_datetime(df['fecha'])
-            df = df.sort_values('fecha')
+            forecast_engine = self.get_engine(engine)
+            config = self._model_config(forecast_engine)
+            results: List[Optional[Dict[str, Any]]] = [None] * len(stations)
             
-            # Detectar anomalías como COVID
-            anomalies = self._detect_anomalies(df)
-            
-            # Preparar datos para Prophet
-            prophet_data = self._prepare_data_for_prophet(df)
-            
-            # Dividir en entrenamiento y prueba (últimos 6 meses)
-            cutoff_date = df['fecha'].max() - pd.Timedelta(days=180)
-            train_data = prophet_data[prophet_data['ds'] <= cutoff_date].copy()
-            test_data = prophet_data[prophet_data['ds'] > cutoff_date].copy()
-            
-            # Configurar modelo
-            model = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=True,
-                daily_seasonality=False,
-                changepoint_prior_scale=0.05,
-                seasonality_prior_scale=10.0
-            )
+            # Reutilizar pronósticos ya calculados para los mismos datos y configuración
+            pending = []
+            for position, station_data in enumerate(stations):
+                key = ForecastCache.make_key(station_data, config)
+                cached = self.cache.get(key)
+                CACHE_REQUESTS.inc(cache='forecast', result='hit' if cached is not None else 'miss')
+                if cached is not None:
+                    logger.debug("Pronóstico obtenido del cache")
+                    results[position] = cached
+                else:
+                    station_id = self._station_id(forecast_engine, station_data)
+                    with stage('prepare'):
+                        prepared = self._prepare(station_data)
+                    pending.append((position, key, station_id, prepared))
             
-            # Añadir regresores para eventos especiales
-            covid_dates = None
-            if anomalies:
-                for anomaly in anomalies:
-                    # Agregar regresor para COVID
-                    if anomaly['name'] == 'COVID-19':
-                        covid_dates = pd.date_range(
-                            start=anomaly['start_date'],
-                            end=anomaly['end_date']
-                        )
-                        train_data['covid_impact'] = train_data['ds'].isin(covid_dates).astype(int)
-                        model.add_regressor('covid_impact')
+            if pending:
+                logger.info("Generando %d pronóstico(s) con el motor '%s'...", len(pending), forecast_engine.name)
+                # Los datos cambiaron (o nunca se ajustaron): partir del último modelo de la estación
+                warm_starts = [
+                    self.cache.get_latest_model(station_id)
+                    if forecast_engine.supports_warm_start and station_id else None
+                    for _, _, station_id, _ in pending
+                ]
+                outputs = forecast_engine.fit_predict_many([
+                    (prepared['train_data'], prepared['future_df']) for _, _, _, prepared in pending
+                ], warm_starts)
+                for (position, key, station_id, prepared), (forecast, model_json) in zip(pending, outputs):
+                    with stage('format'):
+                        result = self._format_result(prepared, forecast)
+                    # Guardar modelo y pronóstico en el cache persistente
+                    self.cache.put(key, result, model_json)
+                    if model_json is not None and station_id:
+                        self.cache.set_latest(station_id, key)
+                    results[position] = result
+                logger.info("Pronóstico generado exitosamente")
             
-            # Entrenar modelo
-            model.fit(train_data)
-            
-            # Generar fechas futuras para pronóstico
-            last_date = df['fecha'].max()
-            future_dates = pd.date_range(
-                start=last_date + pd.Timedelta(days=1),
-                periods=self.forecast_horizon * 30,  # ~30 días por mes
-                freq='D'
-            )
-            
-            # Crear dataframe para pronóstico (incluye train, test y futuro)
-            future_df = pd.DataFrame({'ds': pd.concat([
-                prophet_data['ds'],
-                pd.Series(future_dates)
-            ]).drop_duplicates().sort_values()})
-            
-            # Añadir regresores si existen
-            if 'covid_impact' in train_data.columns:
-                future_df['covid_impact'] = future_df['ds'].isin(covid_dates).astype(int)
-            
-            # Generar pronóstico
-            forecast = model.predict(future_df)
-            
-            # Dividir resultados
-            train_forecast = forecast[forecast['ds'] <= cutoff_date]
-            test_forecast = forecast[(forecast['ds'] > cutoff_date) & (forecast['ds'] <= last_date)]
-            future_forecast = forecast[forecast['ds'] > last_date]
-            
-            # Calcular métricas en conjunto de prueba
-            if not test_data.empty:
-                test_results = pd.merge(
-                    test_data, 
-                    test_forecast[['ds', 'yhat', 'yhat_lower', 'yhat_upper']], 
-                    on='ds', 
-                    how='left'
-                )
-                
-                rmse = np.sqrt(np.mean((test_results['y'] - test_results['yhat'])**2))
-                mae = np.mean(np.abs(test_results['y'] - test_results['yhat']))
-                mape = np.mean(np.abs((test_results['y'] - test_results['yhat']) / test_results['y'])) * 100
-                
-                # Coeficiente de determinación R²
-                y_mean = np.mean(test_results['y'])
-                ss_total = np.sum((test_results['y'] - y_mean)**2)
-                ss_residual = np.sum((test_results['y'] - test_results['yhat'])**2)
-                r2 = 1 - (ss_residual / ss_total) if ss_total > 0 else 0
-            else:
-                rmse, mae, mape, r2 = 0, 0, 0, 0
-            
-            # Formatear resultados
-            result = {
-                'train': {
-                    'dates': train_data['ds'].dt.strftime('%Y-%m-%d').tolist(),
-                    'actual': train_data['y'].tolist(),
-                    'fitted': train_forecast['yhat'].tolist(),
-                    'lower': train_forecast['yhat_lower'].tolist(),
-                    'upper': train_forecast['yhat_upper'].tolist()
-                },
-                'test': {
-                    'dates': test_data['ds'].dt.strftime('%Y-%m-%d').tolist() if not test_data.empty else [],
-                    'actual': test_data['y'].tolist() if not test_data.empty else [],
-                    'predicted': test_forecast['yhat'].tolist() if not test_forecast.empty else [],
-                    'lower': test_forecast['yhat_lower'].tolist() if not test_forecast.empty else [],
-                    'upper': test_forecast['yhat_upper'].tolist() if not test_forecast.empty else []
-                },
-                'forecast': {
-                    'dates': future_forecast['ds'].dt.strftime('%Y-%m-%d').tolist(),
-                    'predicted': future_forecast['yhat'].tolist(),
-                    'lower': future_forecast['yhat_lower'].tolist(),
-                    'upper': future_forecast['yhat_upper'].tolist()
-                },
-                'metrics': {
-                    'test': {
-                        'rmse': float(rmse),
-                        'mae': float(mae),
-                        'mape': float(mape),
-                        'r2': float(r2)
-                    }
-                },
-                'anomalies': anomalies,
-                'components': {
-                    'trend': forecast['trend'].tolist(),
-                    'yearly': forecast['yearly'].tolist() if 'yearly' in forecast.columns else [],
-                    'weekly': forecast['weekly'].tolist() if 'weekly' in forecast.columns else []
-                }
-            }
-            
-            # Sanitizar los valores antes de devolverlos
-            result = self._sanitize_json_values(result)
-
-            logger.info("Pronóstico generado exitosamente")
-            return result
+            return results
             
         except Exception as e:
             logger.error(f"Error al generar pronóstico: {str(e)}", exc_info=True)
             raise Exception(f"Error en generación de pronóstico: {str(e)}")
         
-    def _sanitize_json_values(self, data: Any) -> Any:
-        """
-        Sanitiza valores no compatibles con JSON (inf, -inf, NaN)
-        """
-        if isinstance(data, dict):
-            return {k: self._sanitize_json_values(v) for k, v in data.items()}
-        elif isinstance(data, list):
-            return [self._sanitize_json_values(item) for item in data]
-        elif isinstance(data, (float, np.float64, np.float32)):
-            # Reemplazar inf, -inf, NaN con None (serán null en JSON)
-            if np.isinf(data) or np.isnan(data):
-                return None
-            return float(data)
-        elif isinstance(data, (np.int64, np.int32)):
-            return int(data)
-        return data
\ No newline at end of file
+    def shape_forecast(self, result: Dict[str, Any], fields: Optional[List[str]] = None,
+                       resolution: str = 'daily', points: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Reduce un pronóstico para la respuesta: conserva solo las secciones pedidas,
+        agrega las series diarias por semana o mes y limita cada serie a un número
+        de puntos con LTTB. El pronóstico completo sigue en el cache.
+        
+        Args:
+            result (Dict[str, Any]): Pronóstico completo de generate_forecast
+            fields (Optional[List[str]]): Secciones a devolver (todas por defecto)
+            resolution (str): 'daily', 'weekly' o 'monthly'
+            points (Optional[int]): Máximo de puntos por serie
+        """
+        if resolution != 'daily' and resolution not in RESOLUTION_FREQ:
+            raise ValueError(f"Resolución no soportada: {resolution}")
+        fields = list(fields) if fields else list(FORECAST_SECTIONS)
+        unknown = [field for field in fields if field not in FORECAST_SECTIONS]
+        if unknown:
+            raise ValueError(f"Secciones desconocidas: {unknown}. Disponibles: {list(FORECAST_SECTIONS)}")
+        
+        if resolution == 'daily' and points is None:
+            return {field: result[field] for field in fields}
+        
+        shaped = {}
+        for field in fields:
+            section = result[field]
+            if field == 'components':
+                # Los componentes cubren entrenamiento, prueba y futuro, en ese orden
+                dates = [
+                    date
+                    for part in ('train', 'test', 'forecast')
+                    for date in result[part]['dates']
+                ]
+                section = {'dates': dates, **section}
+            if field in PRIMARY_SERIES:
+                section = downsample_section(section, PRIMARY_SERIES[field], resolution, points)
+            shaped[field] = section
+        return shaped
+
+    @staticmethod
+    def _finite_or_none(value: Any) -> Optional[float]:
+        """Convierte una métrica a float; inf y NaN se reportan como None"""
+        value = float(value)
+        return value if np.isfinite(value) else None
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from .data_service import DataService
+from .forecast_executor import ForecastExecutor
+from .forecast_service import ForecastService
+from ..utils.json_utils import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def to_ndjson(event: Dict[str, Any]) -> bytes:
+    """
+    Codifica un evento como una línea de NDJSON
+    """
+    return dumps(event) + b'\n'
+
+def to_sse(event: Dict[str, Any]) -> bytes:
+    """
+    Codifica un evento como Server-Sent Event (el tipo va en el campo 'event')
+    """
+    return b'event: ' + event['event'].encode('utf-8') + b'\ndata: ' + dumps(event) + b'\n\n'
+
+
+class ForecastStreamService:
+    """
+    Pronostica varias estaciones y emite cada resultado en cuanto está listo.
+
+    Eventos, en orden de llegada:
+    - start: número total de estaciones
+    - progress: 'cache_hit' (se sirve del cache) o 'fitting' (el modelo se está ajustando)
+    - result: pronóstico de una estación ('done')
+    - error: la estación no se pudo pronosticar
+    - end: total y número de fallas
+
+    Las estaciones sin cache se ajustan a través del ForecastExecutor, con a lo
+    sumo un ajuste por proceso del pool a la vez para no saturar la cola.
+    """
+    def __init__(self, data_service: DataService, forecast_service: ForecastService,
+                 forecast_executor: ForecastExecutor):
+        self.data_service = data_service
+        self.forecast_service = forecast_service
+        self.forecast_executor = forecast_executor
+
+    async def stream(self, stations: List[Dict[str, str]], engine: Optional[str] = None,
+                     fields: Optional[List[str]] = None, resolution: str = 'daily',
+                     points: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.forecast_executor.max_workers)
+
+        async def process(linea: str, estacion: str):
+            station = {'linea': linea, 'estacion': estacion}
+            try:
+                station_data = await loop.run_in_executor(
+                    None, self.data_service.get_station_data, linea, estacion
+                )
+                cached = await loop.run_in_executor(
+                    None, self.forecast_service.get_cached_forecast, station_data, engine
+                )
+                if cached is not None:
+                    await queue.put({'event': 'progress', **station, 'status': 'cache_hit'})
+                    result = cached
+                else:
+                    async with semaphore:
+                        await queue.put({'event': 'progress', **station, 'status': 'fitting'})
+                        result = await self.forecast_executor.submit(station_data, engine)
+                forecast = self.forecast_service.shape_forecast(result, fields, resolution, points)
+                await queue.put({'event': 'result', **station, 'status': 'done', 'forecast': forecast})
+            except Exception as e:
+                logger.error(f"Error en el pronóstico de {linea} - {estacion}: {str(e)}")
+                await queue.put({'event': 'error', **station, 'status': 'error', 'detail': str(e)})
+
+        tasks = [
+            asyncio.ensure_future(process(station['linea'], station['estacion']))
+            for station in stations
+        ]
+        finished = failed = 0
+        try:
+            yield {'event': 'start', 'total': len(stations)}
+            while finished < len(stations):
+                event = await queue.get()
+                if event['event'] in ('result', 'error'):
+                    finished += 1
+                    failed += event['event'] == 'error'
+                yield event
+            yield {'event': 'end', 'total': len(stations), 'failed': failed}
+        finally:
+            # Si el cliente se desconecta se dejan de esperar los pendientes; los
+            # ajustes ya enviados terminan en el executor y quedan en el cache
+            for task in tasks:
+                task.cancel()
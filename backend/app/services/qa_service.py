@@ -0,0 +1,374 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .data_service import DataService
+from .query_service import QueryEngineUnavailableError
+from ..utils.metrics import stage
+from ..utils.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Intenciones que el servicio sabe contestar, con ejemplos de cómo se preguntan
+QA_INTENTS: Dict[str, List[str]] = {
+    'afluencia_estacion': [
+        "cuanta gente usa la estacion",
+        "cual es la afluencia de la estacion",
+        "cuantos pasajeros entran a la estacion",
+        "afluencia promedio diaria de la estacion",
+        "que tan concurrida es la estacion"
+    ],
+    'pronostico': [
+        "pronostico de afluencia de la estacion",
+        "cuanta gente usara la estacion el proximo mes",
+        "prediccion de pasajeros para la estacion",
+        "como se espera que cambie la afluencia en el futuro"
+    ],
+    'ranking_estaciones': [
+        "cuales son las estaciones mas concurridas",
+        "estaciones con mayor afluencia",
+        "top de estaciones con mas pasajeros",
+        "que estaciones tienen mas gente en la linea"
+    ],
+    'totales_linea': [
+        "afluencia total por linea",
+        "que linea transporta mas pasajeros",
+        "cuantos pasajeros tiene cada linea",
+        "comparar la afluencia entre lineas"
+    ],
+    'dia_semana': [
+        "que dia de la semana hay mas gente",
+        "afluencia por dia de la semana",
+        "cuanta gente viaja los fines de semana",
+        "perfil semanal de la estacion"
+    ],
+    'comparacion_anual': [
+        "comparacion con el año anterior",
+        "como cambio la afluencia respecto al año pasado",
+        "crecimiento anual de pasajeros",
+        "variacion mensual contra el mismo mes del año anterior"
+    ],
+    'lista_estaciones': [
+        "que estaciones tiene la linea",
+        "lista de estaciones",
+        "cuales son las estaciones de la linea"
+    ]
+}
+
+# Intenciones que necesitan una estación para contestarse
+STATION_INTENTS = ('afluencia_estacion', 'pronostico')
+
+_LINE_PATTERN = re.compile(r'\blinea\s+([0-9]{1,2}|[ab])\b')
+_YEAR_PATTERN = re.compile(r'\b(19[6-9][0-9]|20[0-9]{2})\b')
+
+# Modelos de sentence-transformers cargados, compartidos por todas las solicitudes
+_models: Dict[str, Any] = {}
+_models_lock = threading.Lock()
+
+
+class QAUnavailableError(Exception):
+    """
+    sentence-transformers no está instalado o el modelo no se pudo cargar
+    """
+
+
+def get_encoder(model_name: str):
+    """
+    Carga el modelo de embeddings la primera vez que se usa. La importación
+    también es diferida: los procesos que nunca contestan preguntas no pagan el
+    costo de importar torch ni de cargar el modelo.
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+    with _models_lock:
+        model = _models.get(model_name)
+        if model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise QAUnavailableError("sentence-transformers no está instalado")
+            logger.info(f"Cargando modelo de embeddings '{model_name}'...")
+            try:
+                model = SentenceTransformer(model_name)
+            except Exception as e:
+                raise QAUnavailableError(f"No se pudo cargar el modelo '{model_name}': {str(e)}")
+            _models[model_name] = model
+    return model
+
+
+class QAIndex:
+    """
+    Matriz de embeddings (float32, normalizados) del catálogo y de las
+    intenciones, mapeada en memoria desde el directorio del cache.
+
+    Las filas están agrupadas por tipo ('intent', 'linea', 'estacion');
+    segments guarda el rango de filas de cada grupo.
+    """
+    EMBEDDINGS_FILE = 'embeddings.npy'
+    META_FILE = 'meta.json'
+
+    def __init__(self, embeddings: np.ndarray, items: List[Dict[str, Any]],
+                 segments: Dict[str, Tuple[int, int]], fingerprint: str):
+        self.embeddings = embeddings
+        self.items = items
+        self.segments = segments
+        self.fingerprint = fingerprint
+
+    def save(self, directory: Path, model_name: str):
+        directory.mkdir(parents=True, exist_ok=True)
+        # Escritura atómica: otros procesos pueden estar leyendo el índice anterior
+        tmp_embeddings = directory / f"{self.EMBEDDINGS_FILE}.tmp"
+        with open(tmp_embeddings, 'wb') as f:
+            np.save(f, np.ascontiguousarray(self.embeddings, dtype=np.float32))
+        tmp_meta = directory / f"{self.META_FILE}.tmp"
+        tmp_meta.write_text(json.dumps({
+            'model': model_name,
+            'fingerprint': self.fingerprint,
+            'segments': self.segments,
+            'items': self.items
+        }, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_embeddings, directory / self.EMBEDDINGS_FILE)
+        os.replace(tmp_meta, directory / self.META_FILE)
+
+    @classmethod
+    def load(cls, directory: Path, model_name: str) -> Optional['QAIndex']:
+        try:
+            meta = json.loads((directory / cls.META_FILE).read_text(encoding='utf-8'))
+            if meta.get('model') != model_name:
+                return None
+            embeddings = np.load(directory / cls.EMBEDDINGS_FILE, mmap_mode='r')
+        except (FileNotFoundError, ValueError) as e:
+            logger.debug("Índice de QA no disponible en %s: %s", directory, e)
+            return None
+        if embeddings.shape[0] != len(meta['items']):
+            return None
+        segments = {name: tuple(bounds) for name, bounds in meta['segments'].items()}
+        return cls(embeddings, meta['items'], segments, meta['fingerprint'])
+
+    def top_k(self, scores: np.ndarray, segment: str, k: int) -> List[Tuple[Dict[str, Any], float]]:
+        """
+        Las k filas de un grupo con mayor similitud, de mayor a menor
+        """
+        start, stop = self.segments[segment]
+        if stop <= start:
+            return []
+        block = scores[start:stop]
+        k = min(k, len(block))
+        best = np.argpartition(-block, k - 1)[:k]
+        best = best[np.argsort(-block[best])]
+        return [(self.items[start + position], float(block[position])) for position in best]
+
+
+class QAService:
+    """
+    Responde preguntas en lenguaje natural sobre la afluencia.
+
+    Las estaciones, las líneas y los ejemplos de cada intención se codifican una
+    sola vez (python -m app.services.qa_service build) y se guardan en
+    MODEL_CACHE_DIR/qa_index como una matriz float32 que se mapea en memoria.
+    Por pregunta solo se codifica el texto de la pregunta; la búsqueda de
+    vecinos es un único producto matriz-vector con los embeddings normalizados
+    (similitud coseno), seguido de un top-k por grupo.
+
+    Si el índice no existe o no corresponde al catálogo actual (por ejemplo,
+    tras una ingesta con estaciones nuevas) se reconstruye en la primera pregunta.
+
+    Configuración por variables de entorno:
+    - QA_MODEL: modelo de sentence-transformers
+    - QA_MIN_SCORE: similitud mínima para aceptar una estación o línea
+    - MODEL_CACHE_DIR: directorio del cache (el índice va en qa_index/)
+    """
+    def __init__(self, data_service: DataService):
+        self.data_service = data_service
+        self.model_name = os.getenv('QA_MODEL', 'paraphrase-multilingual-MiniLM-L12-v2')
+        self.min_score = float(os.getenv('QA_MIN_SCORE', 0.5))
+        self.index_dir = Path(os.getenv('MODEL_CACHE_DIR', 'models')) / 'qa_index'
+        self._index: Optional[QAIndex] = None
+        self._index_version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def _catalogue_items(self) -> List[Dict[str, Any]]:
+        """
+        Filas del índice: ejemplos de intención, líneas y estaciones (una fila
+        por nombre de estación, con todas las líneas en las que aparece)
+        """
+        items = [
+            {'kind': 'intent', 'intent': intent, 'text': example}
+            for intent, examples in QA_INTENTS.items()
+            for example in examples
+        ]
+        stations: Dict[str, List[str]] = {}
+        for station in self.data_service.get_available_stations():
+            stations.setdefault(station['estacion'], []).append(station['linea'])
+        lines = sorted({linea for lineas in stations.values() for linea in lineas})
+        items.extend({'kind': 'linea', 'linea': linea, 'text': linea} for linea in lines)
+        items.extend(
+            {'kind': 'estacion', 'estacion': estacion, 'lineas': sorted(lineas), 'text': estacion}
+            for estacion, lineas in sorted(stations.items())
+        )
+        return items
+
+    @staticmethod
+    def _fingerprint(items: List[Dict[str, Any]]) -> str:
+        digest = hashlib.sha256(json.dumps(items, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        model = get_encoder(self.model_name)
+        embeddings = model.encode(
+            texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False
+        )
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def build_index(self) -> QAIndex:
+        """
+        Codifica el catálogo y las intenciones y guarda el índice en disco
+        """
+        items = self._catalogue_items()
+        segments: Dict[str, Tuple[int, int]] = {}
+        for position, item in enumerate(items):
+            start, _ = segments.get(item['kind'], (position, position))
+            segments[item['kind']] = (start, position + 1)
+        for kind in ('intent', 'linea', 'estacion'):
+            segments.setdefault(kind, (0, 0))
+
+        logger.info(f"Construyendo índice de QA con {len(items)} textos...")
+        embeddings = self.encode([item['text'] for item in items])
+        index = QAIndex(embeddings, items, segments, self._fingerprint(items))
+        index.save(self.index_dir, self.model_name)
+        logger.info(f"Índice de QA guardado en {self.index_dir}")
+        # Releer para usar la versión mapeada en memoria
+        return QAIndex.load(self.index_dir, self.model_name) or index
+
+    def get_index(self) -> QAIndex:
+        """
+        Índice vigente para el catálogo actual; solo se verifica cuando cambia
+        la versión del dataset
+        """
+        version = self.data_service.version
+        if self._index is not None and self._index_version == version:
+            return self._index
+        with self._lock:
+            if self._index is None or self._index_version != version:
+                fingerprint = self._fingerprint(self._catalogue_items())
+                index = QAIndex.load(self.index_dir, self.model_name)
+                if index is None or index.fingerprint != fingerprint:
+                    logger.warning("El índice de QA no existe o no corresponde al catálogo; se reconstruye")
+                    index = self.build_index()
+                self._index = index
+                self._index_version = version
+        return self._index
+
+    def search(self, question: str, k: int = 3) -> Dict[str, List[Tuple[Dict[str, Any], float]]]:
+        """
+        Las k intenciones, líneas y estaciones más parecidas a la pregunta
+        """
+        index = self.get_index()
+        with stage('qa_encode'):
+            query = self.encode([normalize_text(question)])[0]
+        with stage('qa_search'):
+            scores = index.embeddings @ query
+            return {kind: index.top_k(scores, kind, k) for kind in ('intent', 'linea', 'estacion')}
+
+    def answer(self, question: str, k: int = 3) -> Dict[str, Any]:
+        """
+        Interpreta la pregunta (intención, estación, línea y año) y la contesta
+        con los servicios de datos
+        """
+        try:
+            matches = self.search(question, k)
+            text = normalize_text(question)
+
+            intent, intent_score = matches['intent'][0][0]['intent'], matches['intent'][0][1]
+
+            # Los números de línea se distinguen mal por similitud: se prefiere la mención explícita
+            linea = None
+            explicit = _LINE_PATTERN.search(text)
+            if explicit:
+                linea = f"linea {explicit.group(1)}"
+            elif matches['linea'] and matches['linea'][0][1] >= self.min_score:
+                linea = matches['linea'][0][0]['linea']
+
+            estacion = None
+            if matches['estacion'] and matches['estacion'][0][1] >= self.min_score:
+                station = matches['estacion'][0][0]
+                estacion = station['estacion']
+                if linea not in station['lineas']:
+                    linea = station['lineas'][0]
+
+            year = _YEAR_PATTERN.search(text)
+            start, end = (f"{year.group(1)}-01-01", f"{year.group(1)}-12-31") if year else (None, None)
+
+            return {
+                'question': question,
+                'intent': intent,
+                'score': round(intent_score, 4),
+                'linea': linea,
+                'estacion': estacion,
+                'start': start,
+                'end': end,
+                'result': self._resolve(intent, linea, estacion, start, end),
+                'candidates': {
+                    kind: [
+                        {**{key: value for key, value in item.items() if key not in ('kind', 'text')},
+                         'score': round(score, 4)}
+                        for item, score in found
+                    ]
+                    for kind, found in matches.items()
+                }
+            }
+        except (QAUnavailableError, QueryEngineUnavailableError):
+            raise
+        except Exception as e:
+            logger.error(f"Error al contestar la pregunta: {str(e)}", exc_info=True)
+            raise Exception(f"Error al contestar la pregunta: {str(e)}")
+
+    def _resolve(self, intent: str, linea: Optional[str], estacion: Optional[str],
+                 start: Optional[str], end: Optional[str]) -> Any:
+        if intent in STATION_INTENTS and estacion is None:
+            raise ValueError("No se reconoció la estación en la pregunta")
+
+        query = self.data_service.query
+        if intent == 'afluencia_estacion':
+            return self.data_service.get_time_series(linea, estacion, start, end, granularity='year')
+        if intent == 'pronostico':
+            # Los pronósticos pueden tardar: se indica la ruta en lugar de calcularlo aquí
+            return {'endpoint': f"/api/forecast/{linea}/{estacion}"}
+        if intent == 'ranking_estaciones':
+            return query.top_stations(start, end, 10, linea)
+        if intent == 'totales_linea':
+            return query.line_totals(start, end)
+        if intent == 'dia_semana':
+            return query.day_of_week_profile(linea, estacion, start, end)
+        if intent == 'comparacion_anual':
+            return query.year_over_year(linea, estacion)
+        stations = self.data_service.get_available_stations()
+        return [station for station in stations if linea is None or station['linea'] == linea]
+
+
+if __name__ == '__main__':
+    # python -m app.services.qa_service build
+    # python -m app.services.qa_service ask "¿cuánta gente usa Pino Suárez?"
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Índice de embeddings del servicio de preguntas")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('build', help="Codificar el catálogo y las intenciones")
+    ask = commands.add_parser('ask', help="Contestar una pregunta")
+    ask.add_argument('question')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    service = QAService(DataService())
+    if args.command == 'build':
+        service.build_index()
+    else:
+        print(json.dumps(service.answer(args.question), ensure_ascii=False, indent=2, default=str))
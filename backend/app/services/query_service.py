@@ -0,0 +1,190 @@
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+from ..utils.text_utils import normalize_text
+
+try:
+    import duckdb
+except ImportError:  # duckdb es opcional
+    duckdb = None
+
+logger = logging.getLogger(__name__)
+
+
+class QueryEngineUnavailableError(Exception):
+    """
+    El motor analítico (DuckDB) no está disponible
+    """
+
+
+class QueryService:
+    """
+    Capa de consultas analíticas sobre DuckDB.
+
+    El DataFrame del DataService (respaldado por el snapshot mapeado en memoria
+    cuando existe) se registra en DuckDB sin copiarlo, y las agregaciones se
+    ejecutan como SQL con varios hilos. Cada consulta usa su propio cursor, de
+    modo que las solicitudes concurrentes no se bloquean entre sí.
+
+    Configuración por variables de entorno:
+    - DUCKDB_THREADS: hilos que DuckDB usa por consulta
+    """
+    TABLE = 'afluencia'
+
+    def __init__(self):
+        self.threads = int(os.getenv('DUCKDB_THREADS', os.cpu_count() or 1))
+        self._connection = None
+        self._df: Optional[pd.DataFrame] = None
+
+    @property
+    def available(self) -> bool:
+        return duckdb is not None and self._df is not None
+
+    def register(self, df: pd.DataFrame):
+        """
+        Registra (o reemplaza tras una recarga) el dataset en DuckDB
+        """
+        if duckdb is None:
+            logger.warning("DuckDB no está instalado; las consultas analíticas estarán deshabilitadas")
+            return
+        if self._connection is None:
+            self._connection = duckdb.connect(database=':memory:')
+            self._connection.execute(f"SET threads TO {self.threads}")
+        self._df = df
+        logger.info(f"Dataset registrado en DuckDB ({len(df)} filas, {self.threads} hilos)")
+
+    def _query(self, sql: str, params: Optional[List[Any]] = None) -> List[Dict]:
+        if not self.available:
+            raise QueryEngineUnavailableError("El motor de consultas analíticas no está disponible")
+
+        cursor = self._connection.cursor()
+        try:
+            cursor.register(self.TABLE, self._df)
+            cursor.execute(sql, params or [])
+            columns = [column[0] for column in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _date_filter(start: Optional[str], end: Optional[str], params: List[Any]) -> str:
+        conditions = []
+        if start:
+            conditions.append("fecha >= ?")
+            params.append(pd.Timestamp(start).to_pydatetime())
+        if end:
+            conditions.append("fecha <= ?")
+            params.append(pd.Timestamp(end).to_pydatetime())
+        return " AND ".join(conditions) if conditions else "TRUE"
+
+    def line_totals(self, start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """
+        Afluencia total y promedio diario por línea en un rango de fechas
+        """
+        params: List[Any] = []
+        where = self._date_filter(start, end, params)
+        return self._query(f"""
+            SELECT
+                CAST(linea AS VARCHAR) AS linea,
+                COUNT(DISTINCT estacion) AS total_estaciones,
+                SUM(afluencia) AS afluencia_total,
+                SUM(afluencia) / COUNT(DISTINCT fecha) AS promedio_diario
+            FROM {self.TABLE}
+            WHERE {where}
+            GROUP BY linea
+            ORDER BY afluencia_total DESC
+        """, params)
+
+    def top_stations(self, start: Optional[str] = None, end: Optional[str] = None,
+                     limit: int = 10, linea: Optional[str] = None) -> List[Dict]:
+        """
+        Estaciones con mayor afluencia total en un rango de fechas
+        """
+        params: List[Any] = []
+        where = self._date_filter(start, end, params)
+        if linea:
+            where += " AND CAST(linea AS VARCHAR) = ?"
+            params.append(normalize_text(linea))
+        params.append(limit)
+        return self._query(f"""
+            SELECT
+                CAST(linea AS VARCHAR) AS linea,
+                CAST(estacion AS VARCHAR) AS estacion,
+                SUM(afluencia) AS afluencia_total,
+                AVG(afluencia) AS promedio_diario
+            FROM {self.TABLE}
+            WHERE {where}
+            GROUP BY linea, estacion
+            ORDER BY afluencia_total DESC
+            LIMIT ?
+        """, params)
+
+    def day_of_week_profile(self, linea: Optional[str] = None, estacion: Optional[str] = None,
+                            start: Optional[str] = None, end: Optional[str] = None) -> List[Dict]:
+        """
+        Afluencia promedio por día de la semana (1 = lunes ... 7 = domingo)
+        """
+        params: List[Any] = []
+        where = self._date_filter(start, end, params)
+        if linea:
+            where += " AND CAST(linea AS VARCHAR) = ?"
+            params.append(normalize_text(linea))
+        if estacion:
+            where += " AND CAST(estacion AS VARCHAR) = ?"
+            params.append(normalize_text(estacion))
+        # Primero se suma por día (para agregar varias estaciones) y luego se promedia
+        return self._query(f"""
+            WITH diario AS (
+                SELECT fecha, SUM(afluencia) AS afluencia
+                FROM {self.TABLE}
+                WHERE {where}
+                GROUP BY fecha
+            )
+            SELECT
+                ISODOW(fecha) AS dia_semana,
+                AVG(afluencia) AS promedio,
+                MIN(afluencia) AS minimo,
+                MAX(afluencia) AS maximo,
+                COUNT(*) AS dias
+            FROM diario
+            GROUP BY dia_semana
+            ORDER BY dia_semana
+        """, params)
+
+    def year_over_year(self, linea: Optional[str] = None, estacion: Optional[str] = None) -> List[Dict]:
+        """
+        Afluencia mensual comparada contra el mismo mes del año anterior
+        """
+        params: List[Any] = []
+        where = "TRUE"
+        if linea:
+            where += " AND CAST(linea AS VARCHAR) = ?"
+            params.append(normalize_text(linea))
+        if estacion:
+            where += " AND CAST(estacion AS VARCHAR) = ?"
+            params.append(normalize_text(estacion))
+        return self._query(f"""
+            WITH mensual AS (
+                SELECT
+                    YEAR(fecha) AS anio,
+                    MONTH(fecha) AS mes,
+                    SUM(afluencia) AS afluencia_total
+                FROM {self.TABLE}
+                WHERE {where}
+                GROUP BY anio, mes
+            )
+            SELECT
+                anio,
+                mes,
+                afluencia_total,
+                LAG(afluencia_total) OVER (PARTITION BY mes ORDER BY anio) AS afluencia_anio_anterior,
+                ROUND(
+                    100.0 * (afluencia_total / LAG(afluencia_total) OVER (PARTITION BY mes ORDER BY anio) - 1),
+                    2
+                ) AS variacion_porcentual
+            FROM mensual
+            ORDER BY anio, mes
+        """, params)
@@ -0,0 +1,114 @@
+from typing import Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Granularidades soportadas y su frecuencia de pandas
+GRANULARITY_FREQ = {
+    'week': 'W',
+    'month': 'M',
+    'quarter': 'Q',
+    'year': 'Y'
+}
+
+def build_period_cube(fecha: np.ndarray, values: np.ndarray, starts: np.ndarray,
+                      stops: np.ndarray, freq: str) -> Dict[str, np.ndarray]:
+    """
+    Construye en una sola pasada vectorizada la tabla estación × periodo con
+    count, sum, sumsq, min y max.
+
+    Requiere que las filas estén ordenadas por estación y fecha, y que cada
+    estación ocupe el rango [starts[i], stops[i]). Las filas de la tabla quedan
+    ordenadas por estación y periodo.
+
+    Args:
+        fecha (np.ndarray): Fechas (datetime64) de cada fila
+        values (np.ndarray): Afluencia de cada fila
+        starts (np.ndarray): Fila inicial de cada estación
+        stops (np.ndarray): Fila final (exclusiva) de cada estación
+        freq (str): Frecuencia de pandas del periodo ('W', 'M', ...)
+
+    Returns:
+        Dict[str, np.ndarray]: Columnas de la tabla agregada
+    """
+    n_rows = len(values)
+    station_ids = np.repeat(np.arange(len(starts)), stops - starts)
+    periods = pd.DatetimeIndex(fecha).to_period(freq).asi8
+
+    if n_rows == 0:
+        empty = np.array([], dtype=np.float64)
+        return {
+            'station': station_ids, 'period': periods, 'count': np.array([], dtype=np.int64),
+            'sum': empty, 'sumsq': empty, 'min': empty, 'max': empty
+        }
+
+    changes = (station_ids[1:] != station_ids[:-1]) | (periods[1:] != periods[:-1])
+    group_starts = np.flatnonzero(np.r_[True, changes])
+    values = np.asarray(values, dtype=np.float64)
+
+    return {
+        'station': station_ids[group_starts],
+        'period': periods[group_starts],
+        'count': np.diff(np.r_[group_starts, n_rows]),
+        'sum': np.add.reduceat(values, group_starts),
+        'sumsq': np.add.reduceat(values * values, group_starts),
+        'min': np.minimum.reduceat(values, group_starts),
+        'max': np.maximum.reduceat(values, group_starts)
+    }
+
+def cube_station_bounds(cube: Dict[str, np.ndarray], n_stations: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rango de filas [inicio, fin) de cada estación dentro de la tabla agregada
+    """
+    station_numbers = np.arange(n_stations)
+    starts = np.searchsorted(cube['station'], station_numbers, side='left')
+    stops = np.searchsorted(cube['station'], station_numbers, side='right')
+    return starts, stops
+
+def slice_cube(cube: Dict[str, np.ndarray], start: int, stop: int) -> Dict[str, np.ndarray]:
+    """
+    Obtiene (sin copiar) las filas [start, stop) de la tabla agregada
+    """
+    return {field: column[start:stop] for field, column in cube.items()}
+
+def rollup(cube: Dict[str, np.ndarray], freq: str, target_freq: str) -> Dict[str, np.ndarray]:
+    """
+    Reagrega una tabla de una sola estación a un periodo más grueso (p. ej. mes -> trimestre)
+    """
+    if len(cube['period']) == 0 or freq == target_freq:
+        return cube
+
+    source = pd.PeriodIndex(pd.arrays.PeriodArray(cube['period'], dtype=pd.PeriodDtype(freq)))
+    periods = source.asfreq(target_freq).asi8
+    group_starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+
+    return {
+        'station': cube['station'][group_starts],
+        'period': periods[group_starts],
+        'count': np.add.reduceat(cube['count'], group_starts),
+        'sum': np.add.reduceat(cube['sum'], group_starts),
+        'sumsq': np.add.reduceat(cube['sumsq'], group_starts),
+        'min': np.minimum.reduceat(cube['min'], group_starts),
+        'max': np.maximum.reduceat(cube['max'], group_starts)
+    }
+
+def summarize(cube: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Calcula mean y std (muestral, como pandas) a partir de count, sum y sumsq
+    """
+    count = cube['count'].astype(np.float64)
+    mean = cube['sum'] / count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = (cube['sumsq'] - cube['sum'] * mean) / (count - 1)
+    std = np.where(count > 1, np.sqrt(np.clip(variance, 0, None)), np.nan)
+    return {'mean': mean, 'std': std, 'min': cube['min'], 'max': cube['max'], 'count': cube['count']}
+
+def period_labels(periods: np.ndarray, freq: str) -> list:
+    """
+    Etiquetas de texto de los periodos: fecha de inicio para semanas y
+    el formato de pandas para meses ('2020-01'), trimestres ('2020Q1') y años ('2020')
+    """
+    index = pd.PeriodIndex(pd.arrays.PeriodArray(periods, dtype=pd.PeriodDtype(freq)))
+    if freq == 'W':
+        return index.start_time.strftime('%Y-%m-%d').tolist()
+    return index.astype(str).tolist()
@@ -0,0 +1,260 @@
+from typing import Dict, Tuple
+
+import numpy as np
+from scipy.ndimage import uniform_filter1d
+
+# Tipos de anomalía, en orden de prioridad cuando un día cumple varios criterios
+CLOSURE, NETWORK_DROP, DROP, SPIKE = 1, 2, 3, 4
+DAY_KINDS = {
+    CLOSURE: 'cierre',
+    NETWORK_DROP: 'evento_red',
+    DROP: 'caida',
+    SPIKE: 'pico'
+}
+SHIFT_DOWN, SHIFT_UP = 'cambio_nivel_baja', 'cambio_nivel_alza'
+ANOMALY_KINDS = tuple(DAY_KINDS.values()) + (SHIFT_DOWN, SHIFT_UP)
+
+# Nombres para mostrar en los pronósticos y en la interfaz
+KIND_LABELS = {
+    'cierre': 'Cierre',
+    'evento_red': 'Evento en toda la red',
+    'caida': 'Caída de afluencia',
+    'pico': 'Pico de afluencia',
+    SHIFT_DOWN: 'Caída sostenida',
+    SHIFT_UP: 'Alza sostenida'
+}
+
+# Parámetros por defecto de la detección
+DEFAULT_PARAMS = {
+    'baseline_weeks': 8,        # semanas previas (mismo día de la semana) de la línea base
+    'min_baseline_weeks': 4,    # semanas con datos necesarias para evaluar un día
+    'z_threshold': 3.5,         # |z| mínimo de una caída o un pico
+    'min_change': 0.3,          # cambio relativo mínimo contra la línea base
+    'min_scale': 0.1,           # piso de la desviación, como fracción de la línea base
+    'closure_ratio': 0.05,      # afluencia menor a esta fracción de la base = cierre
+    'network_share': 0.5,       # fracción de estaciones con caída para considerarlo evento de red
+    'shift_window': 28,         # días de la media corta (centrada) de los cambios de nivel
+    'shift_history': 365,       # días de la media larga previa a la ventana corta
+    'shift_change': 0.3,        # cambio relativo mínimo de un cambio de nivel
+    'min_shift_days': 14        # duración mínima de un cambio de nivel
+}
+
+
+def station_day_matrix(day_numbers: np.ndarray, values: np.ndarray, starts: np.ndarray,
+                       stops: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Acomoda las filas (ordenadas por estación) en una matriz estación × día.
+    Los días sin registro quedan en NaN.
+
+    Args:
+        day_numbers (np.ndarray): Días desde la época (datetime64[D] como entero)
+        values (np.ndarray): Afluencia de cada fila
+        starts (np.ndarray): Fila inicial de cada estación
+        stops (np.ndarray): Fila final (exclusiva) de cada estación
+
+    Returns:
+        Tuple[np.ndarray, int]: Matriz float64 y número del primer día
+    """
+    if len(values) == 0:
+        return np.empty((len(starts), 0)), 0
+    first_day = int(day_numbers.min())
+    n_days = int(day_numbers.max()) - first_day + 1
+    station_ids = np.repeat(np.arange(len(starts)), stops - starts)
+    matrix = np.full((len(starts), n_days), np.nan)
+    matrix[station_ids, day_numbers - first_day] = values
+    return matrix, first_day
+
+
+def _weekday_baseline(matrix: np.ndarray, weeks: int, min_weeks: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Media y desviación estándar de las `weeks` semanas previas para el mismo
+    día de la semana, con sumas acumuladas sobre la matriz
+    estación × semana × día de la semana
+    """
+    n_stations, n_days = matrix.shape
+    n_weeks = -(-n_days // 7)
+    padded = np.full((n_stations, n_weeks * 7), np.nan)
+    padded[:, :n_days] = matrix
+    cube = padded.reshape(n_stations, n_weeks, 7)
+
+    valid = ~np.isnan(cube)
+    filled = np.where(valid, cube, 0.0)
+    zeros = np.zeros((n_stations, 1, 7))
+    count = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    total = np.concatenate([zeros, np.cumsum(filled, axis=1)], axis=1)
+    squares = np.concatenate([zeros, np.cumsum(filled * filled, axis=1)], axis=1)
+
+    # Ventana [w - weeks, w): excluye la semana evaluada
+    current = np.arange(n_weeks)
+    previous = np.maximum(current - weeks, 0)
+    n = count[:, current] - count[:, previous]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (total[:, current] - total[:, previous]) / n
+        var = (squares[:, current] - squares[:, previous]) / n - mean * mean
+    mean[n < min_weeks] = np.nan
+    std = np.sqrt(np.clip(var, 0, None))
+
+    mean = mean.reshape(n_stations, -1)[:, :n_days]
+    std = std.reshape(n_stations, -1)[:, :n_days]
+    return mean, std
+
+
+def _trailing_mean(matrix: np.ndarray, window: int, offset: int) -> np.ndarray:
+    """
+    Media (ignorando NaN) de los días [d - offset - window, d - offset) para cada día d
+    """
+    n_stations, n_days = matrix.shape
+    valid = ~np.isnan(matrix)
+    zeros = np.zeros((n_stations, 1))
+    count = np.concatenate([zeros, np.cumsum(valid, axis=1)], axis=1)
+    total = np.concatenate([zeros, np.cumsum(np.where(valid, matrix, 0.0), axis=1)], axis=1)
+    stop = np.clip(np.arange(n_days) - offset, 0, n_days)
+    start = np.clip(stop - window, 0, n_days)
+    n = count[:, stop] - count[:, start]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = (total[:, stop] - total[:, start]) / n
+    # Se exige al menos la mitad de la ventana con datos
+    mean[n < window / 2] = np.nan
+    return mean
+
+
+def _runs(flags: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tramos consecutivos de días marcados en cada fila: (estación, inicio, fin exclusivo)
+    """
+    n_stations = flags.shape[0]
+    padding = np.zeros((n_stations, 1), dtype=np.int8)
+    edges = np.diff(np.concatenate([padding, flags.astype(np.int8), padding], axis=1), axis=1)
+    stations, starts = np.nonzero(edges == 1)
+    _, stops = np.nonzero(edges == -1)
+    return stations, starts, stops
+
+
+def _run_sums(values: np.ndarray, stations: np.ndarray, starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+    """
+    Suma (ignorando NaN) de cada tramo con una sola pasada de sumas acumuladas
+    """
+    n_days = values.shape[1]
+    cumulative = np.concatenate(
+        [np.zeros((values.shape[0], 1)), np.cumsum(np.nan_to_num(values), axis=1)], axis=1
+    ).ravel()
+    width = n_days + 1
+    return cumulative[stations * width + stops] - cumulative[stations * width + starts]
+
+
+def detect_anomalies(matrix: np.ndarray, params: Dict = None) -> Dict[str, np.ndarray]:
+    """
+    Detecta anomalías en todas las estaciones a la vez sobre la matriz estación × día.
+
+    - Días atípicos: z-score contra la media y desviación de las semanas previas
+      (mismo día de la semana). Un día es cierre si la afluencia casi desaparece,
+      caída o pico si |z| y el cambio relativo superan los umbrales, y evento de
+      red si la caída ocurre a la vez en una fracción grande de las estaciones
+      (feriados, contingencias).
+    - Cambios de nivel: la media centrada de shift_window días contra la media
+      del año previo; marca periodos sostenidos como la caída por COVID.
+
+    Returns:
+        Dict[str, np.ndarray]: Tramos (episodios) como columnas paralelas:
+        station, kind, start, stop (días relativos a la matriz, fin exclusivo),
+        impact (1 - observado / esperado), z (z-score extremo del tramo)
+        y network_share (fracción media de estaciones afectadas)
+    """
+    p = {**DEFAULT_PARAMS, **(params or {})}
+    n_stations, n_days = matrix.shape
+
+    baseline, std = _weekday_baseline(matrix, p['baseline_weeks'], p['min_baseline_weeks'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # Piso de la desviación: con pocas semanas la desviación se subestima y
+        # las estaciones muy regulares tendrían z enormes por variaciones normales
+        scale = np.fmax(std, p['min_scale'] * baseline)
+        scale = np.fmax(scale, 1.0)
+        z = (matrix - baseline) / scale
+        ratio = matrix / baseline
+
+    evaluated = ~np.isnan(z)
+    closure = evaluated & (ratio <= p['closure_ratio'])
+    drop = evaluated & (z <= -p['z_threshold']) & (ratio <= 1 - p['min_change'])
+    spike = evaluated & (z >= p['z_threshold']) & (ratio >= 1 + p['min_change'])
+
+    # Fracción de estaciones evaluadas con caída o cierre en cada día
+    evaluated_count = evaluated.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        network_share = np.where(evaluated_count > 0, (drop | closure).sum(axis=0) / evaluated_count, 0.0)
+    network_day = network_share >= p['network_share']
+
+    kinds = np.zeros((n_stations, n_days), dtype=np.int8)
+    kinds[spike] = SPIKE
+    kinds[drop] = DROP
+    kinds[drop & network_day[None, :]] = NETWORK_DROP
+    kinds[closure] = CLOSURE
+
+    expected = np.where(evaluated, baseline, np.nan)
+    columns = {name: [] for name in ('station', 'kind', 'start', 'stop', 'impact', 'z', 'network_share')}
+
+    def add_runs(flags: np.ndarray, kind_name: str, reference: np.ndarray, extreme: np.ndarray,
+                 use_min: bool, min_days: int = 1):
+        stations, starts, stops = _runs(flags)
+        keep = (stops - starts) >= min_days
+        stations, starts, stops = stations[keep], starts[keep], stops[keep]
+        if len(stations) == 0:
+            return
+        expected_sum = _run_sums(reference, stations, starts, stops)
+        observed_sum = _run_sums(matrix, stations, starts, stops)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            impact = np.where(expected_sum > 0, 1 - observed_sum / expected_sum, np.nan)
+        # Valor extremo de z dentro de cada tramo (reduceat sobre la matriz aplanada)
+        flat = np.where(np.isnan(extreme), 0.0, extreme).ravel()
+        offsets = stations * n_days
+        reducer = np.minimum if use_min else np.maximum
+        bounds = np.column_stack([offsets + starts, offsets + stops]).ravel()
+        extremes = reducer.reduceat(np.r_[flat, 0.0], bounds)[::2]
+        share_cumulative = np.r_[0.0, np.cumsum(network_share)]
+        share = (share_cumulative[stops] - share_cumulative[starts]) / (stops - starts)
+
+        columns['station'].append(stations)
+        columns['kind'].append(np.full(len(stations), kind_name, dtype=object))
+        columns['start'].append(starts)
+        columns['stop'].append(stops)
+        columns['impact'].append(impact)
+        columns['z'].append(extremes)
+        columns['network_share'].append(share)
+
+    for code, name in DAY_KINDS.items():
+        add_runs(kinds == code, name, expected, z, use_min=code != SPIKE)
+
+    # Cambios de nivel sostenidos
+    window = p['shift_window']
+    short_mean = uniform_filter1d(np.nan_to_num(matrix), size=window, axis=1, mode='nearest')
+    short_valid = uniform_filter1d((~np.isnan(matrix)).astype(np.float64), size=window, axis=1, mode='nearest')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        short_mean = np.where(short_valid >= 0.5, short_mean / short_valid, np.nan)
+    long_mean = _trailing_mean(matrix, p['shift_history'], window // 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shift_ratio = short_mean / long_mean
+        shift_z = np.log(shift_ratio)
+    shift_down = shift_ratio <= 1 - p['shift_change']
+    shift_up = shift_ratio >= 1 / (1 - p['shift_change'])
+    for flags, name, use_min in ((shift_down, SHIFT_DOWN, True), (shift_up, SHIFT_UP, False)):
+        add_runs(flags, name, long_mean, shift_z, use_min, min_days=p['min_shift_days'])
+
+    result = {
+        field: np.concatenate(parts) if parts else np.array([])
+        for field, parts in columns.items()
+    }
+    result['network_share_daily'] = network_share
+    return result
+
+
+def network_events(network_share_daily: np.ndarray, threshold: float = DEFAULT_PARAMS['network_share']
+                   ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Tramos de días con caída simultánea en al menos `threshold` de las estaciones
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: inicio, fin exclusivo y
+        fracción media de estaciones afectadas de cada tramo
+    """
+    share = np.asarray(network_share_daily, dtype=np.float64)[None, :]
+    _, starts, stops = _runs(share >= threshold)
+    return starts, stops, _run_sums(share, np.zeros(len(starts), dtype=np.int64), starts, stops) / (stops - starts)
@@ -0,0 +1,51 @@
+from typing import Iterable
+
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Respuestas que se transmiten por eventos: GZipResponder las acumularía hasta el final
+STREAMING_MEDIA_TYPES = ('text/event-stream', 'application/x-ndjson')
+
+
+class SelectiveGZipMiddleware:
+    """
+    GZipMiddleware de Starlette que deja pasar sin comprimir las rutas y los
+    tipos de contenido en streaming.
+
+    GZipResponder escribe cada fragmento en un GzipFile sin vaciarlo, así que en
+    NDJSON o SSE el cliente solo recibiría los eventos al cerrarse la respuesta.
+    """
+    def __init__(self, app: ASGIApp, minimum_size: int = 500, compresslevel: int = 9,
+                 excluded_paths: Iterable[str] = (), excluded_media_types: Iterable[str] = STREAMING_MEDIA_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.excluded_paths = frozenset(excluded_paths)
+        self.excluded_media_types = frozenset(excluded_media_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope['type'] != 'http'
+            or scope['path'] in self.excluded_paths
+            or 'gzip' not in Headers(scope=scope).get('Accept-Encoding', '')
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        responder = GZipResponder(self.app, self.minimum_size, compresslevel=self.compresslevel)
+        responder.send = send
+        bypass = False
+
+        async def send_selectively(message: Message) -> None:
+            # El tipo de contenido se conoce hasta el inicio de la respuesta
+            nonlocal bypass
+            if message['type'] == 'http.response.start':
+                media_type = Headers(raw=message['headers']).get('content-type', '').split(';')[0].strip()
+                bypass = media_type in self.excluded_media_types
+            if bypass:
+                await send(message)
+            else:
+                await responder.send_with_gzip(message)
+
+        await self.app(scope, receive, send_selectively)
@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from .json_utils import date_strings
+
+# Resoluciones soportadas para reducir series diarias y su frecuencia de pandas
+RESOLUTION_FREQ = {
+    'weekly': 'W',
+    'monthly': 'M'
+}
+
+ArrayLike = Union[np.ndarray, list]
+
+def aggregate_series(dates: ArrayLike, series: Dict[str, ArrayLike], freq: str) -> Dict[str, ArrayLike]:
+    """
+    Promedia series diarias por periodo (semana o mes) de forma vectorizada.
+
+    Los valores nulos (NaN) no cuentan para el promedio; un periodo sin valores
+    queda como NaN. Cada periodo se etiqueta con su primera fecha, de modo que
+    las secciones que comparten un periodo (p. ej. entrenamiento y prueba) no
+    repiten etiquetas.
+
+    Args:
+        dates (ArrayLike): Fechas ordenadas ('YYYY-MM-DD' o datetime64)
+        series (Dict[str, ArrayLike]): Series alineadas con las fechas
+        freq (str): Frecuencia de pandas del periodo ('W' o 'M')
+
+    Returns:
+        Dict[str, ArrayLike]: 'dates' y las series agregadas
+    """
+    days = np.asarray(dates, dtype='datetime64[D]')
+    if len(days) == 0:
+        return {'dates': [], **{name: np.asarray(values, dtype=np.float64) for name, values in series.items()}}
+
+    periods = pd.DatetimeIndex(days).to_period(freq).asi8
+    group_starts = np.flatnonzero(np.r_[True, periods[1:] != periods[:-1]])
+
+    result: Dict[str, ArrayLike] = {'dates': date_strings(days[group_starts])}
+    for name, values in series.items():
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        totals = np.add.reduceat(np.where(finite, values, 0.0), group_starts)
+        counts = np.add.reduceat(finite.astype(np.int64), group_starts)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[name] = np.where(counts > 0, totals / counts, np.nan)
+    return result
+
+def lttb_indices(values: ArrayLike, threshold: int) -> np.ndarray:
+    """
+    Índices de los puntos que conserva Largest-Triangle-Three-Buckets.
+
+    Se conservan el primer y el último punto; el resto se divide en
+    threshold - 2 cubetas y de cada una se elige el punto que forma el
+    triángulo más grande con el punto elegido antes y el promedio de la
+    cubeta siguiente. Así se mantienen los picos y valles visibles de la serie
+    con muchos menos puntos. Los valores nulos se tratan como cero.
+
+    Args:
+        values (ArrayLike): Serie (se asume espaciado uniforme en x)
+        threshold (int): Número de puntos a conservar
+
+    Returns:
+        np.ndarray: Índices ordenados de los puntos conservados
+    """
+    y = np.nan_to_num(np.asarray(values, dtype=np.float64))
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.arange(n, dtype=np.float64)
+    # Límites de las cubetas para los puntos interiores [1, n - 1)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], max(edges[bucket + 1], edges[bucket] + 1)
+        # Promedio de la cubeta siguiente (o el último punto)
+        if bucket + 2 < len(edges):
+            next_start, next_stop = edges[bucket + 1], max(edges[bucket + 2], edges[bucket + 1] + 1)
+            avg_x, avg_y = x[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        else:
+            avg_x, avg_y = x[-1], y[-1]
+
+        areas = np.abs(
+            (x[previous] - avg_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (avg_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def take(values: ArrayLike, indices: np.ndarray) -> ArrayLike:
+    """
+    Selecciona índices de un arreglo de NumPy o de una lista
+    """
+    if isinstance(values, np.ndarray):
+        return values[indices]
+    return [values[i] for i in indices.tolist()]
+
+def downsample_section(section: Dict[str, ArrayLike], primary: str, resolution: str = 'daily',
+                       points: Optional[int] = None) -> Dict[str, ArrayLike]:
+    """
+    Reduce una sección del pronóstico ('dates' más series alineadas): primero la
+    agrega a la resolución pedida y luego, si aún tiene más de points puntos,
+    aplica LTTB sobre la serie primary y toma los mismos índices en todas las
+    series para que las bandas sigan alineadas.
+    """
+    series_names: List[str] = [name for name in section if name != 'dates']
+    if resolution != 'daily':
+        section = aggregate_series(section['dates'], {name: section[name] for name in series_names},
+                                   RESOLUTION_FREQ[resolution])
+
+    if points is not None and len(section['dates']) > points:
+        indices = lttb_indices(section[primary], points)
+        section = {name: take(values, indices) for name, values in section.items()}
+    return section
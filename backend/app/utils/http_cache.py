@@ -0,0 +1,52 @@
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+
+
+def make_etag(*parts: Any) -> str:
+    """
+    ETag débil derivado de la versión del dataset y de los parámetros de la
+    solicitud. Es débil (W/) porque la compresión cambia los bytes enviados,
+    no el contenido.
+    """
+    digest = hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8'))
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+def request_fingerprint(request: Request) -> str:
+    """
+    Ruta y parámetros de la solicitud en forma canónica (orden de parámetros estable)
+    """
+    params = sorted(request.query_params.multi_items())
+    return f"{request.url.path}?{'&'.join(f'{key}={value}' for key, value in params)}"
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Compara If-None-Match con el ETag usando la comparación débil de RFC 9110
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+def cache_headers(etag: str, max_age: int) -> Dict[str, str]:
+    return {
+        'ETag': etag,
+        'Cache-Control': f'public, max-age={max_age}'
+    }
+
+def not_modified(request: Request, etag: str, max_age: int) -> Optional[Response]:
+    """
+    Respuesta 304 si el cliente ya tiene la versión actual; None en otro caso
+    """
+    if etag_matches(request.headers.get('if-none-match'), etag):
+        return Response(status_code=304, headers=cache_headers(etag, max_age))
+    return None
@@ -0,0 +1,153 @@
+import cProfile
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from .metrics import REGISTRY
+
+try:
+    from pyinstrument import Profiler as SamplingProfiler
+except ImportError:  # pyinstrument es opcional; sin él se usa cProfile
+    SamplingProfiler = None
+
+logger = logging.getLogger(__name__)
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'metro_http_request_duration_seconds',
+    'Duración de las solicitudes HTTP hasta enviar el último byte de la respuesta',
+    labels=('method', 'route', 'status')
+)
+
+
+def _route_label(scope) -> str:
+    # Plantilla de la ruta (/api/forecast/{linea}/{estacion}) para no crear una
+    # serie por cada estación; las rutas desconocidas se agrupan
+    route = scope.get('route')
+    return getattr(route, 'path', None) or 'unmatched'
+
+
+class _RequestProfile:
+    """
+    Perfil de una solicitud: pyinstrument (muestreo, entiende async) si está
+    instalado, cProfile en caso contrario
+    """
+    def __init__(self):
+        if SamplingProfiler is not None:
+            self._profiler = SamplingProfiler(async_mode='enabled')
+        else:
+            self._profiler = cProfile.Profile()
+
+    def start(self):
+        if SamplingProfiler is not None:
+            self._profiler.start()
+        else:
+            self._profiler.enable()
+
+    def stop(self):
+        if SamplingProfiler is not None:
+            self._profiler.stop()
+        else:
+            self._profiler.disable()
+
+    def write(self, path: Path) -> Path:
+        if SamplingProfiler is not None:
+            path = path.with_suffix('.html')
+            path.write_text(self._profiler.output_html(), encoding='utf-8')
+        else:
+            path = path.with_suffix('.prof')
+            self._profiler.dump_stats(str(path))
+        return path
+
+
+class RequestMetricsMiddleware:
+    """
+    Middleware ASGI que mide cada solicitud y, opcionalmente, perfila una muestra.
+
+    La duración se registra al enviar el último fragmento de la respuesta, así
+    que incluye los cuerpos en streaming.
+
+    El perfilado se activa con variables de entorno:
+    - PROFILE_SAMPLE_RATE: fracción de solicitudes a perfilar (0 = desactivado)
+    - PROFILE_SLOW_MS: solo se guardan los perfiles de solicitudes más lentas que esto
+    - PROFILE_DIR: directorio de los perfiles (por defecto 'profiles')
+
+    Solo se perfila una solicitud a la vez y únicamente el hilo del event loop;
+    el trabajo en el pool de procesos aparece como espera.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.sample_rate = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+        self.slow_ms = float(os.getenv('PROFILE_SLOW_MS', 1000))
+        self.profile_dir = Path(os.getenv('PROFILE_DIR', 'profiles'))
+        self._profiling = threading.Lock()
+        self.in_progress = 0
+        REGISTRY.gauge('metro_http_requests_in_progress', 'Solicitudes HTTP en curso', lambda: self.in_progress)
+
+    def _start_profile(self) -> Optional[_RequestProfile]:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return None
+        if not self._profiling.acquire(blocking=False):
+            return None
+        profile = _RequestProfile()
+        try:
+            profile.start()
+        except Exception:
+            self._profiling.release()
+            return None
+        return profile
+
+    def _finish_profile(self, profile: _RequestProfile, scope, elapsed: float):
+        try:
+            profile.stop()
+            if elapsed * 1000 >= self.slow_ms:
+                self.profile_dir.mkdir(parents=True, exist_ok=True)
+                route = re.sub(r'[^A-Za-z0-9]+', '_', _route_label(scope)).strip('_') or 'root'
+                name = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{scope['method']}_{route}"
+                path = profile.write(self.profile_dir / name)
+                logger.info("Solicitud lenta (%.0f ms) perfilada en %s", elapsed * 1000, path)
+        except Exception as e:
+            logger.warning(f"No se pudo guardar el perfil de la solicitud: {str(e)}")
+        finally:
+            self._profiling.release()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        self.in_progress += 1
+        started = time.perf_counter()
+        status = {'code': 500}
+        profile = self._start_profile()
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if finished:
+                return
+            finished = True
+            self.in_progress -= 1
+            elapsed = time.perf_counter() - started
+            HTTP_REQUEST_SECONDS.observe(
+                elapsed, method=scope['method'], route=_route_label(scope), status=status['code']
+            )
+            if profile is not None:
+                self._finish_profile(profile, scope, elapsed)
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                status['code'] = message['status']
+            await send(message)
+            if message['type'] == 'http.response.body' and not message.get('more_body', False):
+                finish()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finish()
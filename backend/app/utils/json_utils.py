@@ -0,0 +1,86 @@
+import json
+import math
+from decimal import Decimal
+from typing import Any, Union
+
+import numpy as np
+import pandas as pd
+from fastapi.responses import JSONResponse
+
+from .metrics import stage
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional; sin él se usa el módulo json estándar
+    orjson = None
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson is not None else 0
+
+def float_array(values: Union[pd.Series, np.ndarray, list]) -> np.ndarray:
+    """
+    Convierte una columna en un arreglo float64 contiguo, listo para serializarse
+    sin pasar por listas de Python. Los NaN e infinitos se escriben como null.
+    """
+    return np.ascontiguousarray(np.asarray(values, dtype=np.float64))
+
+def date_strings(values: Union[pd.Series, np.ndarray]) -> list:
+    """
+    Fechas como texto 'YYYY-MM-DD' (conversión vectorizada de datetime64)
+    """
+    return np.datetime_as_string(np.asarray(values, dtype='datetime64[D]'), unit='D').tolist()
+
+def _default(value: Any) -> Any:
+    """
+    Tipos que orjson no serializa por sí mismo (p. ej. DECIMAL de DuckDB)
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Tipo no serializable a JSON: {type(value).__name__}")
+
+def _to_builtin(data: Any) -> Any:
+    """
+    Convierte recursivamente tipos de NumPy a tipos nativos y los valores no
+    finitos a None. Solo se usa cuando orjson no está instalado.
+    """
+    if isinstance(data, dict):
+        return {k: _to_builtin(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [_to_builtin(item) for item in data]
+    if isinstance(data, np.ndarray):
+        if data.dtype.kind == 'f':
+            # Máscara vectorizada de no finitos antes de convertir a lista
+            return np.where(np.isfinite(data), data, None).tolist()
+        return data.tolist()
+    if isinstance(data, (np.generic, Decimal)):
+        data = _default(data)
+    if isinstance(data, float) and not math.isfinite(data):
+        return None
+    return data
+
+def dumps(data: Any) -> bytes:
+    """
+    Serializa a JSON (UTF-8). Con orjson, los arreglos de NumPy se codifican
+    directamente y NaN/inf se escriben como null.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+    return json.dumps(_to_builtin(data), ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def loads(content: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta JSON que acepta arreglos de NumPy y se codifica con orjson.
+
+    Las rutas que la devuelven directamente evitan además el recorrido de
+    jsonable_encoder de FastAPI.
+    """
+    def render(self, content: Any) -> bytes:
+        with stage('serialize'):
+            return dumps(content)
@@ -0,0 +1,257 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Límites (en segundos) de los histogramas de latencia
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels.get(name, '')) for name in self.label_names)
+
+    def header(self) -> List[str]:
+        return [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+
+
+class Counter(_Metric):
+    """
+    Contador monotónico con etiquetas
+    """
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def export(self) -> Dict[LabelValues, float]:
+        with self._lock:
+            return dict(self._values)
+
+    def merge(self, values: Dict[LabelValues, float]):
+        with self._lock:
+            for key, value in values.items():
+                self._values[tuple(key)] = self._values.get(tuple(key), 0.0) + value
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.export().items()):
+            lines.append(f'{self.name}_total{_format_labels(self.label_names, key)} {_format_value(value)}')
+        return lines
+
+
+class Gauge(_Metric):
+    """
+    Valor instantáneo; se lee de una función al momento de exponer las métricas
+    """
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, function: Callable[[], float]):
+        super().__init__(name, documentation)
+        self.function = function
+
+    def render(self) -> List[str]:
+        try:
+            value = self.function()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return self.header() + [f'{self.name} {_format_value(value)}']
+
+
+class Histogram(_Metric):
+    """
+    Histograma acumulativo con buckets fijos, al estilo de Prometheus
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Por etiquetas: [conteos por bucket (+Inf al final), suma, total]
+        self._values: Dict[LabelValues, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][position] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def export(self) -> Dict[LabelValues, list]:
+        with self._lock:
+            return {key: [list(state[0]), state[1], state[2]] for key, state in self._values.items()}
+
+    def merge(self, values: Dict[LabelValues, list]):
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                key = tuple(key)
+                state = self._values.get(key)
+                if state is None:
+                    state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, (counts, total, count) in sorted(self.export().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, key, f'le="{_format_value(bound)}"')
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.label_names, key)
+            lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+            lines.append(f'{self.name}_count{labels} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Registro de métricas del proceso con exposición en el formato de texto de Prometheus.
+
+    Los procesos del pool de pronósticos no comparten memoria con la API: cada
+    trabajo limpia sus contadores e histogramas al iniciar (reset), los exporta
+    al terminar (export) y la API los suma a los suyos (merge).
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, function: Callable[[], float]) -> Gauge:
+        # Las funciones de los gauges se pueden reemplazar (p. ej. al recrear servicios)
+        gauge = Gauge(name, documentation, function)
+        self._metrics[name] = gauge
+        return gauge
+
+    def export(self) -> Dict[str, dict]:
+        return {
+            name: metric.export()
+            for name, metric in self._metrics.items()
+            if isinstance(metric, (Counter, Histogram))
+        }
+
+    def merge(self, exported: Optional[Dict[str, dict]]):
+        for name, values in (exported or {}).items():
+            metric = self._metrics.get(name)
+            if isinstance(metric, (Counter, Histogram)):
+                metric.merge(values)
+
+    def reset(self):
+        for metric in self._metrics.values():
+            if isinstance(metric, (Counter, Histogram)):
+                metric.reset()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Métricas compartidas por los servicios
+STAGE_SECONDS = REGISTRY.histogram(
+    'metro_stage_duration_seconds',
+    'Duración de cada etapa interna (filtrado, agregación, ajuste, predicción, serialización)',
+    labels=('stage',)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'metro_cache_requests',
+    'Consultas a caches por resultado (hit o miss)',
+    labels=('cache', 'result')
+)
+
+
+def stage(name: str):
+    """
+    Mide la duración de una etapa: `with stage('filter'): ...`
+    """
+    return STAGE_SECONDS.time(stage=name)
+
+
+def process_rss_bytes() -> Optional[float]:
+    """
+    Memoria residente actual del proceso (Linux)
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return float(pages * os.sysconf('SC_PAGE_SIZE'))
+    except (OSError, ValueError):
+        return None
+
+
+REGISTRY.gauge('metro_process_resident_memory_bytes', 'Memoria residente del proceso de la API', process_rss_bytes)
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = '.snapshot'
+CATEGORICAL_COLUMNS = ['linea', 'estacion']
+NUMERIC_COLUMNS = ['fecha', 'afluencia']
+
+
+def snapshot_path(csv_path: str) -> Path:
+    """
+    Ruta del snapshot columnar asociado a un CSV (se guarda junto al CSV)
+    """
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + SNAPSHOT_SUFFIX)
+
+
+def file_sha256(path: str) -> str:
+    """
+    Calcula el SHA-256 de un archivo leyéndolo por bloques
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_info(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def _is_valid(meta: dict, csv_path: str, snap_dir: Path) -> bool:
+    """
+    Valida el snapshot contra el CSV: primero por tamaño y mtime y, si el mtime
+    cambió pero el tamaño no, por el hash del contenido
+    """
+    if meta.get('version') != SNAPSHOT_VERSION:
+        return False
+
+    source = meta.get('source', {})
+    current = _source_info(csv_path)
+    if source.get('size') != current['size']:
+        return False
+    if source.get('mtime_ns') == current['mtime_ns']:
+        return True
+
+    if file_sha256(csv_path) != source.get('sha256'):
+        return False
+
+    # Mismo contenido con otro mtime (p. ej. el CSV se copió): actualizar metadatos
+    meta['source']['mtime_ns'] = current['mtime_ns']
+    try:
+        _write_meta(snap_dir, meta)
+    except OSError:
+        pass
+    return True
+
+
+def _write_meta(snap_dir: Path, meta: dict):
+    fd, tmp_path = tempfile.mkstemp(dir=snap_dir, suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, snap_dir / 'meta.json')
+
+
+def write_snapshot(df: pd.DataFrame, csv_path: str) -> Optional[Path]:
+    """
+    Escribe el dataset ya normalizado y ordenado como un directorio de arreglos
+    NumPy (.npy), uno por columna, que luego se puede mapear en memoria.
+
+    Las columnas categóricas se guardan como códigos enteros más su lista de
+    categorías en meta.json.
+    """
+    snap_dir = snapshot_path(csv_path)
+    tmp_dir = None
+    try:
+        tmp_dir = Path(tempfile.mkdtemp(dir=snap_dir.parent, prefix=snap_dir.name + '.tmp'))
+        meta = {
+            'version': SNAPSHOT_VERSION,
+            'rows': len(df),
+            'source': {**_source_info(csv_path), 'sha256': file_sha256(csv_path)},
+            'categories': {}
+        }
+        for column in NUMERIC_COLUMNS:
+            np.save(tmp_dir / f"{column}.npy", df[column].to_numpy())
+        for column in CATEGORICAL_COLUMNS:
+            values = df[column].astype('category')
+            np.save(tmp_dir / f"{column}.codes.npy", values.cat.codes.to_numpy())
+            meta['categories'][column] = [str(c) for c in values.cat.categories]
+        _write_meta(tmp_dir, meta)
+
+        if snap_dir.exists():
+            shutil.rmtree(snap_dir)
+        os.replace(tmp_dir, snap_dir)
+        logger.info(f"Snapshot columnar escrito en {snap_dir}")
+        return snap_dir
+    except OSError as e:
+        # Otro proceso pudo haberlo escrito al mismo tiempo, o el directorio es de solo lectura
+        logger.warning(f"No se pudo escribir el snapshot columnar: {str(e)}")
+        if tmp_dir is not None:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+        return None
+
+
+def load_snapshot(csv_path: str) -> Optional[pd.DataFrame]:
+    """
+    Carga el snapshot mapeado en memoria si existe y corresponde al CSV actual.
+
+    Los arreglos se abren con mmap_mode='r', de modo que varios workers de uvicorn
+    comparten las mismas páginas del sistema operativo en lugar de tener cada uno
+    una copia privada. El DataFrame resultante es de solo lectura.
+    """
+    snap_dir = snapshot_path(csv_path)
+    meta_path = snap_dir / 'meta.json'
+    if not meta_path.exists():
+        return None
+
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        if not _is_valid(meta, csv_path, snap_dir):
+            logger.info("El snapshot columnar no corresponde al CSV actual")
+            return None
+
+        columns = {}
+        for column in ['fecha', 'linea', 'estacion', 'afluencia']:
+            if column in CATEGORICAL_COLUMNS:
+                codes = np.load(snap_dir / f"{column}.codes.npy", mmap_mode='r')
+                columns[column] = pd.Categorical.from_codes(
+                    codes, categories=meta['categories'][column], validate=False
+                )
+            else:
+                columns[column] = np.load(snap_dir / f"{column}.npy", mmap_mode='r')
+        df = pd.DataFrame(columns, copy=False)
+        logger.info(f"Snapshot columnar cargado desde {snap_dir}")
+        return df
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Snapshot columnar inválido, se usará el CSV: {str(e)}")
+        return None
+
+
+if __name__ == '__main__':
+    # Paso de preprocesamiento: python -m app.utils.snapshot
+    logging.basicConfig(level=logging.INFO)
+    from ..services.data_service import DataService
+
+    service = DataService(use_snapshot=False)
+    write_snapshot(service.df, service.data_path)
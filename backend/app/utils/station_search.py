@@ -0,0 +1,166 @@
+import bisect
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from .text_utils import normalize_text
+
+# Similitud mínima (trigramas o edición) para aceptar una coincidencia aproximada
+MIN_FUZZY_SCORE = 0.35
+
+# Candidatos por trigramas que se comparan con distancia de edición
+FUZZY_CANDIDATES = 5
+
+
+def _trigrams(text: str) -> List[str]:
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _edit_similarity(a: str, b: str) -> float:
+    """
+    1 - distancia de Levenshtein / longitud mayor. El cálculo se corta en cuanto
+    la similitud ya no puede alcanzar MIN_FUZZY_SCORE.
+    """
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    if not a or not b:
+        return 0.0
+    max_distance = int((1 - MIN_FUZZY_SCORE) * longest)
+    if abs(len(a) - len(b)) > max_distance:
+        return 0.0
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        row_min = i
+        for j, char_b in enumerate(b, start=1):
+            # min() de tres valores escrito a mano: es el ciclo más caliente de la búsqueda
+            cost = previous[j - 1] + (char_a != char_b)
+            if previous[j] + 1 < cost:
+                cost = previous[j] + 1
+            if current[j - 1] + 1 < cost:
+                cost = current[j - 1] + 1
+            current.append(cost)
+            if cost < row_min:
+                row_min = cost
+        if row_min > max_distance:
+            return 0.0
+        previous = current
+    return 1.0 - previous[-1] / longest
+
+
+class StationSearchIndex:
+    """
+    Índice en memoria para buscar estaciones por prefijo y con tolerancia a errores.
+
+    - Prefijos: arreglo ordenado con el nombre completo y cada sufijo que inicia
+      en una palabra ('pino suarez' y 'suarez'), recorrido con búsqueda binaria.
+    - Aproximada: índice invertido de trigramas; los nombres que comparten más
+      trigramas con la consulta se ordenan por similitud de Dice y de edición.
+
+    Se construye a partir del catálogo normalizado; las consultas se normalizan
+    igual (minúsculas, sin acentos).
+    """
+    def __init__(self, catalogue: List[Dict]):
+        self.entries = catalogue
+        self._names = [entry['estacion'] for entry in catalogue]
+
+        keys = []
+        for position, name in enumerate(self._names):
+            words = name.split()
+            for start in range(len(words)):
+                keys.append((' '.join(words[start:]), start == 0, position))
+        keys.sort()
+        self._keys = [key for key, _, _ in keys]
+        self._key_info = [(is_full, position) for _, is_full, position in keys]
+
+        self._trigram_index: Dict[str, List[int]] = defaultdict(list)
+        self._trigram_counts = []
+        for position, name in enumerate(self._names):
+            grams = set(_trigrams(name))
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._trigram_index[gram].append(position)
+
+    def _prefix_matches(self, query: str) -> Dict[int, float]:
+        scores: Dict[int, float] = {}
+        first = bisect.bisect_left(self._keys, query)
+        for key, (is_full, position) in zip(self._keys[first:], self._key_info[first:]):
+            if not key.startswith(query):
+                break
+            if is_full:
+                score = 1.0 if key == query else 0.9
+            else:
+                score = 0.8
+            scores[position] = max(score, scores.get(position, 0.0))
+        return scores
+
+    def _fuzzy_matches(self, query: str) -> Dict[int, float]:
+        grams = set(_trigrams(query))
+        shared: Dict[int, int] = defaultdict(int)
+        for gram in grams:
+            for position in self._trigram_index.get(gram, ()):
+                shared[position] += 1
+        if not shared:
+            return {}
+
+        # Dice sobre trigramas para preseleccionar, edición para ordenar
+        dice = {
+            position: 2 * count / (len(grams) + self._trigram_counts[position])
+            for position, count in shared.items()
+        }
+        candidates = sorted(dice, key=dice.get, reverse=True)[:FUZZY_CANDIDATES]
+        scores = {}
+        similarities: Dict[str, float] = {}
+        for position in candidates:
+            name = self._names[position]
+            texts = [name]
+            if ' ' not in query and ' ' in name:
+                # Una sola palabra se compara también con cada palabra ('suares' contra 'pino suarez')
+                texts.extend(name.split())
+            edit = 0.0
+            for text in texts:
+                if text not in similarities:
+                    similarities[text] = _edit_similarity(query, text)
+                edit = max(edit, similarities[text])
+            similarity = max(dice[position], edit)
+            if similarity >= MIN_FUZZY_SCORE:
+                # Escalar para que siempre queden después de las coincidencias por prefijo
+                scores[position] = 0.75 * similarity
+        return scores
+
+    def search(self, query: str, limit: int = 10, linea: Optional[str] = None) -> List[Dict]:
+        """
+        Estaciones que coinciden con la consulta, de la mejor a la peor: por
+        prefijo (puntaje de 0.8 a 1) o, si no hay ninguna, aproximadas
+        (puntaje menor a 0.75).
+        """
+        query = normalize_text(query or '').strip()
+        if not query:
+            return []
+        query = ' '.join(query.split())
+        linea = normalize_text(linea) if linea else None
+
+        # La búsqueda aproximada solo se usa si ningún nombre empieza con la consulta
+        scores = self._prefix_matches(query) or self._fuzzy_matches(query)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], self._names[item[0]]))
+        results = []
+        for position, score in ranked:
+            entry = self.entries[position]
+            if linea and entry['linea'] != linea:
+                continue
+            results.append({**entry, 'score': round(score, 3)})
+            if len(results) >= limit:
+                break
+        return results
+
+    def suggest(self, query: str, linea: Optional[str] = None, limit: int = 3) -> List[str]:
+        """
+        Nombres de estación parecidos, para los mensajes de estación no encontrada
+        """
+        names = []
+        for entry in self.search(query, limit * 2, linea) or self.search(query, limit * 2):
+            if entry['estacion'] not in names:
+                names.append(entry['estacion'])
+        return names[:limit]
@@ -1,4 +1,22 @@
 import unicodedata
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+@lru_cache(maxsize=4096)
+def _normalize_str(text):
+    # Convertir a minúsculas
+    text = text.lower()
+
+    # Reemplazar "/" por espacio
+    text = text.replace('/', ' ')
+
+    # Eliminar acentos
+    text = ''.join(c for c in unicodedata.normalize('NFD', text)
+                  if unicodedata.category(c) != 'Mn')
+
+    return text.strip()
 
 def normalize_text(text):
     """
@@ -6,24 +24,45 @@ def normalize_text(text):
     - Convierte a minúsculas
     - Elimina acentos
     - Elimina caracteres especiales
-    
+
+    Los resultados se guardan en un cache LRU acotado, ya que en cada solicitud
+    se normalizan los mismos nombres de líneas y estaciones.
+
     Args:
         text (str): Texto a normalizar
-    
+
     Returns:
         str: Texto normalizado
     """
     if not isinstance(text, str):
         return text
-    
-    # Convertir a minúsculas
-    text = text.lower()
-    
-    # Reemplazar "/" por espacio
-    text = text.replace('/', ' ')
-    
-    # Eliminar acentos
-    text = ''.join(c for c in unicodedata.normalize('NFD', text)
-                  if unicodedata.category(c) != 'Mn')
-    
-    return text.strip()
\ No newline at end of file
+
+    return _normalize_str(text)
+
+def normalize_series(series):
+    """
+    Normaliza una columna de texto aplicando normalize_text solo a sus valores únicos
+
+    Los valores se factorizan, se normalizan los únicos y los códigos se remapean,
+    de modo que el costo depende del número de valores distintos y no del número
+    de filas. Valores que coinciden tras normalizar comparten categoría.
+
+    Args:
+        series (pd.Series): Columna de texto
+
+    Returns:
+        pd.Series: Columna categórica (categorías ordenadas) con el texto normalizado
+    """
+    codes, uniques = pd.factorize(series)
+    normalized = pd.Index([normalize_text(value) for value in uniques])
+    categories = normalized.unique().sort_values()
+
+    # Mapear código original -> código de la categoría normalizada (conservando -1 para nulos)
+    remap = np.append(categories.get_indexer(normalized), -1)
+    new_codes = remap[codes].astype(np.int32)
+
+    return pd.Series(
+        pd.Categorical.from_codes(new_codes, categories=categories),
+        index=series.index,
+        name=series.name
+    )
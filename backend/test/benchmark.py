@@ -0,0 +1,319 @@
+"""
+Benchmark reproducible de las rutas críticas del backend.
+
+Mide load_data (CSV y snapshot), get_available_stations, get_time_series,
+get_station_data, generate_forecast y los endpoints HTTP bajo carga
+concurrente; reporta percentiles de latencia, throughput y memoria (RSS), y
+compara contra un baseline guardado. Termina con código 1 si alguna métrica
+empeora más que la tolerancia.
+
+Uso (desde backend/):
+    python test/benchmark.py                        # red sintética de 20 estaciones
+    python test/benchmark.py --stations 200         # red sintética más grande
+    python test/benchmark.py --data ../data/afluenciastc_simple_02_2024.csv --scale 10
+    python test/benchmark.py --save-baseline        # guardar los resultados como baseline
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from synthetic_data import generate_dataset, scale_dataset  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / 'benchmark_baseline.json'
+
+# Métricas que se comparan contra el baseline (más alto = peor) y la diferencia
+# absoluta mínima para considerarla regresión (evita falsos positivos por ruido
+# en operaciones de microsegundos)
+COMPARED_FIELDS = {'p50_ms': 1.0, 'p95_ms': 2.0, 'seconds': 0.05, 'rss_mb': 20.0}
+
+
+def rss_mb() -> float:
+    """
+    RSS actual del proceso (Linux); en otros sistemas, el máximo alcanzado
+    """
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def latency_stats(samples: List[float], elapsed: Optional[float] = None) -> Dict[str, float]:
+    """
+    Percentiles de latencia en ms y throughput (operaciones por segundo)
+    """
+    values = np.asarray(samples) * 1000
+    stats = {
+        'count': len(samples),
+        'p50_ms': round(float(np.percentile(values, 50)), 4),
+        'p95_ms': round(float(np.percentile(values, 95)), 4),
+        'p99_ms': round(float(np.percentile(values, 99)), 4),
+        'max_ms': round(float(values.max()), 4)
+    }
+    total = elapsed if elapsed is not None else float(np.sum(samples))
+    stats['throughput_per_s'] = round(len(samples) / total, 2) if total > 0 else None
+    return stats
+
+
+def time_calls(function: Callable, arguments: List[tuple], warmup: int = 1) -> Dict[str, float]:
+    """
+    Ejecuta function con cada juego de argumentos y mide cada llamada
+    """
+    for args in arguments[:warmup]:
+        function(*args)
+    samples = []
+    for args in arguments:
+        started = time.perf_counter()
+        function(*args)
+        samples.append(time.perf_counter() - started)
+    return latency_stats(samples)
+
+
+def time_once(function: Callable) -> Tuple[Any, Dict[str, float]]:
+    before = rss_mb()
+    started = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - started
+    return result, {'seconds': round(seconds, 4), 'rss_mb': round(rss_mb(), 1),
+                    'rss_delta_mb': round(rss_mb() - before, 1)}
+
+
+def bench_data_service(results: Dict[str, Any], repeat: int, rng: random.Random):
+    from app.services.data_service import DataService
+
+    _, results['load_data_csv'] = time_once(lambda: DataService(use_snapshot=False))
+    # Primera carga con snapshot: lee el CSV y escribe el snapshot
+    _, results['load_data_snapshot_write'] = time_once(lambda: DataService(use_snapshot=True))
+    service, results['load_data_snapshot'] = time_once(lambda: DataService(use_snapshot=True))
+
+    stations = service.get_available_stations()
+    picks = [rng.choice(stations) for _ in range(repeat)]
+    results['get_available_stations'] = time_calls(service.get_available_stations, [()] * repeat)
+    for granularity in ('week', 'month', 'year'):
+        results[f'get_time_series_{granularity}'] = time_calls(
+            service.get_time_series,
+            [(s['linea'], s['estacion'], None, None, granularity) for s in picks]
+        )
+    results['get_station_data'] = time_calls(
+        service.get_station_data, [(s['linea'], s['estacion']) for s in picks]
+    )
+    return service, stations
+
+
+def bench_forecasts(results: Dict[str, Any], service, stations: List[Dict], prophet_fits: int,
+                    rng: random.Random):
+    from app.services.forecast_service import ForecastService
+
+    forecast_service = ForecastService()
+    sample = rng.sample(stations, min(len(stations), 20))
+    data = [service.get_station_data(s['linea'], s['estacion']) for s in sample]
+
+    # Motor rápido: por estación y en bloque (el cache es nuevo, no hay aciertos)
+    results['generate_forecast_fast'] = time_calls(
+        lambda d: forecast_service.generate_forecast(d, 'fast'), [(d,) for d in data], warmup=0
+    )
+    forecast_service.cache = type(forecast_service.cache)(tempfile.mkdtemp(prefix='bench-cache-'))
+    _, results['generate_forecasts_fast_batch'] = time_once(
+        lambda: forecast_service.generate_forecasts(data, 'fast')
+    )
+    # Acierto de cache: mismos datos, misma configuración
+    results['generate_forecast_cached'] = time_calls(
+        lambda d: forecast_service.generate_forecast(d, 'fast'), [(d,) for d in data], warmup=0
+    )
+    if prophet_fits:
+        results['generate_forecast_prophet'] = time_calls(
+            lambda d: forecast_service.generate_forecast(d, 'prophet'),
+            [(d,) for d in data[:prophet_fits]], warmup=0
+        )
+
+
+async def _load(client, urls: List[str], concurrency: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: Dict[str, List[float]] = {}
+    errors = 0
+
+    async def request(name: str, url: str):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.get(url)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            errors += 1
+        samples.setdefault(name, []).append(elapsed)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(request(name, url) for name, url in urls))
+    elapsed = time.perf_counter() - started
+    stats = {name: latency_stats(values) for name, values in samples.items()}
+    stats['total'] = {
+        **latency_stats([value for values in samples.values() for value in values], elapsed),
+        'errors': errors
+    }
+    return stats
+
+
+def bench_http(results: Dict[str, Any], requests: int, concurrency: int, rng: random.Random):
+    import httpx
+    from urllib.parse import quote
+    from app.main import app, data_service
+
+    stations = data_service.get_available_stations()
+    urls = []
+    for _ in range(requests):
+        station = rng.choice(stations)
+        path = f"{quote(station['linea'])}/{quote(station['estacion'])}"
+        name, url = rng.choice([
+            ('stations', '/api/stations'),
+            ('timeseries', f'/api/timeseries/{path}?granularity=month'),
+            ('forecast_fast', f'/api/forecast/{path}?engine=fast&fields=forecast,metrics'),
+            ('analytics_top_stations', '/api/analytics/top-stations?limit=10')
+        ])
+        urls.append((f'http_{name}', url))
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://bench') as client:
+            return await _load(client, urls, concurrency)
+
+    stats = asyncio.run(run())
+    for name, values in stats.items():
+        results[name if name.startswith('http_') else f'http_{name}'] = values
+    results['http_total']['rss_mb'] = round(rss_mb(), 1)
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Métricas que empeoraron más que la tolerancia respecto al baseline
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not isinstance(current, dict) or not isinstance(previous, dict):
+            continue
+        for field, min_delta in COMPARED_FIELDS.items():
+            if field not in current or not previous.get(field):
+                continue
+            ratio = current[field] / previous[field]
+            if ratio > 1 + tolerance and current[field] - previous[field] > min_delta:
+                regressions.append(
+                    f"{name}.{field}: {previous[field]} -> {current[field]} ({(ratio - 1) * 100:+.0f}%)"
+                )
+    return regressions
+
+
+def print_table(results: Dict[str, Any]):
+    fields = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_per_s', 'seconds', 'rss_mb')
+    print(f"\n{'operación':<32}" + ''.join(f"{header:>12}" for header in ('p50 ms', 'p95 ms', 'p99 ms', 'ops/s', 's', 'RSS MB')))
+    for name, values in results.items():
+        if name == 'meta' or not isinstance(values, dict):
+            continue
+        print(f"{name:<32}" + ''.join(f"{str(values.get(field, '')):>12}" for field in fields))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de las rutas críticas del backend")
+    parser.add_argument('--data', help="CSV base; sin él se genera una red sintética")
+    parser.add_argument('--stations', type=int, default=20, help="Estaciones de la red sintética")
+    parser.add_argument('--start', default='2018-01-01', help="Inicio de la red sintética")
+    parser.add_argument('--scale', type=int, default=1, help="Factor de estaciones al escalar --data")
+    parser.add_argument('--years', type=int, default=1, help="Factor de años al escalar --data")
+    parser.add_argument('--repeat', type=int, default=200, help="Llamadas por operación del DataService")
+    parser.add_argument('--prophet', type=int, default=2, help="Ajustes de Prophet a medir (0 = omitir)")
+    parser.add_argument('--requests', type=int, default=400, help="Solicitudes HTTP en la prueba de carga")
+    parser.add_argument('--concurrency', type=int, default=16, help="Solicitudes HTTP simultáneas")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmark_results.json', help="Archivo de resultados")
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help="Baseline a comparar")
+    parser.add_argument('--save-baseline', action='store_true', help="Guardar los resultados como baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Empeoramiento tolerado (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    # Solo advertencias: los servicios registran cada solicitud en INFO
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+
+    workdir = Path(tempfile.mkdtemp(prefix='metro-bench-'))
+    csv_path = workdir / 'afluencia.csv'
+    if args.data and (args.scale > 1 or args.years > 1):
+        scale_dataset(args.data, csv_path, args.scale, args.years, args.seed)
+    elif args.data:
+        csv_path.write_bytes(Path(args.data).read_bytes())
+    else:
+        generate_dataset(csv_path, args.stations, start=args.start, seed=args.seed)
+
+    # Los servicios leen su configuración del entorno al crearse
+    os.environ['DATA_PATH'] = str(csv_path)
+    os.environ['MODEL_CACHE_DIR'] = str(workdir / 'models')
+    os.environ.setdefault('FORECAST_ENGINE', 'fast')
+
+    rng = random.Random(args.seed)
+    results: Dict[str, Any] = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'csv_mb': round(csv_path.stat().st_size / (1024 * 1024), 1),
+            'args': vars(args)
+        }
+    }
+    service, stations = bench_data_service(results, args.repeat, rng)
+    results['meta']['rows'] = len(service.df)
+    results['meta']['stations'] = len(stations)
+    bench_forecasts(results, service, stations, args.prophet, rng)
+    bench_http(results, args.requests, args.concurrency, rng)
+    results['peak_rss'] = {'rss_mb': round(peak_rss_mb(), 1)}
+
+    print_table(results)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\nResultados en {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"Baseline guardado en {args.baseline}")
+        return 0
+
+    if not Path(args.baseline).exists():
+        print("Sin baseline para comparar (usar --save-baseline)")
+        return 0
+    with open(args.baseline, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('meta', {}).get('rows') != results['meta']['rows']:
+        print("Aviso: el baseline se generó con otro tamaño de datos")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print("\nRegresiones respecto al baseline:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print("\nSin regresiones respecto al baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# Añadir backend/ (paquete app) y test/ (generador sintético) al path de Python
+test_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(test_dir.parent))
+sys.path.insert(0, str(test_dir))
+
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def api(tmp_path_factory):
+    """
+    La aplicación completa (app.main) sobre una red sintética, con el motor
+    rápido por defecto y el cache de modelos en un directorio temporal. Devuelve
+    el módulo para acceder a sus servicios; el cliente se crea con TestClient(api.app).
+    """
+    root = tmp_path_factory.mktemp('api')
+    csv_path = generate_dataset(root / 'afluencia.csv', stations=12, lines=3, start='2019-01-01', end='2021-12-31')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATA_PATH', str(csv_path))
+        mp.setenv('MODEL_CACHE_DIR', str(root / 'models'))
+        mp.setenv('FORECAST_ENGINE', 'fast')
+        mp.setenv('FORECAST_WORKERS', '1')
+        from app import main
+    return main
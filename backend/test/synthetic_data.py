@@ -0,0 +1,154 @@
+"""
+Generador de datos sintéticos de afluencia con el mismo formato que el CSV
+abierto del Metro (fecha, mes, anio, linea, estacion, afluencia).
+
+Dos modos:
+- generate_dataset: red sintética con estacionalidad semanal y anual,
+  tendencia, caída por COVID y ruido.
+- scale_dataset: escala un CSV existente a N veces sus estaciones (copias con
+  otro nombre y otro nivel de afluencia) y a N veces sus años (la historia se
+  repite hacia atrás).
+
+Los archivos se escriben por bloques, así que escalar a 100× no requiere tener
+todo el dataset en memoria.
+
+Uso:
+    python test/synthetic_data.py generate salida.csv --stations 200 --start 2010-01-01
+    python test/synthetic_data.py scale ../data/afluenciastc_simple_02_2024.csv salida.csv --stations 10 --years 2
+"""
+import argparse
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['fecha', 'mes', 'anio', 'linea', 'estacion', 'afluencia']
+
+# Nombres reales (con acentos y variantes) para ejercitar la normalización
+STATION_NAMES = [
+    'Observatorio', 'Tacubaya', 'Juanacatlán', 'Chapultepec', 'Sevilla', 'Insurgentes',
+    'Cuauhtémoc', 'Balderas', 'Salto del Agua', 'Isabel la Católica', 'Pino Suárez',
+    'Merced', 'Candelaria', 'San Lázaro', 'Moctezuma', 'Balbuena', 'Tasqueña',
+    'General Anaya', 'Ermita', 'Portales', 'Nativitas', 'Villa de Cortés', 'Xola',
+    'Viaducto', 'Chabacano', 'San Antonio Abad', 'Zócalo/Tenochtitlan', 'Allende',
+    'Bellas Artes', 'Hidalgo', 'Revolución', 'San Cosme', 'Normal', 'Colegio Militar',
+    'Popotla', 'Cuitláhuac', 'Tacuba', 'Panteones', 'Cuatro Caminos', 'Barranca del Muerto'
+]
+
+
+def _month_names(fechas: pd.DatetimeIndex) -> np.ndarray:
+    # El dataset abierto usa los nombres de mes en inglés
+    return fechas.strftime('%B').to_numpy()
+
+
+def _station_series(fechas: pd.DatetimeIndex, level: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Serie diaria con tendencia, estacionalidad semanal y anual, COVID y ruido
+    """
+    days = (fechas - fechas[0]).days.to_numpy(dtype=np.float64)
+    weekday = fechas.dayofweek.to_numpy()
+    weekly = np.select([weekday == 5, weekday == 6], [0.65, 0.45], default=1.0)
+    yearly = 1 + 0.08 * np.sin(2 * np.pi * (fechas.dayofyear.to_numpy() - 60) / 365.25)
+    trend = 1 + rng.normal(0.0, 0.03) * days / 365.25
+
+    covid = np.ones(len(fechas))
+    in_covid = (fechas >= '2020-03-20') & (fechas <= '2020-08-31')
+    recovery = (fechas > '2020-08-31') & (fechas <= '2021-12-31')
+    covid[in_covid] = 0.3
+    covid[recovery] = np.linspace(0.5, 0.9, int(recovery.sum())) if recovery.any() else 1.0
+
+    noise = rng.normal(1.0, 0.06, len(fechas))
+    return np.maximum(level * weekly * yearly * trend * covid * noise, 0).round().astype(np.int64)
+
+
+def _write(frame: pd.DataFrame, output: Path, header: bool):
+    frame.to_csv(output, mode='w' if header else 'a', header=header, index=False)
+
+
+def generate_dataset(output: str, stations: int = 20, lines: int = 4, start: str = '2018-01-01',
+                     end: str = '2024-02-29', seed: int = 0) -> Path:
+    """
+    Genera una red sintética de `stations` estaciones repartidas en `lines` líneas
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    fechas = pd.date_range(start, end, freq='D')
+    meses = _month_names(fechas)
+
+    for number in range(stations):
+        name = STATION_NAMES[number % len(STATION_NAMES)]
+        if number >= len(STATION_NAMES):
+            name = f"{name} {number // len(STATION_NAMES) + 1}"
+        frame = pd.DataFrame({
+            'fecha': fechas.strftime('%Y-%m-%d'),
+            'mes': meses,
+            'anio': fechas.year,
+            'linea': f"Linea {number % lines + 1}",
+            'estacion': name,
+            'afluencia': _station_series(fechas, rng.uniform(5_000, 60_000), rng)
+        })
+        _write(frame[COLUMNS], output, header=number == 0)
+    return output
+
+
+def scale_dataset(source: str, output: str, station_factor: int = 10, year_factor: int = 1,
+                  seed: int = 0, source_df: Optional[pd.DataFrame] = None) -> Path:
+    """
+    Escala un CSV a station_factor veces sus estaciones y year_factor veces su
+    periodo. Las copias de estaciones se llaman '<estación> <n>' y tienen su
+    propio nivel de afluencia; los años adicionales repiten la historia hacia atrás.
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    df = source_df if source_df is not None else pd.read_csv(source)
+    fechas = pd.to_datetime(df['fecha'])
+    span = pd.DateOffset(years=int(np.ceil((fechas.max() - fechas.min()).days / 365.25)))
+
+    header = True
+    for copy in range(station_factor):
+        estacion = df['estacion'] if copy == 0 else df['estacion'] + f" {copy + 1}"
+        factor = 1.0 if copy == 0 else rng.uniform(0.5, 1.5)
+        for period in range(year_factor):
+            shifted = fechas - span * period if period else fechas
+            noise = rng.normal(1.0, 0.03, len(df)) if (copy or period) else 1.0
+            frame = pd.DataFrame({
+                'fecha': shifted.dt.strftime('%Y-%m-%d'),
+                'mes': shifted.dt.strftime('%B'),
+                'anio': shifted.dt.year,
+                'linea': df['linea'],
+                'estacion': estacion,
+                'afluencia': np.maximum(df['afluencia'] * factor * noise, 0).round().astype(np.int64)
+            })
+            _write(frame, output, header=header)
+            header = False
+    return output
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos de afluencia")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate = commands.add_parser('generate', help="Red sintética desde cero")
+    generate.add_argument('output')
+    generate.add_argument('--stations', type=int, default=20)
+    generate.add_argument('--lines', type=int, default=4)
+    generate.add_argument('--start', default='2018-01-01')
+    generate.add_argument('--end', default='2024-02-29')
+    generate.add_argument('--seed', type=int, default=0)
+
+    scale = commands.add_parser('scale', help="Escalar un CSV existente")
+    scale.add_argument('source')
+    scale.add_argument('output')
+    scale.add_argument('--stations', type=int, default=10, help="Factor de estaciones (10 = 10×)")
+    scale.add_argument('--years', type=int, default=1, help="Factor de años (2 = el doble de historia)")
+    scale.add_argument('--seed', type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == 'generate':
+        path = generate_dataset(args.output, args.stations, args.lines, args.start, args.end, args.seed)
+    else:
+        path = scale_dataset(args.source, args.output, args.stations, args.years, args.seed)
+    print(f"Datos escritos en {path}")
@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+test_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(test_dir.parent))
+sys.path.insert(0, str(test_dir))
+
+from app.utils.anomalies import detect_anomalies, network_events  # noqa: E402
+from synthetic_data import _station_series  # noqa: E402
+
+
+def test_detects_injected_events():
+    fechas = pd.date_range('2018-01-01', '2021-12-31', freq='D')
+    rng = np.random.default_rng(0)
+    matrix = np.vstack([_station_series(fechas, 20000 + 5000 * i, rng) for i in range(8)]).astype(np.float64)
+
+    def day(fecha):
+        return fechas.get_loc(pd.Timestamp(fecha))
+
+    matrix[3, day('2019-05-10'):day('2019-05-13')] = 0    # cierre de 3 días
+    matrix[:, day('2019-09-16')] *= 0.4                  # feriado en toda la red
+
+    found = detect_anomalies(matrix)
+    episodes = pd.DataFrame({key: value for key, value in found.items() if key != 'network_share_daily'})
+    episodes['fecha'] = fechas[episodes['start'].astype(int)]
+
+    closure = episodes[episodes['kind'] == 'cierre']
+    assert list(zip(closure['station'], closure['fecha'], closure['stop'] - closure['start'])) == [
+        (3, pd.Timestamp('2019-05-10'), 3)
+    ]
+    holiday = episodes[(episodes['kind'] == 'evento_red') & (episodes['fecha'] == '2019-09-16')]
+    assert sorted(holiday['station']) == list(range(8))
+
+    # La caída por COVID aparece como cambio de nivel sostenido en todas las estaciones
+    covid = episodes[episodes['kind'] == 'cambio_nivel_baja']
+    assert sorted(covid['station']) == list(range(8))
+    assert (covid['fecha'].dt.strftime('%Y-%m') == '2020-03').all()
+    assert (covid['stop'] - covid['start'] > 120).all()
+
+    starts, stops, share = network_events(found['network_share_daily'])
+    assert day('2019-09-16') in starts
+    assert share.max() <= 1.0
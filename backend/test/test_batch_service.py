@@ -0,0 +1,57 @@
+import json
+import sys
+from pathlib import Path
+
+import pytest
+
+# Añadir backend/ (paquete app) y test/ (generador sintético) al path de Python
+test_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(test_dir.parent))
+sys.path.insert(0, str(test_dir))
+
+from app.services.batch_service import BatchForecastService  # noqa: E402
+from app.services.data_service import DataService  # noqa: E402
+from app.services.forecast_service import ForecastService  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+@pytest.fixture
+def batch(tmp_path):
+    path = generate_dataset(tmp_path / 'afluencia.csv', stations=6, lines=2, start='2020-01-01', end='2021-12-31')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATA_PATH', str(path))
+        mp.setenv('MODEL_CACHE_DIR', str(tmp_path / 'models'))
+        yield BatchForecastService(DataService(use_snapshot=False), ForecastService())
+
+
+def _run_in_background(batch: BatchForecastService):
+    assert batch.start(engine='fast')
+    batch._thread.join(timeout=60)
+    status = batch.status()
+    assert not status['running'] and status['finished_at'] is not None
+    return status
+
+
+def test_batch_completes_and_resumes_from_cache(batch, monkeypatch):
+    status = _run_in_background(batch)
+    assert status['engine'] == 'fast' and status['total'] == 6
+    assert status['summary'] == {'completed': 6, 'fitted': 6}
+    # El manifiesto en disco es el mismo que reporta status()
+    manifest = json.loads(batch.manifest_path.read_text(encoding='utf-8'))
+    assert manifest['summary'] == status['summary'] and manifest['stations'] == status['stations']
+
+    # Una segunda ejecución toma todo del cache sin volver a ajustar
+    fitted = []
+    generate = batch.forecast_service.generate_forecasts
+    monkeypatch.setattr(
+        batch.forecast_service, 'generate_forecasts',
+        lambda stations, engine=None: fitted.extend(stations) or generate(stations, engine)
+    )
+    status = _run_in_background(batch)
+    assert status['summary'] == {'completed': 6, 'cached': 6} and fitted == []
+
+    # Tras una interrupción solo se ajustan las estaciones que faltan en el cache
+    for path in sorted(batch.manifest_path.parent.glob('*.forecast.json'))[:2]:
+        path.unlink()
+    status = _run_in_background(batch)
+    assert status['summary'] == {'completed': 6, 'cached': 4, 'fitted': 2} and len(fitted) == 2
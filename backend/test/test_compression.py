@@ -0,0 +1,76 @@
+import asyncio
+import gzip
+import sys
+from pathlib import Path
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from starlette.responses import Response, StreamingResponse  # noqa: E402
+
+from app.utils.compression import SelectiveGZipMiddleware  # noqa: E402
+
+
+async def _request(app, path: str, first_event: asyncio.Event = None):
+    """
+    Envía una solicitud con Accept-Encoding: gzip y devuelve los mensajes ASGI
+    en el orden en que salieron. first_event se marca cuando el cliente ya
+    recibió el evento inicial.
+    """
+    scope = {
+        'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'',
+        'headers': [(b'accept-encoding', b'gzip')]
+    }
+    messages = []
+    requested = False
+
+    async def receive():
+        # Después del cuerpo de la solicitud el cliente solo espera (sin desconectarse)
+        nonlocal requested
+        if requested:
+            await asyncio.Event().wait()
+        requested = True
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+        if first_event is not None and b'start' in message.get('body', b''):
+            first_event.set()
+
+    await asyncio.wait_for(app(scope, receive, send), timeout=2)
+    return messages
+
+
+def _streaming_app(media_type: str, first_event: asyncio.Event):
+    async def events():
+        yield b'{"event": "start"}\n'
+        # Con el cuerpo acumulado el primer evento no llega al cliente y esto expira
+        await asyncio.wait_for(first_event.wait(), timeout=1)
+        yield b'{"event": "result"}\n' * 200
+
+    return StreamingResponse(events(), media_type=media_type)
+
+
+def test_streaming_is_not_buffered():
+    for path, media_type in (('/api/forecast/stream', 'text/plain'), ('/other', 'application/x-ndjson')):
+        async def scenario():
+            first_event = asyncio.Event()
+            app = SelectiveGZipMiddleware(
+                _streaming_app(media_type, first_event), minimum_size=10, excluded_paths=('/api/forecast/stream',)
+            )
+            return await _request(app, path, first_event)
+
+        messages = asyncio.run(scenario())
+        bodies = [message['body'] for message in messages if message['type'] == 'http.response.body']
+        # El primer evento sale solo y sin comprimir, antes del último resultado
+        assert bodies[0] == b'{"event": "start"}\n'
+        assert b'result' in bodies[1]
+        headers = dict(messages[0]['headers'])
+        assert b'content-encoding' not in headers
+
+
+def test_regular_responses_are_compressed():
+    app = SelectiveGZipMiddleware(Response(b'x' * 2000, media_type='application/json'), minimum_size=1024)
+    messages = asyncio.run(_request(app, '/api/lines'))
+    assert dict(messages[0]['headers'])[b'content-encoding'] == b'gzip'
+    assert gzip.decompress(messages[1]['body']) == b'x' * 2000
@@ -1,44 +1,137 @@
 import sys
 from pathlib import Path
 
-# Añadir el directorio app al path de Python
-root_dir = Path(__file__).parent.parent
-sys.path.append(str(root_dir / 'app'))
-
-from backend.app.services.data_service import DataService
-import json
-
-def main():
-    try:
-        # Inicializar el servicio
-        ds = DataService()
-        
-        # Obtener estadísticas básicas
-        print("\n=== Estadísticas Básicas del Dataset ===")
-        stats = ds.get_basic_stats()
-        print(json.dumps(stats, indent=2, ensure_ascii=False))
-        
-        # Obtener algunas estaciones como ejemplo
-        print("\n=== Primeras 5 Estaciones con Afluencia Promedio ===")
-        stations = ds.get_stations()[:5]
-        print(json.dumps(stations, indent=2, ensure_ascii=False))
-        
-        # Probar búsqueda de estación con diferentes formatos
-        test_stations = ['Pino Suarez', 'Pino Suárez', 'PINO SUAREZ']
-        print("\n=== Prueba de búsqueda con diferentes formatos ===")
-        for station in test_stations:
-            result = ds.find_station(station)
-            print(f"\nBuscando: {station}")
-            print(json.dumps(result, indent=2, ensure_ascii=False))
-            
-        # Probar estadísticas por línea
-        print("\n=== Estadísticas por Línea ===")
-        line_stats = ds.get_line_stats("Linea 1")  # Probamos con diferentes formatos
-        print("\nEstadísticas Línea 1:")
-        print(json.dumps(line_stats, indent=2, ensure_ascii=False))
-        
-    except Exception as e:
-        print(f"Error durante la prueba: {e}")
-
-if __name__ == "__main__":
-    main()
\ No newline at end of file
+import pandas as pd
+import pytest
+
+# Añadir backend/ (paquete app) y test/ (generador sintético) al path de Python
+test_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(test_dir.parent))
+sys.path.insert(0, str(test_dir))
+
+from app.services.data_service import DataService  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+
+@pytest.fixture(scope='module')
+def csv_path(tmp_path_factory):
+    # 12 estaciones en 3 líneas: 'Pino Suárez' queda en la Línea 2
+    path = tmp_path_factory.mktemp('data') / 'afluencia.csv'
+    return generate_dataset(path, stations=12, lines=3, start='2019-01-01', end='2021-12-31')
+
+
+@pytest.fixture(scope='module')
+def ds(csv_path):
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATA_PATH', str(csv_path))
+        yield DataService(use_snapshot=False)
+
+
+def test_catalogue(ds, csv_path):
+    raw = pd.read_csv(csv_path)
+    stations = ds.get_available_stations()
+    assert len(stations) == 12
+    assert sum(station['total_registros'] for station in stations) == len(raw)
+
+    lines = ds.get_lines_summary()
+    assert [line['linea'] for line in lines] == ['linea 1', 'linea 2', 'linea 3']
+    assert sum(line['afluencia_total'] for line in lines) == raw['afluencia'].sum()
+
+
+@pytest.mark.parametrize('linea, estacion', [
+    ('Linea 2', 'Pino Suarez'),
+    ('Línea 2', 'Pino Suárez'),
+    ('LINEA 2', 'PINO SUAREZ')
+])
+def test_station_lookup_is_normalized(ds, linea, estacion):
+    station_data = ds.get_station_data(linea, estacion)
+    assert len(station_data) == len(pd.date_range('2019-01-01', '2021-12-31'))
+    assert station_data['fecha'].is_monotonic_increasing
+
+
+def test_unknown_station(ds):
+    with pytest.raises(Exception):
+        ds.get_station_data('Linea 1', 'No existe')
+
+
+@pytest.mark.parametrize('granularity, periods', [('month', 36), ('quarter', 12), ('year', 3)])
+def test_time_series_granularity(ds, granularity, periods):
+    series = ds.get_time_series('Linea 1', 'Observatorio', granularity=granularity)
+    assert len(series['data']) == periods
+
+    daily = ds.get_station_data('Linea 1', 'Observatorio')['afluencia']
+    assert series['stats']['total_registros'] == len(daily)
+    if granularity == 'month':
+        assert series['data'][0]['mean'] == pytest.approx(daily.iloc[:31].mean())
+
+
+def test_time_series_date_range(ds):
+    series = ds.get_time_series('Linea 1', 'Observatorio', start='2020-01-01', end='2020-06-30')
+    assert [point['fecha'] for point in series['data']] == [f'2020-0{month}' for month in range(1, 7)]
+
+
+@pytest.mark.parametrize('dates', [{'start': 'ayer'}, {'end': '2020-13-45'}])
+def test_time_series_invalid_dates(ds, dates):
+    # ValueError propio (400 en la API), no el error genérico de estación
+    with pytest.raises(ValueError, match='Fecha inválida'):
+        ds.get_time_series('Linea 1', 'Observatorio', **dates)
+
+
+def test_snapshot_matches_csv(ds, csv_path, tmp_path):
+    snapshot_csv = tmp_path / csv_path.name
+    snapshot_csv.write_bytes(csv_path.read_bytes())
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATA_PATH', str(snapshot_csv))
+        DataService(use_snapshot=True)  # escribe el snapshot
+        from_snapshot = DataService(use_snapshot=True)
+    pd.testing.assert_frame_equal(
+        from_snapshot.df.reset_index(drop=True), ds.df.reset_index(drop=True), check_categorical=False
+    )
+    assert from_snapshot.version == ds.version
+
+
+@pytest.mark.parametrize('query, expected', [
+    ('pino', 'pino suarez'),
+    ('SUÁR', 'pino suarez'),
+    ('juanacatlan', 'juanacatlan'),
+    ('chapultepek', 'chapultepec'),
+    ('isabel la catolca', 'isabel la catolica')
+])
+def test_station_search(ds, query, expected):
+    results = ds.search_stations(query)
+    assert results[0]['estacion'] == expected
+
+
+def test_unknown_station_suggests_names(ds):
+    with pytest.raises(Exception, match='observatorio'):
+        ds.get_time_series('Linea 1', 'Obsevatorio')
+
+
+def test_ingest_persists_like_a_reload(csv_path, tmp_path):
+    data_csv = tmp_path / csv_path.name
+    data_csv.write_bytes(csv_path.read_bytes())
+    new_rows = pd.DataFrame({
+        'fecha': ['2022-01-01', '2022-01-02', '2021-12-31', '2022-01-01'],
+        'linea': ['Linea 1', 'Linea 1', 'Linea 1', 'Linea 9'],
+        'estacion': ['Observatorio', 'Observatorio', 'Observatorio', 'Nueva Estación'],
+        'afluencia': [1000, 1100, 1200, 500]
+    })
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATA_PATH', str(data_csv))
+        ingested = DataService(use_snapshot=False)
+        summary = ingested.ingest(new_rows, persist=True)
+        reloaded = DataService(use_snapshot=False)
+    assert summary['filas_agregadas'] == 3 and summary['filas_corregidas'] == 1
+
+    # El CSV conserva el esquema del dataset: mes y anio se derivan de la fecha
+    appended = pd.read_csv(data_csv).tail(len(new_rows))
+    assert appended['mes'].tolist() == ['January', 'January', 'December', 'January']
+    assert appended['anio'].tolist() == [2022, 2022, 2021, 2022]
+
+    # Releer el CSV produce el mismo estado que la ingesta en memoria
+    pd.testing.assert_frame_equal(
+        reloaded.df.reset_index(drop=True), ingested.df.reset_index(drop=True), check_categorical=False
+    )
+    assert reloaded.version == ingested.version
+    assert reloaded.get_available_stations() == ingested.get_available_stations()
+    assert reloaded.get_time_series('Linea 9', 'Nueva Estación') == ingested.get_time_series('Linea 9', 'Nueva Estación')
@@ -0,0 +1,94 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+# Añadir backend/ (paquete app) y test/ (generador sintético) al path de Python
+test_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(test_dir.parent))
+sys.path.insert(0, str(test_dir))
+
+from app.services.data_service import DataService  # noqa: E402
+from app.services.forecast_service import FORECAST_SECTIONS, ForecastService  # noqa: E402
+from app.utils.downsampling import lttb_indices  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+# Secciones con fechas y series alineadas
+SERIES_SECTIONS = ('train', 'test', 'forecast')
+
+
+@pytest.fixture(scope='module')
+def service_and_result(tmp_path_factory):
+    root = tmp_path_factory.mktemp('forecast')
+    path = generate_dataset(root / 'afluencia.csv', stations=2, lines=1, start='2019-01-01', end='2021-12-31')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATA_PATH', str(path))
+        mp.setenv('MODEL_CACHE_DIR', str(root / 'models'))
+        ds = DataService(use_snapshot=False)
+        service = ForecastService()
+    station_data = ds.get_station_data('Linea 1', 'Observatorio')
+    return service, service.generate_forecast(station_data, 'fast')
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    values = np.sin(np.linspace(0, 20, 5000))
+    values[1234] = 50.0
+    indices = lttb_indices(values, 100)
+    assert len(indices) == 100 and indices[0] == 0 and indices[-1] == 4999
+    assert (np.diff(indices) > 0).all() and 1234 in indices
+    # Con menos puntos que el límite no se descarta nada
+    assert lttb_indices(values[:50], 100).tolist() == list(range(50))
+
+
+@pytest.mark.parametrize('resolution', ['daily', 'weekly', 'monthly'])
+def test_points_cap_every_series(service_and_result, resolution):
+    service, result = service_and_result
+    shaped = service.shape_forecast(result, resolution=resolution, points=40)
+    for field in SERIES_SECTIONS + ('components',):
+        section = shaped[field]
+        lengths = {name: len(values) for name, values in section.items()}
+        assert len(set(lengths.values())) == 1 and lengths['dates'] <= 40, field
+
+    # El primer y el último punto se conservan (en semanas o meses, su periodo); los
+    # componentes cubren del inicio del entrenamiento al final del pronóstico
+    freq = {'daily': 'D', 'weekly': 'W', 'monthly': 'M'}[resolution]
+    bounds = {field: (result[field]['dates'][0], result[field]['dates'][-1]) for field in SERIES_SECTIONS}
+    bounds['components'] = (result['train']['dates'][0], result['forecast']['dates'][-1])
+    for field, (first, last) in bounds.items():
+        dates = pd.DatetimeIndex(shaped[field]['dates']).to_period(freq)
+        assert (dates[0], dates[-1]) == (pd.Period(first, freq), pd.Period(last, freq)), field
+
+
+@pytest.mark.parametrize('resolution, freq', [('weekly', 'W'), ('monthly', 'M')])
+def test_resolution_preserves_daily_totals(service_and_result, resolution, freq):
+    service, result = service_and_result
+    shaped = service.shape_forecast(result, ['train', 'forecast'], resolution=resolution)
+    for field, name in (('train', 'actual'), ('forecast', 'predicted')):
+        daily = pd.Series(result[field][name], index=pd.DatetimeIndex(result[field]['dates']))
+        expected = daily.groupby(daily.index.to_period(freq)).agg(['mean', 'count'])
+
+        means = np.asarray(shaped[field][name])
+        np.testing.assert_allclose(means, expected['mean'])
+        # Promedio × días de cada periodo = total diario
+        np.testing.assert_allclose((means * expected['count']).sum(), daily.sum())
+        assert shaped[field]['dates'] == [
+            period.start_time.strftime('%Y-%m-%d') if index else daily.index[0].strftime('%Y-%m-%d')
+            for index, period in enumerate(expected.index)
+        ]
+
+
+def test_field_selection(service_and_result):
+    service, result = service_and_result
+    assert list(service.shape_forecast(result, ['metrics', 'forecast'])) == ['metrics', 'forecast']
+    assert list(service.shape_forecast(result)) == list(FORECAST_SECTIONS)
+    with pytest.raises(ValueError, match='Secciones desconocidas'):
+        service.shape_forecast(result, ['forecast', 'pronostico'])
+
+
+def test_unknown_fields_are_bad_requests(api):
+    response = TestClient(api.app).get('/api/forecast/Linea 1/Observatorio?fields=forecast,pronostico')
+    assert response.status_code == 400
+    assert 'pronostico' in response.json()['detail']
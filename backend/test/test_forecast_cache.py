@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.forecast_cache import ForecastCache  # noqa: E402
+
+
+def _cache_bytes(cache_dir: Path) -> int:
+    return sum(path.stat().st_size for path in cache_dir.iterdir() if path.name.endswith('.json'))
+
+
+def test_eviction_scans_only_when_the_limit_is_crossed(tmp_path, monkeypatch):
+    cache = ForecastCache(str(tmp_path), max_bytes=40_000)
+    scans = []
+    evict = cache._evict
+    monkeypatch.setattr(cache, '_evict', lambda: scans.append(1) or evict())
+
+    payload = {'values': 'x' * 1000}
+    for number in range(200):
+        cache.put(f'key{number}', payload)
+        # mtime distinto por entrada para que el orden LRU sea el de escritura
+        os.utime(cache._path(f'key{number}', cache.PAYLOAD_SUFFIX), (time.time() - 1000 + number,) * 2)
+
+    assert _cache_bytes(tmp_path) <= cache.max_bytes
+    # Un recorrido inicial más uno por cada vez que se cruza el límite, no uno por escritura
+    assert len(scans) <= 200 // 3
+    # Sobreviven las entradas más recientes
+    assert cache.get('key199') == payload and cache.get('key0') is None
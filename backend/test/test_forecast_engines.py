@@ -0,0 +1,68 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.forecast_engines import FORECAST_COLUMNS, HarmonicEngine, ProphetEngine  # noqa: E402
+
+
+def _series(seed: int, level: float = 20_000):
+    # Dos años de afluencia diaria con tendencia, semana y año; el último mes se pronostica
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range('2021-01-01', '2022-12-31', freq='D')
+    days = np.arange(len(ds))
+    y = (
+        level * (1 + days / 3000)
+        - 0.2 * level * (ds.dayofweek >= 5)
+        + 0.1 * level * np.sin(2 * np.pi * days / 365.25)
+        + rng.normal(0, 0.03 * level, len(ds))
+    )
+    data = pd.DataFrame({'ds': ds, 'y': y})
+    train, test = data.iloc[:-30], data.iloc[-30:]
+    return train, test
+
+
+@pytest.fixture(scope='module')
+def series():
+    return _series(0)
+
+
+def test_harmonic_matches_prophet_output(series):
+    train, test = series
+    future = pd.concat([train[['ds']], test[['ds']]], ignore_index=True)
+    fast, fast_model = HarmonicEngine().fit_predict(train, future)
+    prophet, _ = ProphetEngine({'yearly_seasonality': True, 'weekly_seasonality': True,
+                                'daily_seasonality': False}).fit_predict(train, future)
+
+    # Mismas columnas, fechas y tipos que Prophet: ForecastService los trata igual
+    assert list(fast.columns) == FORECAST_COLUMNS == list(prophet.columns)
+    assert fast['ds'].tolist() == prophet['ds'].tolist()
+    assert (fast.dtypes == prophet.dtypes).all()
+    assert fast_model is None
+
+    assert (fast['yhat_lower'] <= fast['yhat']).all() and (fast['yhat'] <= fast['yhat_upper']).all()
+    assert np.isfinite(fast[FORECAST_COLUMNS[1:]].to_numpy()).all()
+    # Precisión del mismo orden que Prophet en la serie de prueba (no idéntica)
+    errors = {
+        name: np.sqrt(np.mean((forecast['yhat'].iloc[-30:].to_numpy() - test['y'].to_numpy()) ** 2))
+        for name, forecast in (('fast', fast), ('prophet', prophet))
+    }
+    assert errors['fast'] < 1.5 * errors['prophet']
+
+
+def test_harmonic_is_deterministic_and_batched(series):
+    train, test = series
+    other_train, other_test = _series(1, level=50_000)
+    engine = HarmonicEngine()
+    single = engine.fit_predict(train, test[['ds']])[0]
+    pd.testing.assert_frame_equal(single, engine.fit_predict(train, test[['ds']])[0])
+
+    # Las estaciones con las mismas fechas se resuelven en bloque con el mismo resultado
+    batched = engine.fit_predict_many([(train, test[['ds']]), (other_train, other_test[['ds']])])
+    pd.testing.assert_frame_equal(batched[0][0], single)
+    pd.testing.assert_frame_equal(batched[1][0], engine.fit_predict(other_train, other_test[['ds']])[0])
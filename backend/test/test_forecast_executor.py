@@ -0,0 +1,90 @@
+import asyncio
+import sys
+import threading
+from pathlib import Path
+
+import pandas as pd
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.forecast_executor import ForecastExecutor  # noqa: E402
+
+
+class _Engine:
+    name = 'fast'
+    runs_in_pool = False
+
+
+class _ForecastService:
+    """Ajuste en el pool de hilos que tarda lo suficiente para que las solicitudes se traslapen"""
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.fits = 0
+        self.release = threading.Event()
+
+    def get_engine(self, engine=None):
+        return _Engine()
+
+    def get_cached_forecast(self, station_data, engine=None):
+        return None
+
+    def generate_forecast(self, station_data, engine=None):
+        self.fits += 1
+        self.release.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        return {'estacion': station_data['estacion'].iloc[0]}
+
+
+def _station(estacion):
+    return pd.DataFrame({'linea': ['linea 1'], 'estacion': [estacion]})
+
+
+def _submit_concurrently(service, requests: int):
+    async def scenario():
+        executor = ForecastExecutor(service)
+        waiters = [
+            asyncio.ensure_future(executor.submit(_station('a'))) for _ in range(requests)
+        ]
+        # Todas las solicitudes se registran antes de que termine el único ajuste
+        await asyncio.sleep(0.05)
+        service.release.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return results, executor.stats()
+
+    return asyncio.run(scenario())
+
+
+def test_concurrent_requests_share_one_fit():
+    service = _ForecastService()
+    results, stats = _submit_concurrently(service, 5)
+    assert service.fits == 1
+    assert stats['requests'] == 5 and stats['fits'] == 1 and stats['coalesced'] == 4
+    assert results == [{'estacion': 'a'}] * 5
+    assert stats['in_flight'] == 0
+
+
+def test_failure_reaches_every_waiter():
+    service = _ForecastService(error=RuntimeError('ajuste fallido'))
+    results, stats = _submit_concurrently(service, 3)
+    assert service.fits == 1 and stats['coalesced'] == 2
+    assert all(isinstance(result, RuntimeError) for result in results)
+    # El fallo no queda registrado como ajuste en curso: la siguiente solicitud reintenta
+    assert stats['in_flight'] == 0
+
+    service.error = None
+    results, _ = _submit_concurrently(service, 1)
+    assert results == [{'estacion': 'a'}] and service.fits == 2
+
+
+def test_different_stations_are_not_coalesced():
+    service = _ForecastService()
+    service.release.set()
+
+    async def scenario():
+        executor = ForecastExecutor(service)
+        await asyncio.gather(*(executor.submit(_station(name)) for name in 'ab'))
+        return executor.stats()
+
+    assert asyncio.run(scenario())['coalesced'] == 0 and service.fits == 2
@@ -0,0 +1,130 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.forecast_executor import ForecastPoolSaturatedError, ForecastTimeoutError  # noqa: E402
+from app.services.forecast_jobs import ForecastJobService  # noqa: E402
+
+
+class _Engine:
+    name = 'prophet'
+    runs_in_pool = True
+
+
+class _ForecastService:
+    def get_engine(self, engine=None):
+        return _Engine()
+
+    def get_cached_forecast(self, station_data, engine=None):
+        return None
+
+
+class _Executor:
+    """Ejecutor en memoria: registra el orden y termina cuando se le indica"""
+    max_workers = 1
+    max_queue = 3
+    timeout = 5.0
+
+    def __init__(self):
+        self.order = []
+        self.release = asyncio.Event()
+
+    async def submit(self, station_data, engine=None):
+        estacion = station_data['estacion'].iloc[0]
+        self.order.append(estacion)
+        await self.release.wait()
+        return {'estacion': estacion}
+
+    def _retry_after(self):
+        return 1
+
+
+def _station(estacion):
+    return pd.DataFrame({'linea': ['linea 1'], 'estacion': [estacion]})
+
+
+def test_priority_cancel_and_ttl():
+    async def scenario():
+        executor = _Executor()
+        service = ForecastJobService(_ForecastService(), executor)
+        jobs = {}
+        for estacion, priority in [('a', 'low'), ('b', 'low'), ('c', 'normal'), ('d', 'high')]:
+            jobs[estacion] = await service.submit(_station(estacion), 'linea 1', estacion, priority=priority)
+
+        # 'a' ocupa el único lugar; el resto espera por prioridad
+        assert jobs['a'].status == 'running'
+        assert [service.position(jobs[name]) for name in 'dcb'] == [0, 1, 2]
+        assert service.cancel(jobs['c'].id).status == 'cancelled'
+
+        executor.release.set()
+        await asyncio.gather(*(service.wait(jobs[name]) for name in 'adb'))
+        assert executor.order == ['a', 'd', 'b']
+        # wait() entrega el resultado y libera el trabajo; el cancelado se conserva
+        assert service.get(jobs['c'].id).status == 'cancelled'
+
+        service.ttl = 0
+        await asyncio.sleep(0.01)
+        return service.stats()
+
+    assert asyncio.run(scenario()) == {'jobs': 0, 'queued': 0, 'running': 0}
+
+
+def test_coalesce_bound_and_timeout():
+    async def scenario():
+        executor = _Executor()
+        service = ForecastJobService(_ForecastService(), executor)
+        first = await service.submit(_station('a'), 'linea 1', 'a')
+        # Misma estación: se une al ajuste en curso sin ocupar otro lugar
+        same = await service.submit(_station('a'), 'linea 1', 'a', priority='high')
+        assert same.status == 'running' and service.stats()['running'] == 1
+
+        queued = [await service.submit(_station(name), 'linea 1', name) for name in 'bce']
+        duplicate = await service.submit(_station('c'), 'linea 1', 'c', priority='high')
+        assert service.stats()['queued'] == 3
+        # La copia de mayor prioridad adelanta a la estación agrupada
+        assert service.position(duplicate) == 0 and service.position(queued[0]) == 1
+        with pytest.raises(ForecastPoolSaturatedError):
+            await service.submit(_station('d'), 'linea 1', 'd')
+
+        # El tiempo máximo incluye la espera en cola: 504 en lugar de colgarse
+        executor.timeout = 0.05
+        with pytest.raises(ForecastTimeoutError):
+            await service.wait(queued[0])
+        assert queued[0].status == 'cancelled'
+
+        executor.release.set()
+        results = await asyncio.gather(
+            service.wait(first), service.wait(same), service.wait(duplicate), service.wait(queued[2])
+        )
+        assert [result['estacion'] for result in results] == ['a', 'a', 'c', 'e']
+        return executor.order
+
+    assert asyncio.run(scenario()) == ['a', 'c', 'e']
+
+
+def test_free_slot_ignores_queue_limit():
+    async def scenario():
+        executor = _Executor()
+        executor.max_queue = 0
+        service = ForecastJobService(_ForecastService(), executor)
+        # Sin cola permitida, el pool libre todavía acepta una estación
+        first = await service.submit(_station('a'), 'linea 1', 'a')
+        assert first.status == 'running'
+        with pytest.raises(ForecastPoolSaturatedError):
+            await service.submit(_station('b'), 'linea 1', 'b')
+
+        executor.release.set()
+        await service.wait(first)
+        await asyncio.sleep(0)
+        # Al liberarse el lugar se acepta de nuevo
+        second = await service.submit(_station('b'), 'linea 1', 'b')
+        assert second.status == 'running'
+        return (await service.wait(second))['estacion']
+
+    assert asyncio.run(scenario()) == 'b'
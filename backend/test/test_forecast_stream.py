@@ -0,0 +1,70 @@
+import json
+import sys
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+STATIONS = [
+    {'linea': 'Linea 1', 'estacion': 'Observatorio'},
+    {'linea': 'Linea 1', 'estacion': 'No Existe'},
+    {'linea': 'Linea 2', 'estacion': 'Pino Suárez'}
+]
+
+
+def _post_stream(api, format: str):
+    response = TestClient(api.app).post(
+        f'/api/forecast/stream?format={format}',
+        json={'stations': STATIONS, 'engine': 'fast', 'fields': ['metrics'], 'resolution': 'monthly'},
+        headers={'Accept-Encoding': 'gzip'}
+    )
+    assert response.status_code == 200
+    # Los eventos no se comprimen: gzip los retendría hasta el final de la respuesta
+    assert 'content-encoding' not in response.headers
+    return response
+
+
+def _parse_sse(text: str):
+    events = []
+    for block in text.strip().split('\n\n'):
+        name, data = block.split('\n')
+        event = json.loads(data[len('data: '):])
+        assert name == f"event: {event['event']}"
+        events.append(event)
+    return events
+
+
+def _check_sequence(events, progress=('fitting', 'cache_hit')):
+    assert events[0] == {'event': 'start', 'total': 3}
+    assert events[-1] == {'event': 'end', 'total': 3, 'failed': 1}
+
+    by_station = {}
+    for event in events[1:-1]:
+        by_station.setdefault(event['estacion'], []).append(event)
+    # La estación desconocida genera un evento de error y el resto del lote continúa
+    [error] = by_station['No Existe']
+    assert error['event'] == 'error' and error['status'] == 'error' and 'No Existe' in error['detail']
+    for station in ('Observatorio', 'Pino Suárez'):
+        assert [event['event'] for event in by_station[station]] == ['progress', 'result']
+        assert by_station[station][0]['status'] in progress and by_station[station][1]['status'] == 'done'
+        assert list(by_station[station][-1]['forecast']) == ['metrics']
+
+
+def test_ndjson_stream(api):
+    response = _post_stream(api, 'ndjson')
+    assert response.headers['content-type'].startswith('application/x-ndjson')
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    _check_sequence(events)
+
+    # La segunda vez los pronósticos ya están en el cache
+    events = [json.loads(line) for line in _post_stream(api, 'ndjson').text.splitlines() if line]
+    _check_sequence(events, progress=('cache_hit',))
+
+
+def test_sse_stream(api):
+    response = _post_stream(api, 'sse')
+    assert response.headers['content-type'].startswith('text/event-stream')
+    events = _parse_sse(response.text)
+    _check_sequence(events)
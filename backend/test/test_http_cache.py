@@ -0,0 +1,61 @@
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.http_cache import etag_matches, make_etag  # noqa: E402
+
+# Rutas de lectura que dependen solo del dataset y de sus parámetros
+CACHED_URLS = [
+    '/api/stations',
+    '/api/lines',
+    '/api/timeseries/Linea 1/Observatorio?granularity=quarter'
+]
+
+
+def test_etag_matching():
+    etag = make_etag('v1', '/api/stations?')
+    assert etag.startswith('W/"') and etag != make_etag('v2', '/api/stations?')
+    assert etag_matches(etag, etag)
+    # Comparación débil: el cliente puede quitar el prefijo W/ o mandar varios
+    assert etag_matches(f'"otro", {etag[2:]}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches(None, etag) and not etag_matches('"otro"', etag)
+
+
+def test_conditional_requests_follow_the_dataset_version(api):
+    client = TestClient(api.app)
+    etags = {}
+    for url in CACHED_URLS:
+        response = client.get(url)
+        assert response.status_code == 200
+        etags[url] = response.headers['etag']
+        assert 'max-age' in response.headers['cache-control']
+
+        # Misma versión: 304 sin cuerpo y con el mismo ETag
+        revalidated = client.get(url, headers={'If-None-Match': etags[url]})
+        assert revalidated.status_code == 304
+        assert revalidated.content == b''
+        assert revalidated.headers['etag'] == etags[url]
+    # Los parámetros forman parte del ETag
+    assert client.get('/api/timeseries/Linea 1/Observatorio').headers['etag'] != etags[CACHED_URLS[2]]
+
+    # Una ingesta cambia la versión: el ETag anterior ya no coincide
+    ingest = client.post('/api/admin/data/ingest', json={'rows': [
+        {'fecha': '2022-01-01', 'linea': 'Linea 1', 'estacion': 'Observatorio', 'afluencia': 1234}
+    ]})
+    assert ingest.status_code == 200 and ingest.json()['filas_agregadas'] == 1
+    for url in CACHED_URLS:
+        response = client.get(url, headers={'If-None-Match': etags[url]})
+        assert response.status_code == 200 and response.content
+        assert response.headers['etag'] != etags[url]
+
+
+@pytest.mark.parametrize('header', ['W/"otro"', ''])
+def test_stale_etags_get_the_full_response(api, header):
+    response = TestClient(api.app).get('/api/stations', headers={'If-None-Match': header})
+    assert response.status_code == 200 and response.json()
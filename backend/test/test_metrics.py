@@ -0,0 +1,38 @@
+import sys
+from pathlib import Path
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.utils.metrics import MetricsRegistry  # noqa: E402
+
+
+def test_histogram_exposition():
+    registry = MetricsRegistry()
+    histogram = registry.histogram('demo_seconds', 'Demo', labels=('stage',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, stage='fit')
+
+    lines = registry.render().splitlines()
+    assert '# TYPE demo_seconds histogram' in lines
+    assert 'demo_seconds_bucket{stage="fit",le="0.1"} 1' in lines
+    assert 'demo_seconds_bucket{stage="fit",le="1.0"} 2' in lines
+    assert 'demo_seconds_bucket{stage="fit",le="+Inf"} 3' in lines
+    assert 'demo_seconds_count{stage="fit"} 3' in lines
+
+
+def test_merge_from_worker():
+    # Un proceso del pool exporta sus métricas y la API las suma a las suyas
+    api, worker = MetricsRegistry(), MetricsRegistry()
+    api_cache = api.counter('demo_cache', 'Demo', labels=('result',))
+    api_seconds = api.histogram('demo_seconds', 'Demo', labels=('stage',))
+    worker_cache = worker.counter('demo_cache', 'Demo', labels=('result',))
+    worker_seconds = worker.histogram('demo_seconds', 'Demo', labels=('stage',))
+
+    api_cache.inc(result='hit')
+    worker_cache.inc(result='miss')
+    worker_seconds.observe(0.2, stage='fit')
+    api.merge(worker.export())
+
+    assert api_cache.export() == {('hit',): 1.0, ('miss',): 1.0}
+    assert api_seconds.export()[('fit',)][2] == 1
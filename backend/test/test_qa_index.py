@@ -0,0 +1,31 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Añadir backend/ (paquete app) al path de Python
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.qa_service import QAIndex  # noqa: E402
+
+
+def test_index_roundtrip_and_top_k(tmp_path):
+    rng = np.random.default_rng(0)
+    embeddings = rng.normal(size=(6, 8)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    items = [{'kind': 'intent', 'intent': f"i{n}", 'text': f"i{n}"} for n in range(2)]
+    items += [{'kind': 'estacion', 'estacion': f"e{n}", 'lineas': ['linea 1'], 'text': f"e{n}"} for n in range(4)]
+    segments = {'intent': (0, 2), 'linea': (2, 2), 'estacion': (2, 6)}
+    QAIndex(embeddings, items, segments, 'abc').save(tmp_path, 'modelo')
+
+    assert QAIndex.load(tmp_path, 'otro-modelo') is None
+    index = QAIndex.load(tmp_path, 'modelo')
+    assert isinstance(index.embeddings, np.memmap)
+
+    # La consulta es la estación e2: debe quedar primera con similitud 1
+    scores = index.embeddings @ embeddings[4]
+    best = index.top_k(scores, 'estacion', 2)
+    assert best[0][0]['estacion'] == 'e2'
+    assert abs(best[0][1] - 1.0) < 1e-5
+    assert best[0][1] >= best[1][1]
+    assert index.top_k(scores, 'linea', 3) == []
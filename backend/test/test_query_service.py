@@ -0,0 +1,88 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+# Añadir backend/ (paquete app) y test/ (generador sintético) al path de Python
+test_dir = Path(__file__).resolve().parent
+sys.path.insert(0, str(test_dir.parent))
+sys.path.insert(0, str(test_dir))
+
+from app.services.data_service import DataService  # noqa: E402
+from synthetic_data import generate_dataset  # noqa: E402
+
+pytest.importorskip('duckdb')
+
+
+@pytest.fixture(scope='module')
+def ds(tmp_path_factory):
+    path = tmp_path_factory.mktemp('data') / 'afluencia.csv'
+    generate_dataset(path, stations=12, lines=3, start='2019-01-01', end='2021-12-31')
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv('DATA_PATH', str(path))
+        yield DataService(use_snapshot=False)
+
+
+@pytest.fixture(scope='module')
+def frame(ds):
+    df = ds.df.copy()
+    df['linea'] = df['linea'].astype(str)
+    df['estacion'] = df['estacion'].astype(str)
+    return df
+
+
+def test_line_totals(ds, frame):
+    result = pd.DataFrame(ds.query.line_totals('2020-01-01', '2020-12-31'))
+    rows = frame[(frame['fecha'] >= '2020-01-01') & (frame['fecha'] <= '2020-12-31')]
+    expected = rows.groupby('linea').agg(
+        total_estaciones=('estacion', 'nunique'),
+        afluencia_total=('afluencia', 'sum'),
+        dias=('fecha', 'nunique')
+    ).sort_values('afluencia_total', ascending=False)
+
+    assert result['linea'].tolist() == expected.index.tolist()
+    assert result['total_estaciones'].tolist() == expected['total_estaciones'].tolist()
+    assert result['afluencia_total'].tolist() == expected['afluencia_total'].tolist()
+    np.testing.assert_allclose(result['promedio_diario'], expected['afluencia_total'] / expected['dias'])
+
+
+@pytest.mark.parametrize('linea', [None, 'Línea 2'])
+def test_top_stations(ds, frame, linea):
+    result = pd.DataFrame(ds.query.top_stations(limit=5, linea=linea))
+    rows = frame[frame['linea'] == 'linea 2'] if linea else frame
+    expected = rows.groupby(['linea', 'estacion'])['afluencia'].agg(['sum', 'mean'])
+    expected = expected.sort_values('sum', ascending=False).head(5)
+
+    assert list(zip(result['linea'], result['estacion'])) == expected.index.tolist()
+    assert result['afluencia_total'].tolist() == expected['sum'].tolist()
+    np.testing.assert_allclose(result['promedio_diario'], expected['mean'])
+
+
+def test_year_over_year(ds, frame):
+    result = pd.DataFrame(ds.query.year_over_year('Linea 1', 'Observatorio'))
+    rows = frame[(frame['linea'] == 'linea 1') & (frame['estacion'] == 'observatorio')]
+    monthly = rows.groupby([rows['fecha'].dt.year, rows['fecha'].dt.month])['afluencia'].sum()
+    previous = monthly.groupby(level=1).shift(1)
+
+    assert result['afluencia_total'].tolist() == monthly.tolist()
+    assert len(result) == 36
+    # El primer año no tiene con qué compararse
+    assert result['afluencia_anio_anterior'].iloc[:12].isna().all()
+    np.testing.assert_allclose(result['afluencia_anio_anterior'].iloc[12:], previous.iloc[12:])
+    np.testing.assert_allclose(
+        result['variacion_porcentual'].iloc[12:],
+        np.round(100 * (monthly.iloc[12:] / previous.iloc[12:] - 1), 2)
+    )
+
+
+@pytest.mark.parametrize('url', [
+    '/api/analytics/lines?start=ayer',
+    '/api/analytics/top-stations?end=2020-13-45',
+    '/api/analytics/day-of-week?start=no-es-fecha'
+])
+def test_invalid_dates_are_bad_requests(api, url):
+    response = TestClient(api.app).get(url)
+    assert response.status_code == 400
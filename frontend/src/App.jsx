@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import StationSelector from './components/StationSelector';
 import TimeSeriesChart from './components/TimeSeriesChart';
 import ForecastView from './components/ForecastView';
+import QueryInput from './components/QueryInput';
 import { getTimeSeries } from './services/api';
 
 function App() {
@@ -44,6 +45,11 @@ function App() {
           <h2 className="text-xl font-semibold mb-4">Selección de Estación</h2>
           <StationSelector onStationSelect={handleStationSelect} />
           
+          <div className="mt-6">
+            <h2 className="text-xl font-semibold mb-4">Pregunta</h2>
+            <QueryInput onStationSelect={handleStationSelect} />
+          </div>
+          
           {selectedStation.linea && selectedStation.estacion && (
             <div className="mt-6">
               <button
@@ -18,7 +18,10 @@ const ForecastView = ({ linea, estacion }) => {
     setError(null);
     
     try {
-      const data = await getForecast(linea, estacion);
+      // La vista no grafica los componentes del modelo: no se piden
+      const data = await getForecast(linea, estacion, {
+        fields: ['train', 'test', 'forecast', 'metrics', 'anomalies']
+      });
       console.log("Datos recibidos:", data); // Depuración
       // Sanitizar datos antes de utilizarlos
       const sanitizedData = sanitizeForecastData(data);
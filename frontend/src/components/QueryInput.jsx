@@ -0,0 +1,107 @@
+import React, { useState } from 'react';
+import { askQuestion } from '../services/api';
+
+// Títulos de las intenciones que reconoce el servicio de preguntas
+const INTENT_LABELS = {
+  afluencia_estacion: 'Afluencia de la estación',
+  pronostico: 'Pronóstico',
+  ranking_estaciones: 'Estaciones más concurridas',
+  totales_linea: 'Afluencia por línea',
+  dia_semana: 'Afluencia por día de la semana',
+  comparacion_anual: 'Comparación anual',
+  lista_estaciones: 'Estaciones'
+};
+
+const QueryInput = ({ onStationSelect }) => {
+  const [question, setQuestion] = useState('');
+  const [answer, setAnswer] = useState(null);
+  const [loading, setLoading] = useState(false);
+  const [error, setError] = useState(null);
+
+  const handleSubmit = async (event) => {
+    event.preventDefault();
+    if (!question.trim()) return;
+
+    setLoading(true);
+    setError(null);
+    try {
+      const data = await askQuestion(question);
+      setAnswer(data);
+      // Si la pregunta menciona una estación, mostrar su serie en la vista principal
+      if (data.linea && data.estacion && onStationSelect) {
+        onStationSelect(data.linea, data.estacion);
+      }
+    } catch (err) {
+      console.error('Error al contestar la pregunta:', err);
+      setError(err.message);
+      setAnswer(null);
+    } finally {
+      setLoading(false);
+    }
+  };
+
+  // Las respuestas tabulares se muestran como lista; el resto como resumen
+  const renderResult = (result) => {
+    if (Array.isArray(result)) {
+      return (
+        <ul className="text-sm max-h-60 overflow-y-auto">
+          {result.slice(0, 10).map((row, index) => (
+            <li key={index} className="border-b py-1">
+              {Object.entries(row)
+                .map(([key, value]) => `${key}: ${typeof value === 'number' ? value.toLocaleString() : value}`)
+                .join(' · ')}
+            </li>
+          ))}
+        </ul>
+      );
+    }
+    if (result && result.stats) {
+      return (
+        <p className="text-sm">
+          Promedio diario: {Math.round(result.stats.promedio_diario).toLocaleString()}
+        </p>
+      );
+    }
+    return null;
+  };
+
+  return (
+    <div className="flex flex-col space-y-3">
+      <form onSubmit={handleSubmit} className="flex flex-col space-y-2">
+        <input
+          type="text"
+          value={question}
+          onChange={(event) => setQuestion(event.target.value)}
+          placeholder="¿Cuánta gente usa Pino Suárez?"
+          className="w-full p-2 border rounded"
+          maxLength={300}
+        />
+        <button
+          type="submit"
+          disabled={loading}
+          className="w-full py-2 px-4 rounded bg-blue-500 hover:bg-blue-600 text-white disabled:opacity-50"
+        >
+          {loading ? 'Consultando...' : 'Preguntar'}
+        </button>
+      </form>
+
+      {error && (
+        <div className="bg-red-100 text-red-700 p-2 rounded text-sm">
+          <p>{error}</p>
+        </div>
+      )}
+
+      {answer && (
+        <div className="flex flex-col space-y-1">
+          <p className="font-semibold">{INTENT_LABELS[answer.intent] || answer.intent}</p>
+          {answer.estacion && (
+            <p className="text-sm text-gray-600">{answer.linea} - {answer.estacion}</p>
+          )}
+          {renderResult(answer.result)}
+        </div>
+      )}
+    </div>
+  );
+};
+
+export default QueryInput;
@@ -1,5 +1,8 @@
 import React, { useState, useEffect, useMemo } from 'react';
-import { getStations } from '../services/api';
+import { getStations, searchStations } from '../services/api';
+
+// Espera entre teclas antes de consultar la búsqueda
+const SEARCH_DEBOUNCE_MS = 150;
 
 const StationSelector = ({ onStationSelect }) => {
   const [stations, setStations] = useState([]);
@@ -7,6 +10,8 @@ const StationSelector = ({ onStationSelect }) => {
   const [selectedStation, setSelectedStation] = useState('');
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [searchText, setSearchText] = useState('');
+  const [suggestions, setSuggestions] = useState([]);
 
   // Cargar estaciones una vez al inicio
   useEffect(() => {
@@ -27,6 +32,37 @@ const StationSelector = ({ onStationSelect }) => {
     fetchStations();
   }, []);
 
+  // Autocompletado: el índice del servidor tolera acentos y errores de escritura
+  useEffect(() => {
+    if (!searchText.trim()) {
+      setSuggestions([]);
+      return undefined;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const results = await searchStations(searchText, { limit: 8 });
+        if (!cancelled) setSuggestions(results);
+      } catch (error) {
+        console.error('Error al buscar estaciones:', error);
+        if (!cancelled) setSuggestions([]);
+      }
+    }, SEARCH_DEBOUNCE_MS);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchText]);
+
+  const handleSuggestionSelect = (suggestion) => {
+    console.log('Estación buscada:', suggestion);
+    setSelectedLine(suggestion.linea);
+    setSelectedStation(suggestion.estacion);
+    setSearchText('');
+    setSuggestions([]);
+    onStationSelect(suggestion.linea, suggestion.estacion);
+  };
+
   // Calcular líneas únicas usando useMemo para evitar recálculos innecesarios
   const lines = useMemo(() => {
     if (!stations.length) return [];
@@ -94,6 +130,31 @@ const StationSelector = ({ onStationSelect }) => {
 
   return (
     <div className="flex flex-col space-y-4 p-4">
+      <div className="relative">
+        <label className="block text-sm font-medium text-gray-700 mb-1">Buscar estación</label>
+        <input
+          type="text"
+          value={searchText}
+          onChange={(event) => setSearchText(event.target.value)}
+          placeholder="p. ej. pino suarez"
+          className="mt-1 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500 p-2 border"
+        />
+        {suggestions.length > 0 && (
+          <ul className="absolute z-10 mt-1 w-full bg-white border rounded-md shadow max-h-60 overflow-y-auto">
+            {suggestions.map((suggestion) => (
+              <li
+                key={`${suggestion.linea}-${suggestion.estacion}`}
+                onClick={() => handleSuggestionSelect(suggestion)}
+                className="px-3 py-2 cursor-pointer hover:bg-blue-50"
+              >
+                {suggestion.estacion}
+                <span className="ml-2 text-xs text-gray-500">{suggestion.linea}</span>
+              </li>
+            ))}
+          </ul>
+        )}
+      </div>
+
       <div>
         <label className="block text-sm font-medium text-gray-700 mb-1">Línea</label>
         <select
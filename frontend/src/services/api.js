@@ -51,6 +51,30 @@ export const getStations = async () => {
   }
 };
 
+/**
+ * Busca estaciones por prefijo o por nombre aproximado (autocompletado)
+ *
+ * @param {string} query Texto escrito por el usuario; tolera acentos y errores de escritura
+ * @param {Object} options limit (máximo de resultados) y linea (restringir a una línea)
+ */
+export const searchStations = async (query, options = {}) => {
+  if (!query || !query.trim()) {
+    return [];
+  }
+  
+  try {
+    const params = new URLSearchParams({ q: query.trim() });
+    if (options.limit) params.set('limit', options.limit);
+    if (options.linea) params.set('linea', options.linea);
+    
+    const response = await fetch(`${API_BASE_URL}/stations/search?${params.toString()}`);
+    return await handleResponse(response);
+  } catch (error) {
+    console.error('Error al buscar estaciones:', error);
+    throw new Error(`No se pudieron buscar estaciones: ${error.message}`);
+  }
+};
+
 /**
  * Obtiene los datos de serie temporal para una estación específica
  */
@@ -82,10 +106,21 @@ export const getTimeSeries = async (linea, estacion) => {
   }
 };
 
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// Tiempo máximo que se espera un trabajo de pronóstico antes de darlo por perdido
+const FORECAST_MAX_WAIT_MS = 5 * 60 * 1000;
+
 /**
- * Obtiene pronóstico para una estación específica
+ * Obtiene pronóstico para una estación específica.
+ *
+ * El pronóstico se pide como trabajo asíncrono (POST /forecast/jobs) y se
+ * consulta su estado hasta que termina, así un ajuste largo no mantiene
+ * abierta una sola conexión ni choca con los tiempos máximos de los proxies.
+ * La espera se corta tras options.maxWaitMs (5 minutos por defecto), si el
+ * trabajo falla o se cancela, o si ya no existe (404: su resultado expiró).
  */
-export const getForecast = async (linea, estacion) => {
+export const getForecast = async (linea, estacion, options = {}) => {
   console.log(`Solicitando pronóstico para línea: ${linea}, estación: ${estacion}`);
   
   if (!linea || !estacion) {
@@ -93,22 +128,151 @@ export const getForecast = async (linea, estacion) => {
   }
   
   try {
-    const url = `${API_BASE_URL}/forecast/${encodeURIComponent(linea)}/${encodeURIComponent(estacion)}`;
-    console.log('URL de solicitud de pronóstico:', url);
+    const job = await handleResponse(await fetch(`${API_BASE_URL}/forecast/jobs`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ linea, estacion, engine: options.engine, priority: options.priority || 'high' })
+    }));
+    console.log('Trabajo de pronóstico creado:', job.id);
     
-    const response = await fetch(url);
-    const data = await handleResponse(response);
+    // Opciones: resolution ('daily', 'weekly', 'monthly'), points (máximo por serie)
+    // y fields (secciones, p. ej. ['forecast', 'metrics'])
+    const params = new URLSearchParams();
+    if (options.resolution) params.set('resolution', options.resolution);
+    if (options.points) params.set('points', options.points);
+    if (options.fields) params.set('fields', [].concat(options.fields).join(','));
+    const query = params.toString();
+    const jobUrl = `${API_BASE_URL}/forecast/jobs/${job.id}`;
+    const url = `${jobUrl}${query ? `?${query}` : ''}`;
     
-    console.log('Pronóstico recibido:', data);
+    // Sondeo con espera creciente (0.5 s hasta 5 s entre consultas) hasta el tiempo máximo
+    const deadline = Date.now() + (options.maxWaitMs || FORECAST_MAX_WAIT_MS);
+    let delay = 500;
+    for (;;) {
+      const response = await fetch(url);
+      if (response.status === 404) {
+        throw new Error('El trabajo de pronóstico ya no existe o su resultado expiró');
+      }
+      const data = await handleResponse(response);
+      if (data.status === 'done') {
+        console.log('Pronóstico recibido:', data);
+        if (!data.forecast) {
+          console.error('Formato de pronóstico incorrecto:', data);
+          throw new Error('El formato del pronóstico recibido es inválido');
+        }
+        return data.forecast;
+      }
+      if (data.status !== 'queued' && data.status !== 'running') {
+        // failed, cancelled o un estado desconocido: el trabajo no va a terminar
+        throw new Error(data.error || `El trabajo terminó con estado ${data.status}`);
+      }
+      if (options.onProgress) {
+        options.onProgress(data);
+      }
+      if (Date.now() + delay > deadline) {
+        // Liberar el lugar en la cola; si ya terminó, la cancelación no tiene efecto
+        fetch(jobUrl, { method: 'DELETE' }).catch(() => {});
+        throw new Error('El pronóstico tardó demasiado; intente de nuevo más tarde');
+      }
+      await sleep(delay);
+      delay = Math.min(delay * 1.5, 5000);
+    }
+  } catch (error) {
+    console.error('Error al obtener pronóstico:', error);
+    throw new Error(`No se pudo obtener el pronóstico: ${error.message}`);
+  }
+};
+
+/**
+ * Pronostica varias estaciones en una sola solicitud y entrega cada evento en
+ * cuanto llega (NDJSON), sin esperar a la estación más lenta.
+ *
+ * @param {Array<{linea: string, estacion: string}>} stations Estaciones a pronosticar
+ * @param {Function} onEvent Recibe cada evento: start, progress (cache_hit / fitting),
+ *   result (con el pronóstico), error y end
+ * @param {Object} options Mismas opciones que getForecast, más engine
+ */
+export const streamForecasts = async (stations, onEvent, options = {}) => {
+  console.log(`Solicitando pronóstico en streaming para ${stations.length} estaciones`);
+  
+  if (!Array.isArray(stations) || stations.length === 0) {
+    throw new Error('Se requiere al menos una estación');
+  }
+  
+  try {
+    const response = await fetch(`${API_BASE_URL}/forecast/stream`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        stations,
+        engine: options.engine,
+        resolution: options.resolution,
+        points: options.points,
+        fields: options.fields ? [].concat(options.fields) : undefined
+      })
+    });
     
-    if (!data.forecast) {
-      console.error('Formato de pronóstico incorrecto:', data);
-      throw new Error('El formato del pronóstico recibido es inválido');
+    if (!response.ok) {
+      await handleResponse(response);
     }
     
-    return data.forecast;
+    // Leer el cuerpo por partes y emitir cada línea completa
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    
+    const emitLines = () => {
+      let newline = buffer.indexOf('\n');
+      while (newline >= 0) {
+        const line = buffer.slice(0, newline).trim();
+        buffer = buffer.slice(newline + 1);
+        if (line) {
+          onEvent(JSON.parse(line));
+        }
+        newline = buffer.indexOf('\n');
+      }
+    };
+    
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      emitLines();
+    }
+    buffer += decoder.decode();
+    buffer += '\n';
+    emitLines();
   } catch (error) {
-    console.error('Error al obtener pronóstico:', error);
+    console.error('Error en el pronóstico en streaming:', error);
     throw new Error(`No se pudo obtener el pronóstico: ${error.message}`);
   }
-};
\ No newline at end of file
+};
+
+/**
+ * Hace una pregunta en lenguaje natural sobre la afluencia
+ *
+ * @param {string} question Pregunta, p. ej. '¿Cuánta gente usa Pino Suárez?'
+ * @returns {Promise<Object>} intent, linea, estacion, result y candidates
+ */
+export const askQuestion = async (question, topK = 3) => {
+  console.log('Enviando pregunta:', question);
+  
+  if (!question || !question.trim()) {
+    throw new Error('Se requiere escribir una pregunta');
+  }
+  
+  try {
+    const response = await fetch(`${API_BASE_URL}/qa`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ question: question.trim(), top_k: topK })
+    });
+    const data = await handleResponse(response);
+    
+    console.log('Respuesta recibida:', data);
+    return data;
+  } catch (error) {
+    console.error('Error al contestar la pregunta:', error);
+    throw new Error(`No se pudo contestar la pregunta: ${error.message}`);
+  }
+};